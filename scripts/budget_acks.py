@@ -0,0 +1,157 @@
+"""
+Acknowledgment & Response Volumes
+Derives outbound TA1/999 acknowledgments and 271/277CA/278 responses from each partner's inbound
+interchanges and transaction sets in one batched pass over partner × transaction set × month, and
+prices the extra orchestrator invocations, Service Bus messages and storage on top of the plan
+"""
+
+from collections import namedtuple
+from time import perf_counter
+
+import numpy as np
+
+from budget_cost_model import DAYS_PER_MONTH, SERVICE_MATRIX, compute_quantities, compute_volumes, price_vector
+from budget_optimizer import EP1_INVOCATIONS_PER_HOUR, FUNCTIONS_PEAK_FACTOR, HORIZON_MONTHS, monthly_drivers
+from budget_partners import TRANSACTION_MIX, inbound_weights
+
+UNASSIGNED = '(unassigned)'
+
+# Ack/response -> (inbound transaction set it answers or None for all, sent per, partner flag or None);
+# TA1/999 follow the partner's acknowledgments settings, business responses are always sent (ACK_SLA.md)
+ACK_RULES = {
+    'TA1': (None, 'interchange', 'expects_ta1'),
+    '999': (None, 'group', 'expects_999'),
+    '271': ('270', 'transaction', None),
+    '277CA': ('837', 'transaction', None),
+    '278R': ('278', 'transaction', None),
+}
+ACK_TYPES = tuple(ACK_RULES)
+
+# Inbound traffic no active partner config claims is acknowledged the usual way (999, no TA1)
+DEFAULT_EXPECTS = {'expects_ta1': False, 'expects_999': True}
+
+# Outbound payload per ack/response transaction (per interchange for TA1), KB
+ACK_KB = {'TA1': 0.2, '999': 0.6, '271': 2.0, '277CA': 1.2, '278R': 1.5}
+
+# Outbound topic has a single delivery subscription: send + receive + complete
+ACK_OPS_PER_MESSAGE = 3
+# Request and dependency telemetry per ack assembly invocation
+LOG_KB_PER_INVOCATION = 4
+
+AckVolumes = namedtuple('AckVolumes', [
+    'months', 'partners', 'transaction_sets', 'ack_types', 'inbound_messages', 'files', 'messages',
+    'invocations', 'gb', 'extra_ep1', 'service_costs', 'partner_costs', 'seconds',
+])
+
+def partner_weights(index, mix, transaction_sets):
+    """(partner, set) share of inbound files with a trailing unassigned row for unclaimed traffic"""
+    total = sum(mix.values()) or 1.0
+    weights = np.zeros((len(index.codes) + 1, len(transaction_sets)))
+    position = {ts: i for i, ts in enumerate(transaction_sets)}
+    if index.codes:
+        allocated = inbound_weights(index, mix) / total
+        for column, ts in enumerate(index.transaction_sets):
+            if ts in position:
+                weights[:-1, position[ts]] = allocated[:, column]
+    share = np.array([mix[ts] / total for ts in transaction_sets])
+    weights[-1] = np.maximum(share - weights[:-1].sum(axis=0), 0.0)
+    return weights
+
+def _required_ep1(invocations):
+    peak_per_hour = invocations / (DAYS_PER_MONTH * 24) * FUNCTIONS_PEAK_FACTOR
+    return np.maximum(np.ceil(peak_per_hour / EP1_INVOCATIONS_PER_HOUR), 1)
+
+def ack_volumes(index, base, mix=None, prices=None, months=HORIZON_MONTHS, interchanges_per_file=1.0,
+                groups_per_file=1.0):
+    """Outbound ack/response files and messages shaped (ack type, partner, set, month), priced per month
+
+    base holds scalar Prod drivers; files grow at growth_yoy over the horizon as in the optimizer.
+    """
+    start = perf_counter()
+    mix = TRANSACTION_MIX if mix is None else mix
+    prices = price_vector() if prices is None else prices
+    transaction_sets = tuple(sorted(mix))
+    partners = tuple(index.codes) + (UNASSIGNED,)
+    drivers = monthly_drivers(base, months)
+    volumes = compute_volumes(drivers)
+    inbound = partner_weights(index, mix, transaction_sets)[:, :, None] * volumes['inbound_files']
+
+    flags = {name: np.append(getattr(index, name), default) for name, default in DEFAULT_EXPECTS.items()}
+    rates = {
+        'interchange': (interchanges_per_file, interchanges_per_file),
+        'group': (interchanges_per_file, groups_per_file),
+        'transaction': (interchanges_per_file, base['st_per_file']),
+    }
+    applies = np.ones((len(ACK_TYPES), len(partners), len(transaction_sets)))
+    file_rate, message_rate = np.zeros(len(ACK_TYPES)), np.zeros(len(ACK_TYPES))
+    for k, (request, basis, flag) in enumerate(ACK_RULES.values()):
+        if flag is not None:
+            applies[k] *= flags[flag][:, None]
+        if request is not None:
+            applies[k] *= np.array([ts == request for ts in transaction_sets])
+        file_rate[k], message_rate[k] = rates[basis]
+    # One outbound interchange (and one assembly invocation) answers each inbound interchange
+    answered = applies[..., None] * inbound
+    files = answered * file_rate[:, None, None, None]
+    messages = answered * message_rate[:, None, None, None]
+
+    invocations = files.sum(axis=(0, 1, 2))
+    monthly_messages = messages.sum(axis=(0, 1, 2))
+    kb = np.array([ACK_KB[ack] for ack in ACK_TYPES])
+    gb = np.einsum('kptm,k->m', messages, kb) / 1024 ** 2
+
+    # Same tiers and free allowances as the plan: price the month with and without ack traffic
+    with_acks = dict(volumes)
+    with_acks['kv_operations'] = volumes['kv_operations'] + invocations * drivers['kv_ops_per_invocation']
+    with_acks['service_bus_ops'] = volumes['service_bus_ops'] + monthly_messages * ACK_OPS_PER_MESSAGE
+    with_acks['event_grid_events'] = volumes['event_grid_events'] + invocations
+    with_acks['log_gb'] = volumes['log_gb'] + invocations * LOG_KB_PER_INVOCATION / 1024 ** 2
+    # Lifecycle split as in compute_volumes
+    hot_days = np.minimum(drivers['cool_after_days'], 365)
+    cool_days = np.clip(drivers['cold_after_days'], hot_days, 365) - hot_days
+    stored_gb = gb * (1 + drivers['storage_overhead_ratio'])
+    with_acks['hot_gb'] = volumes['hot_gb'] + stored_gb * hot_days / DAYS_PER_MONTH
+    with_acks['cool_gb'] = volumes['cool_gb'] + stored_gb * cool_days / DAYS_PER_MONTH
+
+    # Ack assembly shares the Premium plan; only EP1 capacity beyond plan and base need is extra
+    capacity = drivers['functions_instances'] * drivers['functions_sku_factor']
+    invoked = volumes['router_invocations'] + volumes['orchestrator_invocations']
+    extra_ep1 = (np.maximum(_required_ep1(invoked + invocations), capacity)
+                 - np.maximum(_required_ep1(invoked), capacity))
+    ack_drivers = dict(drivers)
+    ack_drivers['functions_instances'] = drivers['functions_instances'] + extra_ep1 / drivers['functions_sku_factor']
+
+    planned = (compute_quantities(drivers, volumes) * prices) @ SERVICE_MATRIX
+    service_costs = (compute_quantities(ack_drivers, with_acks) * prices) @ SERVICE_MATRIX - planned
+
+    # Incremental cost follows each partner's share of ack messages in the month
+    partner_messages = messages.sum(axis=(0, 2))
+    share = np.divide(partner_messages, monthly_messages, out=np.zeros_like(partner_messages),
+                      where=monthly_messages > 0)
+    partner_costs = share * service_costs.sum(axis=-1)
+
+    return AckVolumes(months, partners, transaction_sets, ACK_TYPES, inbound * base['st_per_file'], files, messages,
+                      invocations, gb, extra_ep1, service_costs, partner_costs, perf_counter() - start)
+
+def message_ratio(acks, month=0):
+    """Ack/response messages per inbound transaction set message, by partner"""
+    outbound = acks.messages[..., month].sum(axis=(0, 2))
+    inbound = acks.inbound_messages[..., month].sum(axis=1)
+    return np.divide(outbound, inbound, out=np.zeros_like(outbound), where=inbound > 0)
+
+if __name__ == "__main__":
+    from budget_cost_model import build_drivers, env_index, scenario_index
+    from budget_partners import load_partner_index
+
+    drivers = build_drivers()
+    base = {name: values[env_index('Prod'), scenario_index('Expected')] for name, values in drivers.items()}
+    acks = ack_volumes(load_partner_index(), base)
+    ratios = message_ratio(acks)
+    for p, partner in enumerate(acks.partners):
+        counts = ', '.join(f"{ack} {acks.messages[k, p, :, 0].sum():,.0f}" for k, ack in enumerate(acks.ack_types))
+        print(f"{partner:<18} {counts} | {ratios[p]:.2f}× inbound | ${acks.partner_costs[p, 0]:,.2f}/mo")
+    for month in range(0, acks.months, 12):
+        print(f"Month {month + 1:>2}: {acks.messages[..., month].sum():>10,.0f} messages, "
+              f"{acks.gb[month]:,.3f} GB, +{acks.extra_ep1[month]:g} EP1, ${acks.service_costs[month].sum():,.2f}")
+    print(f"✓ {len(acks.partners)} partners × {len(acks.transaction_sets)} sets × {acks.months} months "
+          f"in {acks.seconds:.4f}s")
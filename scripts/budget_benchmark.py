@@ -0,0 +1,318 @@
+"""
+Budget Generator Benchmarks
+Times and memory-profiles every computation engine, sheet stage and the workbook save at
+increasing scenario/row multiples, and writes the results as JSON for comparison across commits
+"""
+
+import argparse
+import cProfile
+import io
+import json
+import os
+import platform
+import pstats
+import shutil
+import subprocess
+import sys
+import tempfile
+import tracemalloc
+from datetime import datetime
+from glob import glob
+from time import perf_counter
+
+import numpy as np
+
+from budget_cost_model import ENVIRONMENTS, build_drivers, evaluate
+
+DEFAULT_SCALES = (1, 10, 100, 1000)
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+SAMPLE_X12_DIR = os.path.join(REPO_ROOT, 'tests', 'TestData')
+
+# Work per stage at 1x; every size is multiplied by the scale
+BASE_DRAWS = 10_000
+BASE_ENVELOPES = 100_000
+BASE_DELAYS = 12
+BASE_PARTNERS = 4
+BASE_X12_FILES = 5
+BASE_CORPUS_FILES = 20
+# The corpus stage writes real files (~3 MB each without batch peaks), so its size stops growing here
+MAX_CORPUS_SCALE = 10
+BASE_TELEMETRY_ROWS = 10_000
+
+# Stages faster than this are timer noise and are never reported as regressions
+MIN_COMPARE_SECONDS = 0.01
+
+def measure(func, setup=None, memory=True):
+    """(result, seconds, peak traced bytes) for func(setup()); setup is excluded from both
+
+    Timing and memory are separate runs because tracemalloc slows allocation-heavy code.
+    """
+    arg = setup() if setup else None
+    start = perf_counter()
+    result = func(arg) if setup else func()
+    seconds = perf_counter() - start
+    peak = None
+    if memory:
+        arg = setup() if setup else None
+        tracemalloc.start()
+        try:
+            func(arg) if setup else func()
+            peak = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+    return result, seconds, peak
+
+def scaled_drivers(scale):
+    """Drivers with the scenario axis tiled `scale` times, shaped (environment, 3 * scale)"""
+    return {name: np.tile(values, (1, scale)) for name, values in build_drivers().items()}
+
+def write_partner_configs(directory, count):
+    """Clone the sample partner configs under numbered codes until `count` exist"""
+    from budget_partners import DEFAULT_PARTNER_DIR
+    samples = []
+    for path in sorted(glob(os.path.join(DEFAULT_PARTNER_DIR, '*.json'))):
+        with open(path, encoding='utf-8') as handle:
+            samples.append(json.load(handle))
+    for i in range(count):
+        record = dict(samples[i % len(samples)])
+        record['partnerCode'] = f"{record['partnerCode']}-{i:05d}"
+        with open(os.path.join(directory, f"{record['partnerCode']}.json"), 'w', encoding='utf-8') as handle:
+            json.dump(record, handle)
+
+def copy_x12_samples(directory, count):
+    samples = sorted(glob(os.path.join(SAMPLE_X12_DIR, '*.x12')))
+    for i in range(count):
+        shutil.copyfile(samples[i % len(samples)], os.path.join(directory, f"sample-{i:06d}.x12"))
+
+def write_telemetry_exports(directory, rows, seed=0):
+    """Synthetic RoutingEvent_CL (JSON array) and Usage (CSV) exports spanning 30 days"""
+    rng = np.random.default_rng(seed)
+    start = np.datetime64('2025-01-01T00:00:00', 'ms')
+    validated = start + np.sort(rng.integers(0, 30 * 86_400_000, rows)).astype('timedelta64[ms]')
+    published = validated + rng.exponential(200, rows).astype('timedelta64[ms]')
+    with open(os.path.join(directory, 'routing_events.json'), 'w', encoding='utf-8') as handle:
+        handle.write('[\n')
+        handle.write(',\n'.join(json.dumps({'TimeGenerated': f"{v}Z", 'validationCompleteTime_t': f"{v}Z",
+                                             'publishTime_t': f"{p}Z", '_BilledSize': 900})
+                                 for v, p in zip(validated, published)))
+        handle.write('\n]')
+    with open(os.path.join(directory, 'usage.csv'), 'w', encoding='utf-8') as handle:
+        handle.write('TimeGenerated,DataType,Quantity,IsBillable\n')
+        for day in range(30):
+            handle.write(f"{start + np.timedelta64(day, 'D')}Z,RoutingEvent_CL,{rng.uniform(300, 600):.3f},true\n")
+
+def run_benchmarks(scales=DEFAULT_SCALES, workers=1, memory=True, streaming=False, log=print):
+    """One result row per (stage, scale)"""
+    from budget_acks import ack_volumes
+    from budget_infra import infra_profiles, load_footprints
+    from budget_monte_carlo import run_simulation
+    from budget_optimizer import HORIZON_MONTHS, optimize
+    from budget_partners import attribute_costs, load_partner_index
+    from budget_routing import simulate_routing
+    from budget_export import build_tables, write_tables
+    from budget_storage_projection import sweep_lifecycle_delay
+    from budget_telemetry import load_telemetry
+    from budget_workbook import new_workbook
+    from budget_x12_corpus import generate_corpus
+    from budget_x12_scan import scan_directory
+    import generate_budget_spreadsheet as generator
+
+    results = []
+
+    def record(stage, kind, scale, size, func, setup=None):
+        result, seconds, peak = measure(func, setup, memory)
+        row = {'stage': stage, 'kind': kind, 'scale': scale, 'size': size, 'seconds': round(seconds, 6),
+               'peak_mb': round(peak / 1024 ** 2, 3) if peak is not None else None}
+        results.append(row)
+        peak_text = f"{row['peak_mb']:>10,.2f} MB" if peak is not None else ''
+        log(f"  {stage:<40} {scale:>5}x {size:>12,} {seconds:>9.3f}s {peak_text}")
+        return result
+
+    for scale in scales:
+        log(f"Scale {scale}x")
+        with tempfile.TemporaryDirectory() as scratch:
+            drivers = scaled_drivers(scale)
+            record('cost_model.evaluate', 'engine', scale, drivers['files_per_week'].size,
+                   lambda: evaluate(drivers))
+            footprints = record('infra.load_footprints', 'engine', scale, len(ENVIRONMENTS), load_footprints)
+            breakdown = evaluate(build_drivers(profiles=infra_profiles(footprints)))
+
+            draws = BASE_DRAWS * scale
+            simulation = record('monte_carlo.run_simulation', 'engine', scale, draws,
+                                lambda: run_simulation(draws, workers=workers, seed=0))
+
+            envelopes = BASE_ENVELOPES * scale
+            routing = record('routing.simulate_routing', 'engine', scale, envelopes,
+                             lambda: simulate_routing(messages=envelopes))
+
+            prod = {name: values[-1] for name, values in breakdown.drivers.items()}
+            volumes = {name: values[-1] for name, values in breakdown.volumes.items()}
+            months = HORIZON_MONTHS * scale
+            optimization = record('optimizer.optimize', 'engine', scale, months,
+                                  lambda: optimize({name: values[1] for name, values in prod.items()},
+                                                   footprints['Prod'], prices=breakdown.prices, months=months))
+            delays = np.linspace(0, 365, BASE_DELAYS * scale)[:, None]
+            record('storage.sweep_lifecycle_delay', 'engine', scale, delays.size,
+                   lambda: sweep_lifecycle_delay(prod, volumes, delays, breakdown.prices))
+
+            partner_dir = os.path.join(scratch, 'partners')
+            os.makedirs(partner_dir)
+            write_partner_configs(partner_dir, BASE_PARTNERS * scale)
+            partners = record('partners.load_partner_index', 'engine', scale, BASE_PARTNERS * scale,
+                              lambda: load_partner_index(partner_dir))
+            service_costs, inbound_files = breakdown.costs[-1, 1], breakdown.volumes['inbound_files'][-1, 1]
+            record('partners.attribute_costs', 'engine', scale, BASE_PARTNERS * scale,
+                   lambda: attribute_costs(partners, service_costs, inbound_files))
+            acks = record('acks.ack_volumes', 'engine', scale, BASE_PARTNERS * scale,
+                          lambda: ack_volumes(partners, {name: values[1] for name, values in prod.items()},
+                                              prices=breakdown.prices))
+
+            x12_dir = os.path.join(scratch, 'x12')
+            os.makedirs(x12_dir)
+            copy_x12_samples(x12_dir, BASE_X12_FILES * scale)
+            scan = record('x12_scan.scan_directory', 'engine', scale, BASE_X12_FILES * scale,
+                          lambda: scan_directory(x12_dir, workers=workers))
+            corpus_files = BASE_CORPUS_FILES * min(scale, MAX_CORPUS_SCALE)
+            corpus = record('x12_corpus.generate_corpus', 'engine', scale, corpus_files,
+                            lambda: generate_corpus(os.path.join(scratch, 'corpus'), corpus_files, workers=workers,
+                                                    seed=0, peak_share=0))
+            # Write throughput is the comparable figure once the file count is capped
+            results[-1]['mb_per_s'] = round(corpus.bytes / 1024 ** 2 / max(results[-1]['seconds'], 1e-9), 1)
+            log(f"  {'':<40} {results[-1]['mb_per_s']:>29,.1f} MB/s")
+            shutil.rmtree(os.path.join(scratch, 'corpus'))
+
+            telemetry_dir = os.path.join(scratch, 'telemetry')
+            os.makedirs(telemetry_dir)
+            write_telemetry_exports(telemetry_dir, BASE_TELEMETRY_ROWS * scale)
+            telemetry = record('telemetry.load_telemetry', 'engine', scale, BASE_TELEMETRY_ROWS * scale,
+                               lambda: load_telemetry([telemetry_dir]))
+
+            inputs = {
+                'breakdown': breakdown,
+                'prepared': datetime.now().strftime('%Y-%m-%d'),
+                'pricing': generator.PRICING,
+                'price_source': None,
+                'region': None,
+                'formulas': False,
+                'acks': acks,
+                'scan': scan,
+                'simulation': simulation,
+                'routing': routing,
+                'partners': partners,
+                'infra': footprints,
+                'optimization': optimization,
+                'plan': breakdown,
+                'telemetry': telemetry,
+            }
+            for build, names, _ in generator.SHEET_STAGES:
+                stage_inputs = {name: inputs[name] for name in names}
+                record(build.__name__, 'sheet', scale, BASE_PARTNERS * scale,
+                       lambda wb: build(wb, **stage_inputs), setup=lambda: new_workbook(streaming))
+
+            def full_workbook():
+                wb = new_workbook(streaming)
+                if 'Sheet' in wb.sheetnames:
+                    wb.remove(wb['Sheet'])
+                for build, names, _ in generator.SHEET_STAGES:
+                    build(wb, **{name: inputs[name] for name in names})
+                return wb
+
+            tables = record('export.build_tables', 'engine', scale, BASE_PARTNERS * scale,
+                            lambda: build_tables(inputs))
+            record('export.write_tables', 'save', scale, sum(len(next(iter(t.values()))) for t in tables.values()),
+                   lambda: write_tables(tables, os.path.join(scratch, 'tables'), ['csv', 'json']))
+
+            target = os.path.join(scratch, 'benchmark.xlsx')
+            record('workbook.save', 'save', scale, BASE_PARTNERS * scale,
+                   lambda wb: wb.save(target), setup=full_workbook)
+    return results
+
+def _git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=REPO_ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def write_results(results, path, streaming=False):
+    report = {
+        'created': datetime.now().isoformat(timespec='seconds'),
+        'commit': _git_commit(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'streaming': streaming,
+        'results': results,
+    }
+    with open(path, 'w', encoding='utf-8') as handle:
+        json.dump(report, handle, indent=2)
+    return report
+
+def compare_results(results, baseline_path, threshold=1.25, log=print):
+    """Print stages slower than the baseline run by more than `threshold`; returns their count"""
+    with open(baseline_path, encoding='utf-8') as handle:
+        baseline = json.load(handle)
+    previous = {(row['stage'], row['scale']): row for row in baseline['results']}
+    regressions = 0
+    log(f"Compared with {baseline_path} (commit {baseline.get('commit') or 'unknown'})")
+    for row in results:
+        before = previous.get((row['stage'], row['scale']))
+        if not before or max(before['seconds'], row['seconds']) < MIN_COMPARE_SECONDS:
+            continue
+        ratio = row['seconds'] / before['seconds']
+        if ratio > threshold:
+            regressions += 1
+            log(f"  SLOWER {row['stage']} @ {row['scale']}x: {before['seconds']:.3f}s -> {row['seconds']:.3f}s "
+                f"({ratio:.2f}x)")
+    if not regressions:
+        log("  no stage slower than the baseline threshold")
+    return regressions
+
+def profile_call(func, *args, output=None, top=25, stream=None, **kwargs):
+    """Run func under cProfile and tracemalloc and print the hottest functions and allocation sites
+
+    When output is given the raw cProfile stats are also dumped there for pstats/snakeviz.
+    """
+    stream = stream or sys.stdout
+    profiler = cProfile.Profile()
+    tracemalloc.start(10)
+    try:
+        result = profiler.runcall(func, *args, **kwargs)
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    if output:
+        profiler.dump_stats(output)
+    text = io.StringIO()
+    pstats.Stats(profiler, stream=text).sort_stats('cumulative').print_stats(top)
+    print(f"\n=== cProfile (top {top} by cumulative time) ===", file=stream)
+    print(text.getvalue().strip(), file=stream)
+    print(f"\n=== tracemalloc (peak {peak / 1024 ** 2:,.1f} MB, retained {current / 1024 ** 2:,.1f} MB) ===",
+          file=stream)
+    for stat in snapshot.statistics('lineno')[:top // 2]:
+        print(f"  {stat}", file=stream)
+    return result
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the budget generator stages")
+    parser.add_argument('--scales', type=int, nargs='+', default=list(DEFAULT_SCALES),
+                        help="multiples of the base scenario/row counts (default: 1 10 100 1000)")
+    parser.add_argument('--output', default=f"budget_benchmark_{datetime.now().strftime('%Y%m%d_%H%M%S')}.json",
+                        metavar='PATH', help="JSON results file")
+    parser.add_argument('--compare', metavar='PATH', help="earlier results file to flag regressions against")
+    parser.add_argument('--threshold', type=float, default=1.25,
+                        help="slowdown ratio reported as a regression (default: 1.25)")
+    parser.add_argument('--workers', type=int, default=1, help="worker processes for the simulation and scan")
+    parser.add_argument('--no-memory', action='store_true', help="skip the tracemalloc pass")
+    parser.add_argument('--streaming', action='store_true', help="benchmark the write-only workbook backend")
+    return parser.parse_args(argv)
+
+if __name__ == "__main__":
+    args = parse_args()
+    results = run_benchmarks(args.scales, workers=args.workers, memory=not args.no_memory,
+                             streaming=args.streaming)
+    write_results(results, args.output, args.streaming)
+    print(f"✓ Wrote {len(results)} results to {args.output}")
+    if args.compare and compare_results(results, args.compare, args.threshold):
+        sys.exit(1)
@@ -0,0 +1,129 @@
+"""
+Budget Stage Cache
+Content-hashed on-disk cache for generator stages: each stage's declared inputs (plus the code
+that renders them) are hashed, and only stages whose hash is missing from the cache recompute
+"""
+
+import hashlib
+import os
+import pickle
+import tempfile
+from datetime import date
+
+import numpy as np
+
+DEFAULT_MAX_BYTES = 256 * 1024 * 1024
+
+# Wall-clock timings ride along on result tuples but never change what a stage renders
+VOLATILE_FIELDS = ('seconds',)
+
+def _feed(digest, value):
+    if isinstance(value, np.ndarray):
+        digest.update(b'ndarray')
+        digest.update(str(value.dtype).encode())
+        digest.update(str(value.shape).encode())
+        digest.update(np.ascontiguousarray(value).tobytes())
+    elif isinstance(value, np.generic):
+        _feed(digest, value.item())
+    elif isinstance(value, tuple) and hasattr(value, '_fields'):
+        digest.update(b'namedtuple:' + type(value).__name__.encode())
+        for field, item in zip(value._fields, value):
+            if field not in VOLATILE_FIELDS:
+                _feed(digest, field)
+                _feed(digest, item)
+    elif isinstance(value, (list, tuple)):
+        digest.update(b'sequence:%d' % len(value))
+        for item in value:
+            _feed(digest, item)
+    elif isinstance(value, dict):
+        digest.update(b'mapping:%d' % len(value))
+        for key in sorted(value, key=repr):
+            _feed(digest, key)
+            _feed(digest, value[key])
+    elif isinstance(value, (set, frozenset)):
+        digest.update(b'set')
+        for item in sorted(value, key=repr):
+            _feed(digest, item)
+    elif isinstance(value, date):
+        digest.update(type(value).__name__.encode())
+        digest.update(value.isoformat().encode())
+    elif value is None or isinstance(value, (bool, int, float, str, bytes)):
+        digest.update(type(value).__name__.encode())
+        digest.update(repr(value).encode())
+    elif hasattr(value, '__dict__'):
+        digest.update(b'object:' + type(value).__name__.encode())
+        _feed(digest, {key: item for key, item in vars(value).items() if key not in VOLATILE_FIELDS})
+    else:
+        raise TypeError(f"Cannot hash stage input of type {type(value).__name__}")
+
+def content_hash(*values):
+    """Stable SHA-256 over nested stage inputs (arrays, mappings, tuples, plain objects)"""
+    digest = hashlib.sha256()
+    for value in values:
+        _feed(digest, value)
+    return digest.hexdigest()
+
+def source_hash(*modules):
+    """Hash of the source files of the given modules, so code changes invalidate their stages"""
+    digest = hashlib.sha256()
+    for module in modules:
+        with open(module.__file__, 'rb') as handle:
+            digest.update(handle.read())
+    return digest.hexdigest()
+
+class StageCache:
+    """Pickled stage results keyed by content hash, evicted least-recently-used past max_bytes"""
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, key):
+        return os.path.join(self.directory, f"{key}.pkl")
+
+    def get(self, key):
+        path = self._path(key)
+        try:
+            with open(path, 'rb') as handle:
+                value = pickle.load(handle)
+        except (OSError, EOFError, pickle.UnpicklingError):
+            self.misses += 1
+            return None
+        # Touch on hit so eviction drops the least recently used entries first
+        os.utime(path)
+        self.hits += 1
+        return value
+
+    def put(self, key, value):
+        fd, temp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        with os.fdopen(fd, 'wb') as handle:
+            pickle.dump(value, handle, protocol=pickle.HIGHEST_PROTOCOL)
+        os.replace(temp_path, self._path(key))
+        self.evict()
+
+    def memoize(self, key, compute):
+        """Cached value for key, computing and storing it on a miss"""
+        value = self.get(key)
+        if value is None:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def evict(self):
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pkl'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
@@ -0,0 +1,320 @@
+"""
+Azure EDI Platform Cost Model
+Vectorized cost engine behind the budget workbook: unit prices, volume drivers and
+per-service monthly cost for every environment and scenario in one batched pass
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+SCENARIOS = ('Low', 'Expected', 'High')
+ENVIRONMENTS = ('Dev', 'Test', 'Prod')
+
+HOURS_PER_MONTH = 730
+DAYS_PER_MONTH = 30
+WEEKS_PER_MONTH = 52 / 12
+CONTINGENCY_RATE = 0.20
+
+# ACK_SLA.md target matrix in seconds
+ACK_SLA_SECONDS = {'TA1': 300, '999': 900, '271': 300, '277CA': 4 * 3600, '278R': 900}
+
+# (meter key, service / meter, unit price USD, unit, source)
+PRICING = [
+    ('blob_hot', 'Blob Storage - Hot (LRS)', 0.018, 'per GB-month', 'Azure Blob Storage pricing'),
+    ('blob_cool', 'Blob Storage - Cool (LRS)', 0.010, 'per GB-month', 'Azure Blob Storage pricing'),
+    ('blob_cold', 'Blob Storage - Cold (LRS)', 0.0036, 'per GB-month', 'Azure Blob Storage pricing'),
+    ('blob_archive', 'Blob Storage - Archive (LRS)', 0.002, 'per GB-month', 'Azure Blob Storage pricing'),
+    ('adf_orchestration', 'Data Factory - Orchestration', 1.00, 'per 1,000 activity runs', 'Azure Data Factory pricing'),
+    ('adf_data_movement', 'Data Factory - Data Movement', 0.25, 'per DIU-hour', 'Azure Data Factory pricing'),
+    ('func_ep1_vcpu', 'Functions Premium - EP1 vCPU', 126.29, 'per vCPU-month', 'Azure Functions pricing'),
+    ('func_ep1_memory', 'Functions Premium - EP1 Memory', 8.979, 'per GB-month (3.5 GB)', 'Azure Functions pricing'),
+    ('func_ep1', 'Functions Premium - EP1 Total', 158.00, 'per instance-month', 'Calculated (1 vCPU + 3.5 GB)'),
+    ('func_executions', 'Functions Consumption - Execution', 0.20, 'per million (after 1M free)', 'Azure Functions pricing'),
+    ('func_gb_seconds', 'Functions Consumption - GB-seconds', 0.000016, 'per GB-s (after 400K free)', 'Azure Functions pricing'),
+    ('event_grid_ops', 'Event Grid - Basic Operations', 0.60, 'per million (after 100K free)', 'Azure Event Grid pricing'),
+    ('sb_standard_base', 'Service Bus - Standard Base', 0.0135, 'per hour (~$9.86/mo)', 'Azure Service Bus pricing'),
+    ('sb_standard_ops', 'Service Bus - Standard Ops (excess)', 0.80, 'per million (13-100M)', 'Azure Service Bus pricing'),
+    ('sb_premium_unit', 'Service Bus - Premium Messaging Unit', 0.928, 'per MU-hour (~$677/mo)', 'Azure Service Bus pricing'),
+    ('kv_operations', 'Key Vault - Secret Operations', 0.03, 'per 10K operations', 'Azure Key Vault pricing'),
+    ('log_ingestion', 'Log Analytics - Analytics Logs', 2.30, 'per GB ingested', 'Azure Monitor pricing'),
+    ('log_retention', 'Log Analytics - Retention (extra)', 0.10, 'per GB-month', 'Azure Monitor pricing'),
+    ('monitor_alert_rules', 'Azure Monitor - Log Alert Rule', 1.50, 'per rule-month (15 min frequency)', 'Azure Monitor pricing'),
+    ('private_endpoint_hours', 'Private Endpoints', 0.01, 'per hour (~$7.30/mo)', 'Azure Private Link pricing'),
+    ('private_link_gb', 'Private Link - Data Processing', 0.01, 'per GB (0-1 PB tier)', 'Azure Private Link pricing'),
+    ('ddos_protection', 'DDoS Network Protection', 2944.00, 'per plan-month (up to 100 public IPs)', 'Azure DDoS Protection pricing'),
+    ('sql_vcore', 'Azure SQL - General Purpose vCore', 0.2522, 'per vCore-hour (provisioned / pool)', 'Azure SQL Database pricing'),
+    ('sql_serverless_vcore', 'Azure SQL - Serverless vCore', 0.5218, 'per vCore-hour billed', 'Azure SQL Database pricing'),
+    ('sql_edtu_basic', 'Azure SQL - Basic Pool eDTU', 0.0020, 'per eDTU-hour', 'Azure SQL Database pricing'),
+    ('sql_edtu_standard', 'Azure SQL - Standard Pool eDTU', 0.0030, 'per eDTU-hour', 'Azure SQL Database pricing'),
+    ('apim_base', 'API Management - Standard v2 Base', 700.00, 'per month', 'Azure API Management pricing'),
+    ('apim_requests', 'API Management - Standard v2 Requests', 2.50, 'per million (after 50M)', 'Azure API Management pricing'),
+    ('apim_scale_out', 'API Management - Standard v2 Scale-out', 500.00, 'per additional unit', 'Azure API Management pricing'),
+    ('apim_consumption', 'API Management - Consumption', 0.042, 'per 10K operations', 'Azure API Management pricing'),
+    ('purview_cu', 'Purview - Data Map CU (placeholder)', 190.00, 'per CU-month', 'Estimate (needs confirmation)'),
+]
+
+METER_KEYS = tuple(row[0] for row in PRICING)
+METER_INDEX = {key: i for i, key in enumerate(METER_KEYS)}
+
+# (service key, Monthly Costs row label)
+SERVICES = [
+    ('storage', 'Storage (Landing + Raw + Outbound)'),
+    ('data_factory', 'Data Factory'),
+    ('functions', 'Functions (Premium plan baseline)'),
+    ('event_grid', 'Event Grid'),
+    ('service_bus', 'Service Bus'),
+    ('key_vault', 'Key Vault'),
+    ('purview', 'Purview Data Governance'),
+    ('log_analytics', 'Log Analytics (+ App Insights)'),
+    ('monitoring', 'Monitoring & Alerts'),
+    ('networking', 'Networking (Private Endpoints)'),
+    ('apim', 'API Management'),
+    ('sql', 'Azure SQL (Pool + Control Numbers)'),
+]
+
+SERVICE_KEYS = tuple(key for key, _ in SERVICES)
+SERVICE_INDEX = {key: i for i, key in enumerate(SERVICE_KEYS)}
+
+METER_SERVICE = {
+    'blob_hot': 'storage',
+    'blob_cool': 'storage',
+    'blob_cold': 'storage',
+    'blob_archive': 'storage',
+    'adf_orchestration': 'data_factory',
+    'adf_data_movement': 'data_factory',
+    'func_ep1_vcpu': 'functions',
+    'func_ep1_memory': 'functions',
+    'func_ep1': 'functions',
+    'func_executions': 'functions',
+    'func_gb_seconds': 'functions',
+    'event_grid_ops': 'event_grid',
+    'sb_standard_base': 'service_bus',
+    'sb_standard_ops': 'service_bus',
+    'sb_premium_unit': 'service_bus',
+    'kv_operations': 'key_vault',
+    'log_ingestion': 'log_analytics',
+    'log_retention': 'log_analytics',
+    'monitor_alert_rules': 'monitoring',
+    'private_endpoint_hours': 'networking',
+    'private_link_gb': 'networking',
+    'ddos_protection': 'networking',
+    'sql_vcore': 'sql',
+    'sql_serverless_vcore': 'sql',
+    'sql_edtu_basic': 'sql',
+    'sql_edtu_standard': 'sql',
+    'apim_base': 'apim',
+    'apim_requests': 'apim',
+    'apim_scale_out': 'apim',
+    'apim_consumption': 'apim',
+    'purview_cu': 'purview',
+}
+
+# Production drivers as (Low, Expected, High)
+PROD_DRIVERS = {
+    'files_per_week': (4500, 5000, 6000),
+    'growth_yoy': (0.15, 0.175, 0.20),
+    'st_per_file': (3.0, 3.5, 5.0),
+    'adf_runs_per_file': (1.2, 1.3, 1.5),
+    'reprocessing_rate': (0.03, 0.05, 0.10),
+    'avg_file_mb': (2.5, 3.0, 4.0),
+    'copy_diu': (2, 2, 2),
+    'copy_minutes': (1.0, 1.0, 1.5),
+    'orchestrator_batches_per_day': (192, 192, 288),
+    'sb_ops_per_message': (5, 5, 6),
+    'kv_ops_per_invocation': (1, 2, 3),
+    'log_gb_per_day': (1.0, 1.23, 2.0),
+    'log_retention_extra_months': (0, 0, 0),
+    'alert_rules': (2, 3, 6),
+    'api_share': (0.10, 0.10, 0.15),
+    'api_calls_per_file': (2.5, 2.5, 3.0),
+    'cool_after_days': (90, 120, 120),
+    'cold_after_days': (365, 365, 365),
+    'archive_after_days': (730, 730, 730),
+    'storage_overhead_ratio': (0.15, 0.25, 0.40),
+    'private_link_passes': (2, 2, 3),
+    'functions_instances': (1, 1, 2),
+    'sb_units': (1, 1, 1),
+    'private_endpoints': (4, 5, 6),
+    'apim_units': (0, 1, 1),
+    'apim_scale_out_units': (0, 0, 0),
+    'purview_cu': (0, 1, 2),
+    # Footprint drivers set from infra parameter files; defaults leave them unpriced
+    'functions_sku_factor': (1, 1, 1),
+    'sb_premium_units': (0, 0, 0),
+    # Premium units of the routing namespace alone; the scheduler namespace never bills routing ops
+    'routing_sb_premium_units': (0, 0, 0),
+    'storage_redundancy_factor': (1, 1, 1),
+    'ddos_plans': (0, 0, 0),
+    'sql_pool_vcores': (0, 0, 0),
+    'sql_pool_basic_edtus': (0, 0, 0),
+    'sql_pool_standard_edtus': (0, 0, 0),
+    'sql_serverless_vcores': (0, 0, 0),
+    'sql_serverless_utilization': (0.25, 0.35, 0.60),
+}
+
+# Drivers that follow the environment's share of production traffic
+VOLUME_DRIVERS = ('files_per_week',)
+
+# Lower environments run a fraction of prod traffic but carry their own fixed footprint
+ENVIRONMENT_PROFILES = {
+    'Dev': {
+        'volume_scale': 0.05,
+        'overrides': {
+            'log_gb_per_day': (0.1, 0.2, 0.4),
+            'orchestrator_batches_per_day': (48, 96, 192),
+            'alert_rules': (0, 1, 2),
+            'private_endpoints': (4, 5, 6),
+            'apim_units': (0, 0.25, 0.25),
+            'purview_cu': (0, 0, 0),
+        },
+    },
+    'Test': {
+        'volume_scale': 0.40,
+        'overrides': {
+            'log_gb_per_day': (0.3, 0.5, 0.8),
+            'alert_rules': (1, 2, 4),
+            'apim_units': (0, 0.35, 0.35),
+            'purview_cu': (0, 0, 0),
+        },
+    },
+    'Prod': {
+        'volume_scale': 1.0,
+        'overrides': {},
+    },
+}
+
+CostBreakdown = namedtuple('CostBreakdown', ['drivers', 'prices', 'volumes', 'quantities', 'costs'])
+
+def price_vector(pricing=PRICING):
+    """Unit prices ordered by METER_KEYS"""
+    prices = {row[0]: row[2] for row in pricing}
+    return np.array([prices[key] for key in METER_KEYS], dtype=np.float64)
+
+def _service_matrix():
+    matrix = np.zeros((len(METER_KEYS), len(SERVICE_KEYS)))
+    for meter, service in METER_SERVICE.items():
+        matrix[METER_INDEX[meter], SERVICE_INDEX[service]] = 1.0
+    return matrix
+
+SERVICE_MATRIX = _service_matrix()
+
+def override_drivers(values, prod_drivers=None, scenario='Expected'):
+    """Copy of the prod drivers with one scenario's values replaced (e.g. by observed data)"""
+    prod_drivers = PROD_DRIVERS if prod_drivers is None else prod_drivers
+    column = scenario_index(scenario)
+    updated = dict(prod_drivers)
+    for name, value in values.items():
+        row = list(updated[name])
+        row[column] = value
+        updated[name] = tuple(row)
+    return updated
+
+def build_drivers(prod_drivers=None, profiles=None):
+    """Driver arrays shaped (environment, scenario) from prod drivers and environment profiles"""
+    prod_drivers = PROD_DRIVERS if prod_drivers is None else prod_drivers
+    profiles = ENVIRONMENT_PROFILES if profiles is None else profiles
+    drivers = {}
+    for name, prod_values in prod_drivers.items():
+        rows = []
+        for env in ENVIRONMENTS:
+            profile = profiles[env]
+            values = np.asarray(profile['overrides'].get(name, prod_values), dtype=np.float64)
+            if name in VOLUME_DRIVERS:
+                values = values * profile['volume_scale']
+            rows.append(values)
+        drivers[name] = np.stack(rows)
+    return drivers
+
+def compute_volumes(drivers):
+    """Monthly volume metrics derived from the drivers; broadcasts over any leading shape"""
+    d = drivers
+    files = d['files_per_week'] * WEEKS_PER_MONTH
+    processed = files * (1 + d['reprocessing_rate'])
+    routing_messages = files * d['st_per_file'] * (1 + d['reprocessing_rate'])
+    raw_gb = files * d['avg_file_mb'] / 1024
+    hot_days = np.minimum(d['cool_after_days'], 365)
+    cool_days = np.clip(d['cold_after_days'], hot_days, 365) - hot_days
+    stored_gb = raw_gb * (1 + d['storage_overhead_ratio'])
+    function_invocations = processed + d['orchestrator_batches_per_day'] * DAYS_PER_MONTH
+    return {
+        'inbound_files': files,
+        'processed_files': processed,
+        'adf_activity_runs': processed * d['adf_runs_per_file'],
+        'diu_hours': processed * d['copy_diu'] * d['copy_minutes'] / 60,
+        'router_invocations': processed,
+        'orchestrator_invocations': d['orchestrator_batches_per_day'] * DAYS_PER_MONTH,
+        'routing_messages': routing_messages,
+        'service_bus_ops': routing_messages * d['sb_ops_per_message'],
+        'event_grid_events': processed,
+        'kv_operations': function_invocations * d['kv_ops_per_invocation'],
+        'log_gb': d['log_gb_per_day'] * DAYS_PER_MONTH,
+        'raw_gb': raw_gb,
+        'hot_gb': stored_gb * hot_days / DAYS_PER_MONTH,
+        'cool_gb': stored_gb * cool_days / DAYS_PER_MONTH,
+        'private_link_gb': raw_gb * d['private_link_passes'],
+        'api_calls': files * d['api_share'] * d['api_calls_per_file'],
+    }
+
+def compute_quantities(drivers, volumes):
+    """Billable quantity per meter (in each meter's pricing unit), stacked on the last axis"""
+    d, v = drivers, volumes
+    apim_enabled = d['apim_units'] > 0
+    # Premium namespaces include operations; only a Standard routing namespace bills them
+    standard_routing = d['routing_sb_premium_units'] == 0
+    quantities = {
+        'blob_hot': v['hot_gb'] * d['storage_redundancy_factor'],
+        'blob_cool': v['cool_gb'] * d['storage_redundancy_factor'],
+        'adf_orchestration': v['adf_activity_runs'] / 1000,
+        'adf_data_movement': v['diu_hours'],
+        'func_ep1': d['functions_instances'] * d['functions_sku_factor'],
+        'event_grid_ops': np.maximum(v['event_grid_events'] - 100_000, 0) / 1e6,
+        'sb_standard_base': d['sb_units'] * HOURS_PER_MONTH,
+        'sb_standard_ops': np.where(standard_routing, np.maximum(v['service_bus_ops'] - 13e6, 0) / 1e6, 0),
+        'sb_premium_unit': d['sb_premium_units'] * HOURS_PER_MONTH,
+        'kv_operations': v['kv_operations'] / 1e4,
+        'log_ingestion': v['log_gb'],
+        'log_retention': v['log_gb'] * d['log_retention_extra_months'],
+        'monitor_alert_rules': d['alert_rules'],
+        'private_endpoint_hours': d['private_endpoints'] * HOURS_PER_MONTH,
+        'private_link_gb': v['private_link_gb'],
+        'ddos_protection': d['ddos_plans'],
+        'sql_vcore': d['sql_pool_vcores'] * HOURS_PER_MONTH,
+        'sql_serverless_vcore': d['sql_serverless_vcores'] * d['sql_serverless_utilization'] * HOURS_PER_MONTH,
+        'sql_edtu_basic': d['sql_pool_basic_edtus'] * HOURS_PER_MONTH,
+        'sql_edtu_standard': d['sql_pool_standard_edtus'] * HOURS_PER_MONTH,
+        'apim_base': d['apim_units'],
+        'apim_requests': np.where(apim_enabled, np.maximum(v['api_calls'] - 50e6, 0) / 1e6, 0),
+        'apim_scale_out': d['apim_scale_out_units'],
+        'purview_cu': d['purview_cu'],
+    }
+    shape = np.broadcast_shapes(*(np.shape(q) for q in quantities.values()))
+    stacked = np.zeros(shape + (len(METER_KEYS),))
+    for key, value in quantities.items():
+        stacked[..., METER_INDEX[key]] = value
+    return stacked
+
+def compute_costs(drivers, prices=None):
+    """Monthly USD per service, shaped (..., service)"""
+    return evaluate(drivers, prices).costs
+
+def evaluate(drivers=None, prices=None):
+    """Full breakdown for every environment and scenario"""
+    drivers = build_drivers() if drivers is None else drivers
+    prices = price_vector() if prices is None else prices
+    volumes = compute_volumes(drivers)
+    quantities = compute_quantities(drivers, volumes)
+    costs = (quantities * prices) @ SERVICE_MATRIX
+    return CostBreakdown(drivers, prices, volumes, quantities, costs)
+
+def env_index(env):
+    return ENVIRONMENTS.index(env)
+
+def scenario_index(scenario):
+    return SCENARIOS.index(scenario)
+
+def format_price(price):
+    """Unit price as shown on the pricing sheet ($1.00, $0.018, $0.000016)"""
+    text = f"{price:.6f}".rstrip('0')
+    whole, _, fraction = text.partition('.')
+    return f"${int(whole):,}.{fraction.ljust(2, '0')}"
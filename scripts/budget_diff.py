@@ -0,0 +1,204 @@
+"""
+Headless Cost Diff
+Prices two input sets (infra/env parameter files and routing rules) without building a workbook
+and reports the per-service monthly delta; exits non-zero when the increase exceeds a threshold.
+Runs as `generate_budget_spreadsheet.py diff`
+"""
+
+import argparse
+import json
+import math
+import os
+import subprocess
+import sys
+import tempfile
+from collections import namedtuple
+from time import perf_counter
+
+from budget_cost_model import (
+    ENVIRONMENTS, SCENARIOS, SERVICES, build_drivers, env_index, evaluate, override_drivers, scenario_index,
+)
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+INFRA_SUBDIR = os.path.join('infra', 'bicep')
+ENV_SUBDIR = 'env'
+RULES_SUBPATH = os.path.join('config', 'routing', 'routing-rules.json')
+
+DEFAULT_THRESHOLD_PCT = 5.0
+
+EXIT_OK = 0
+EXIT_THRESHOLD = 1
+EXIT_ERROR = 2
+
+InputSet = namedtuple('InputSet', ['label', 'infra_dir', 'env_dir', 'rules_path'])
+
+ServiceDelta = namedtuple('ServiceDelta', ['key', 'service', 'base', 'head', 'delta', 'delta_pct'])
+
+CostDiff = namedtuple('CostDiff', ['environment', 'scenario', 'base', 'head', 'services', 'total', 'seconds'])
+
+def input_set(label, root=REPO_ROOT, infra_dir=None, env_dir=None, rules_path=None):
+    """Input set rooted at a checkout, with optional per-input overrides"""
+    return InputSet(label, infra_dir or os.path.join(root, INFRA_SUBDIR), env_dir or os.path.join(root, ENV_SUBDIR),
+                    rules_path or os.path.join(root, RULES_SUBPATH))
+
+def extract_ref(ref, directory, repo=REPO_ROOT):
+    """Write the priced inputs as they are at git `ref` under directory; returns the directory"""
+    paths = [INFRA_SUBDIR, ENV_SUBDIR, os.path.dirname(RULES_SUBPATH)]
+    listing = subprocess.run(['git', 'ls-tree', '-r', '--name-only', ref, '--', *paths], cwd=repo,
+                             capture_output=True, text=True)
+    if listing.returncode:
+        raise ValueError(f"Cannot read git ref {ref!r}: {listing.stderr.strip()}")
+    for name in listing.stdout.splitlines():
+        if not name.endswith('.json'):
+            continue
+        content = subprocess.run(['git', 'show', f"{ref}:{name}"], cwd=repo, capture_output=True, check=True).stdout
+        target = os.path.join(directory, name)
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        with open(target, 'wb') as handle:
+            handle.write(content)
+    return directory
+
+def price_inputs(inputs, prices=None):
+    """CostBreakdown for one input set, using the generator's routing and infra layering"""
+    from budget_infra import infra_profiles, load_footprints
+    from budget_routing import budget_routing, driver_overrides
+
+    # Pricing one side without its fan-out would report the routing overrides themselves as a delta
+    if not os.path.isfile(inputs.rules_path):
+        raise ValueError(f"No routing rules for {inputs.label} at {inputs.rules_path}; "
+                         f"pass --base-routing-rules or --head-routing-rules")
+    # The generator's default seeded replay, so the base matches the published workbook and both sides
+    # route the same synthetic stream
+    routing = budget_routing(inputs.rules_path)
+    prod_drivers = None
+    for scenario in SCENARIOS:
+        prod_drivers = override_drivers(driver_overrides(routing), prod_drivers, scenario)
+    footprints = load_footprints(inputs.infra_dir, inputs.env_dir)
+    return evaluate(build_drivers(prod_drivers, infra_profiles(footprints)), prices)
+
+def _pct(base, head):
+    if base:
+        return (head - base) / base * 100
+    return 0.0 if not head else float('inf')
+
+def cost_diff(base, head, environment='Prod', scenario='Expected', prices=None):
+    """Per-service monthly delta between two input sets for one environment and scenario
+
+    Both sides are priced with the same unit prices (listed PAYG unless given), so only inputs differ.
+    """
+    start = perf_counter()
+    cell = (env_index(environment), scenario_index(scenario))
+    base_costs = price_inputs(base, prices).costs[cell]
+    head_costs = price_inputs(head, prices).costs[cell]
+    services = [
+        ServiceDelta(key, label, float(before), float(after), float(after - before), _pct(before, after))
+        for (key, label), before, after in zip(SERVICES, base_costs, head_costs)
+    ]
+    before, after = float(base_costs.sum()), float(head_costs.sum())
+    total = ServiceDelta('total', 'Total', before, after, after - before, _pct(before, after))
+    return CostDiff(environment, scenario, base.label, head.label, services, total, perf_counter() - start)
+
+def exceeds(diff, threshold_pct=DEFAULT_THRESHOLD_PCT, max_increase=None):
+    """Reasons the head input set fails the gate (empty when it passes)"""
+    reasons = []
+    if diff.total.delta_pct > threshold_pct:
+        reasons.append(f"{diff.environment} monthly cost up {diff.total.delta_pct:.2f}% (> {threshold_pct:g}%)")
+    if max_increase is not None and diff.total.delta > max_increase:
+        reasons.append(f"{diff.environment} monthly cost up ${diff.total.delta:,.2f} (> ${max_increase:,.2f})")
+    return reasons
+
+def format_text(diff, reasons=(), show_unchanged=False):
+    lines = [f"Cost diff: {diff.environment} {diff.scenario} monthly, {diff.base} -> {diff.head}",
+             f"  {'Service':<40} {'Base':>12} {'Head':>12} {'Delta':>12} {'Delta %':>9}"]
+    for row in diff.services + [diff.total]:
+        if row is not diff.total and not show_unchanged and abs(row.delta) < 0.005:
+            continue
+        lines.append(f"  {row.service:<40} {row.base:>12,.2f} {row.head:>12,.2f} {row.delta:>+12,.2f} "
+                     f"{row.delta_pct:>+8.2f}%")
+    lines.extend(f"✗ {reason}" for reason in reasons)
+    if not reasons:
+        lines.append("✓ Within threshold")
+    return '\n'.join(lines)
+
+def _row(delta):
+    # A service that appears from nothing has no finite percentage; JSON has no Infinity
+    return dict(delta._asdict(), delta_pct=delta.delta_pct if math.isfinite(delta.delta_pct) else None)
+
+def format_json(diff, reasons=()):
+    return json.dumps({
+        'environment': diff.environment,
+        'scenario': diff.scenario,
+        'base': diff.base,
+        'head': diff.head,
+        'services': [_row(row) for row in diff.services],
+        'total': _row(diff.total),
+        'exceeded': list(reasons),
+        'seconds': round(diff.seconds, 4),
+    }, indent=2)
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(prog='generate_budget_spreadsheet.py diff',
+                                     description="Compare monthly cost between two budget input sets")
+    parser.add_argument('--base-ref', metavar='REF',
+                        help="git ref whose infra/env parameters and routing rules form the base (e.g. origin/main)")
+    parser.add_argument('--base-root', metavar='DIR', help="checkout directory holding the base inputs")
+    parser.add_argument('--head-root', metavar='DIR', default=REPO_ROOT,
+                        help="checkout directory holding the head inputs (default: this repository)")
+    for side in ('base', 'head'):
+        parser.add_argument(f'--{side}-infra-dir', metavar='DIR', help=f"{side} Bicep parameter files directory")
+        parser.add_argument(f'--{side}-env-dir', metavar='DIR', help=f"{side} environment overlay directory")
+        parser.add_argument(f'--{side}-routing-rules', metavar='PATH', help=f"{side} routing rules file")
+    parser.add_argument('--environment', choices=ENVIRONMENTS, default='Prod')
+    parser.add_argument('--scenario', choices=SCENARIOS, default='Expected')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD_PCT, metavar='PCT',
+                        help="fail when the total rises by more than PCT percent (default: 5)")
+    parser.add_argument('--max-increase', type=float, default=None, metavar='USD',
+                        help="also fail when the total rises by more than USD per month")
+    parser.add_argument('--price-catalog', metavar='PATH',
+                        help="offline Azure Retail Prices export (JSON/CSV) pricing both sides")
+    parser.add_argument('--region', default=None, metavar='REGION',
+                        help="armRegionName priced from the catalog (default: eastus)")
+    parser.add_argument('--catalog-index-dir', metavar='DIR',
+                        help="where the persisted catalog index is kept (default: next to the export)")
+    parser.add_argument('--json', action='store_true', help="print the diff as JSON")
+    parser.add_argument('--all', action='store_true', help="list unchanged services too")
+    args = parser.parse_args(argv)
+    if args.region and not args.price_catalog:
+        parser.error("--region selects prices from a catalog; pass --price-catalog as well")
+    if args.price_catalog:
+        from budget_price_catalog import DEFAULT_REGION, check_region, load_index
+        try:
+            check_region(load_index(args.price_catalog, args.catalog_index_dir), args.region or DEFAULT_REGION)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    if not (args.base_ref or args.base_root or args.base_infra_dir or args.base_env_dir or args.base_routing_rules):
+        print("Specify the base with --base-ref, --base-root or --base-* paths", file=sys.stderr)
+        return EXIT_ERROR
+    # Unreadable refs and malformed parameter files are input errors, distinct from a failed gate
+    try:
+        prices = None
+        if args.price_catalog:
+            from budget_cost_model import price_vector
+            from budget_price_catalog import DEFAULT_REGION, catalog_pricing, load_index
+            index = load_index(args.price_catalog, args.catalog_index_dir)
+            prices = price_vector(catalog_pricing(index, args.region or DEFAULT_REGION).pricing)
+        with tempfile.TemporaryDirectory() as scratch:
+            base_root = extract_ref(args.base_ref, scratch) if args.base_ref else args.base_root
+            base = input_set(args.base_ref or base_root or 'base', base_root or REPO_ROOT, args.base_infra_dir,
+                             args.base_env_dir, args.base_routing_rules)
+            head = input_set('working tree' if args.head_root == REPO_ROOT else args.head_root, args.head_root,
+                             args.head_infra_dir, args.head_env_dir, args.head_routing_rules)
+            diff = cost_diff(base, head, args.environment, args.scenario, prices)
+    except (ValueError, OSError, subprocess.CalledProcessError) as error:
+        print(f"✗ {error}", file=sys.stderr)
+        return EXIT_ERROR
+    reasons = exceeds(diff, args.threshold, args.max_increase)
+    print(format_json(diff, reasons) if args.json else format_text(diff, reasons, args.all))
+    return EXIT_THRESHOLD if reasons else EXIT_OK
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,342 @@
+"""
+Columnar Budget Exports
+Builds typed tables straight from the computed budget inputs (never from the workbook) and writes
+them as Parquet, Arrow IPC, CSV or JSON for dashboards and the FinOps warehouse
+"""
+
+import csv
+import json
+import os
+
+import numpy as np
+
+from budget_cost_model import ENVIRONMENTS, METER_KEYS, PRICING, SCENARIOS, SERVICES
+
+TABLE_FORMATS = ('parquet', 'arrow', 'csv', 'json')
+OUTPUT_FORMATS = ('xlsx',) + TABLE_FORMATS
+
+def _grid(values, labels):
+    """Long-format columns for an (environment, scenario, label) array"""
+    values = np.asarray(values, dtype=np.float64)
+    envs, scenarios, keys = np.meshgrid(np.array(ENVIRONMENTS), np.array(SCENARIOS), np.array(labels), indexing='ij')
+    return {'environment': envs.ravel(), 'scenario': scenarios.ravel(), 'key': keys.ravel(), 'value': values.ravel()}
+
+def _named(mapping):
+    """Long-format columns for {name: (environment, scenario) array}"""
+    names = tuple(mapping)
+    return _grid(np.stack([np.broadcast_to(mapping[name], (len(ENVIRONMENTS), len(SCENARIOS))) for name in names],
+                          axis=-1), names)
+
+def _rename(columns, **names):
+    return {names.get(name, name): values for name, values in columns.items()}
+
+def cost_tables(breakdown):
+    """Service and meter costs, drivers and volumes for every environment and scenario"""
+    labels = dict(SERVICES)
+    services = _rename(_grid(breakdown.costs, [key for key, _ in SERVICES]), key='service_key', value='monthly_usd')
+    services['service'] = np.array([labels[key] for key in services['service_key']])
+    services['monthly_usd'] = services.pop('monthly_usd')
+    meters = _rename(_grid(breakdown.quantities, METER_KEYS), key='meter', value='quantity')
+    meters['unit_price'] = np.tile(np.asarray(breakdown.prices, dtype=np.float64), len(ENVIRONMENTS) * len(SCENARIOS))
+    meters['monthly_usd'] = meters['quantity'] * meters['unit_price']
+    return {
+        'service_costs': services,
+        'meter_costs': meters,
+        'drivers': _rename(_named(breakdown.drivers), key='driver'),
+        'volumes': _rename(_named(breakdown.volumes), key='metric'),
+    }
+
+def pricing_table(pricing=PRICING):
+    columns = list(zip(*pricing))
+    return {
+        'meter': np.array(columns[0]),
+        'description': np.array(columns[1]),
+        'unit_price': np.array(columns[2], dtype=np.float64),
+        'unit': np.array(columns[3]),
+        'source': np.array(columns[4]),
+    }
+
+def routing_tables(routing, breakdown):
+    """Rule matches, and subscription deliveries replayed and scaled to Prod monthly volume"""
+    from budget_cost_model import env_index
+
+    rules = routing.table.rules
+    matched = np.asarray(routing.rule_counts, dtype=np.int64)
+    counts = np.asarray(routing.subscription_counts, dtype=np.int64)
+    share = counts / routing.messages if routing.messages else counts * 0.0
+    subscriptions = {
+        'subscription': np.array(routing.table.subscriptions),
+        'replayed_deliveries': counts,
+        'share_of_messages': share,
+    }
+    for scenario, messages in zip(SCENARIOS, breakdown.volumes['routing_messages'][env_index('Prod')]):
+        subscriptions[f"deliveries_per_month_{scenario.lower()}"] = share * messages
+    return {
+        'routing_rules': {
+            'rule': np.array([rule['name'] for rule in rules]),
+            'filter': np.array([rule['filter'] for rule in rules]),
+            'subscription': np.array([rule['subscription'] for rule in rules]),
+            'priority': [rule.get('priority') for rule in rules],
+            'matched': matched,
+            'share_of_messages': matched / routing.messages if routing.messages else matched * 0.0,
+        },
+        'routing_subscriptions': subscriptions,
+        'routing_summary': {
+            'replayed_messages': np.array([routing.messages], dtype=np.int64),
+            'unrouted_messages': np.array([routing.unrouted], dtype=np.int64),
+            'deliveries': np.array([counts.sum()], dtype=np.int64),
+        },
+    }
+
+def partner_tables(breakdown, partners, scan=None):
+    """Prod Expected cost attributed to partners, one row per partner and service, and the remainder by reason"""
+    from budget_cost_model import env_index, scenario_index
+    from budget_partners import UNALLOCATED_REASONS, attribute_costs, transaction_mix_from_scan
+
+    prod, expected = env_index('Prod'), scenario_index('Expected')
+    mix = transaction_mix_from_scan(scan) if scan is not None else None
+    attribution = attribute_costs(partners, breakdown.costs[prod, expected],
+                                  breakdown.volumes['inbound_files'][prod, expected], mix)
+    count, services = len(partners.codes), len(attribution.services)
+    return {
+        'partner_costs': {
+            'partner_code': np.repeat(np.array(partners.codes), services + 1),
+            'service_key': np.tile(np.array(attribution.services + ('shared',)), count),
+            'inbound_files': np.repeat(attribution.files, services + 1),
+            'monthly_usd': np.column_stack([attribution.costs, attribution.shared]).ravel(),
+        },
+        'partner_unallocated': {
+            'reason': np.array(list(UNALLOCATED_REASONS)),
+            'description': np.array(list(UNALLOCATED_REASONS.values())),
+            'monthly_usd': np.array([attribution.unallocated_by_reason[reason] for reason in UNALLOCATED_REASONS]),
+        },
+    }
+
+def storage_tables(breakdown):
+    """Prod storage lifecycle projection per scenario and month, and the Expected policy delay sweep"""
+    from budget_storage_projection import SWEEP_DELAYS, TIERS, environment_projection
+
+    projection, sweep = environment_projection(breakdown)
+    scenarios, months = projection.monthly_cost.shape
+    table = {
+        'scenario': np.repeat(np.array(SCENARIOS), months),
+        'month': np.tile(np.arange(1, months + 1), scenarios),
+        'ingest_gb': projection.ingest_gb.ravel(),
+    }
+    for t, tier in enumerate(TIERS):
+        table[f"{tier.lower()}_gb"] = projection.tier_gb[..., t].ravel()
+    table['total_gb'] = projection.tier_gb.sum(axis=-1).ravel()
+    table['monthly_usd'] = projection.monthly_cost.ravel()
+    return {
+        'storage_projection': table,
+        'storage_lifecycle_sweep': {
+            'delay_days': np.array(SWEEP_DELAYS, dtype=np.int64),
+            'retention_total_usd': sweep,
+            'vs_no_delay_usd': sweep - sweep[0],
+        },
+    }
+
+def scan_tables(scan):
+    """Envelope totals, ST counts by transaction set and the file-size histogram from the X12 scan"""
+    from budget_x12_scan import size_bucket_labels
+
+    total = sum(scan.transactions.values())
+    sets = sorted(scan.transactions)
+    labels = size_bucket_labels()
+    histograms = [('all', scan.size_histogram)] + sorted(scan.size_histogram_by_set.items())
+    return {
+        'x12_scan_summary': {
+            'files': np.array([scan.files], dtype=np.int64),
+            'skipped': np.array([scan.skipped], dtype=np.int64),
+            'bytes': np.array([scan.bytes], dtype=np.int64),
+            'interchanges': np.array([scan.interchanges], dtype=np.int64),
+            'groups': np.array([scan.groups], dtype=np.int64),
+            'transactions': np.array([total], dtype=np.int64),
+        },
+        'x12_scan_transactions': {
+            'transaction_set': np.array(sets, dtype=str),
+            'st_count': np.array([scan.transactions[ts] for ts in sets], dtype=np.int64),
+            'share': np.array([scan.transactions[ts] / total for ts in sets], dtype=np.float64),
+            'st_per_file': np.array([scan.transactions[ts] / scan.files for ts in sets], dtype=np.float64),
+        },
+        'x12_scan_sizes': {
+            'transaction_set': np.repeat(np.array([name for name, _ in histograms]), len(labels)),
+            'size_bucket': np.tile(np.array(labels), len(histograms)),
+            'files': np.array([count for _, counts in histograms for count in counts], dtype=np.int64),
+        },
+    }
+
+def optimizer_tables(optimization):
+    from budget_optimizer import TRIGGERS
+
+    months = np.arange(1, optimization.months + 1)
+    plan = {
+        'month': months,
+        'inbound_files': optimization.volumes['inbound_files'],
+        'routing_deliveries': optimization.volumes['routing_messages'] * optimization.fan_out,
+    }
+    for d, decision in enumerate(optimization.decisions):
+        name = decision.name.lower().replace(' (days)', '_days').replace('-', '_').replace(' ', '_')
+        plan[name] = np.array([decision.labels[choice[d]] for choice in optimization.choices])
+    plan['optimal_usd'] = optimization.costs
+    plan['deployed_usd'] = optimization.deployed_costs
+    fired = [optimization.triggers[label] for label, _, _ in TRIGGERS]
+    return {
+        'optimizer_plan': plan,
+        'optimizer_triggers': {
+            'trigger': np.array([label for label, _, _ in TRIGGERS]),
+            'threshold': np.array([threshold for _, threshold, _ in TRIGGERS]),
+            'action': np.array([action for _, _, action in TRIGGERS]),
+            # None: not within the horizon or not modeled
+            'first_month': [month if isinstance(month, int) else None for month in fired],
+            'modeled': np.array([month != 'not modeled' for month in fired]),
+        },
+    }
+
+def simulation_tables(simulation):
+    return {
+        'simulation_percentiles': {
+            'percentile': np.array(list(simulation.percentiles), dtype=np.int64),
+            'monthly_usd': np.array(list(simulation.percentiles.values()), dtype=np.float64),
+        },
+        'simulation_tornado': {
+            'lever': np.array([lever for lever, _, _ in simulation.tornado]),
+            'low_usd': np.array([low for _, low, _ in simulation.tornado], dtype=np.float64),
+            'high_usd': np.array([high for _, _, high in simulation.tornado], dtype=np.float64),
+        },
+    }
+
+def ack_tables(acks):
+    """Non-zero ack/response counts per (partner, set, ack type, month) and the monthly incremental cost"""
+    k, p, t, m = np.nonzero(acks.messages)
+    months = np.arange(1, acks.months + 1)
+    return {
+        'ack_volumes': {
+            'partner_code': np.array(acks.partners)[p],
+            'transaction_set': np.array(acks.transaction_sets)[t],
+            'ack_type': np.array(acks.ack_types)[k],
+            'month': months[m],
+            'files': acks.files[k, p, t, m],
+            'messages': acks.messages[k, p, t, m],
+        },
+        'ack_monthly': {
+            'month': months,
+            'ack_files': acks.invocations,
+            'ack_messages': acks.messages.sum(axis=(0, 1, 2)),
+            'storage_gb': acks.gb,
+            'extra_ep1': acks.extra_ep1,
+            'incremental_usd': acks.service_costs.sum(axis=-1),
+        },
+    }
+
+def telemetry_table(telemetry):
+    from budget_telemetry import rolling_daily
+
+    ingestion = {day: (gb, rolling) for day, gb, rolling in rolling_daily(telemetry.daily_gb)}
+    days = sorted(set(ingestion) | set(telemetry.messages) | set(telemetry.invocations))
+    return {
+        'day': np.array(days, dtype='datetime64[D]'),
+        'gb_ingested': np.array([ingestion.get(day, (np.nan,))[0] for day in days], dtype=np.float64),
+        'rolling_gb': np.array([ingestion.get(day, (np.nan, np.nan))[1] for day in days], dtype=np.float64),
+        'routed_messages': np.array([telemetry.messages.get(day, 0) for day in days], dtype=np.int64),
+        'function_invocations': np.array([telemetry.invocations.get(day, 0) for day in days], dtype=np.int64),
+    }
+
+def build_tables(inputs):
+    """{table name: {column: array}} from the generator's computed inputs; optional inputs may be None"""
+    tables = cost_tables(inputs['breakdown'])
+    tables['unit_pricing'] = pricing_table(inputs.get('pricing', PRICING))
+    tables.update(storage_tables(inputs['breakdown']))
+    if inputs.get('scan') is not None:
+        tables.update(scan_tables(inputs['scan']))
+    if inputs.get('routing') is not None:
+        tables.update(routing_tables(inputs['routing'], inputs['breakdown']))
+    if inputs.get('partners') is not None:
+        tables.update(partner_tables(inputs['breakdown'], inputs['partners'], inputs.get('scan')))
+    if inputs.get('optimization') is not None:
+        tables.update(optimizer_tables(inputs['optimization']))
+    if inputs.get('simulation') is not None:
+        tables.update(simulation_tables(inputs['simulation']))
+    if inputs.get('acks') is not None:
+        tables.update(ack_tables(inputs['acks']))
+    if inputs.get('telemetry') is not None:
+        tables['telemetry_daily'] = telemetry_table(inputs['telemetry'])
+    return tables
+
+def _pyarrow():
+    try:
+        import pyarrow
+    except ImportError:
+        raise ImportError("Parquet and Arrow output require pyarrow (pip install pyarrow)") from None
+    return pyarrow
+
+def arrow_table(columns):
+    pa = _pyarrow()
+    return pa.table({name: pa.array(values) for name, values in columns.items()})
+
+def _write_parquet(columns, path):
+    import pyarrow.parquet as pq
+    pq.write_table(arrow_table(columns), path)
+
+def _write_arrow(columns, path):
+    import pyarrow.feather as feather
+    # Uncompressed Arrow IPC files can be memory-mapped by readers without copying
+    feather.write_feather(arrow_table(columns), path, compression='uncompressed')
+
+def _plain(value):
+    """JSON/CSV-safe Python value for one cell"""
+    if isinstance(value, np.datetime64):
+        return None if np.isnat(value) else str(value)
+    if isinstance(value, np.generic):
+        value = value.item()
+    if isinstance(value, float) and not np.isfinite(value):
+        return None
+    return value
+
+def _rows(columns):
+    return zip(*(columns[name] for name in columns))
+
+def _write_csv(columns, path):
+    with open(path, 'w', encoding='utf-8', newline='') as handle:
+        writer = csv.writer(handle)
+        writer.writerow(columns)
+        for row in _rows(columns):
+            writer.writerow(['' if (value := _plain(cell)) is None else value for cell in row])
+
+def _write_json(columns, path):
+    # JSON Lines: one typed record per row, streamable by consumers
+    names = list(columns)
+    with open(path, 'w', encoding='utf-8') as handle:
+        for row in _rows(columns):
+            handle.write(json.dumps(dict(zip(names, (_plain(cell) for cell in row)))) + '\n')
+
+TABLE_WRITERS = {
+    'parquet': (_write_parquet, '.parquet'),
+    'arrow': (_write_arrow, '.arrow'),
+    'csv': (_write_csv, '.csv'),
+    'json': (_write_json, '.jsonl'),
+}
+
+def check_formats(formats, supported=OUTPUT_FORMATS):
+    """Reject unknown formats, and Parquet/Arrow without pyarrow, before anything is written"""
+    unknown = [name for name in formats if name not in supported]
+    if unknown:
+        raise ValueError(f"Unsupported output formats {unknown}; choose from {', '.join(supported)}")
+    if {'parquet', 'arrow'} & set(formats):
+        _pyarrow()
+
+def write_tables(tables, directory, formats=TABLE_FORMATS):
+    """Write every table in every requested format under directory; returns the written paths"""
+    check_formats(formats, TABLE_FORMATS)
+    os.makedirs(directory, exist_ok=True)
+    paths = []
+    for name, columns in tables.items():
+        lengths = {len(values) for values in columns.values()}
+        if len(lengths) > 1:
+            raise ValueError(f"Table {name} has ragged columns {sorted(lengths)}")
+        for format_name in formats:
+            write, suffix = TABLE_WRITERS[format_name]
+            path = os.path.join(directory, f"{name}{suffix}")
+            write(columns, path)
+            paths.append(path)
+    return paths
@@ -0,0 +1,359 @@
+"""
+Budget Formula Evaluator
+Parses the live Excel formulas written in formula mode, orders every formula cell across
+sheets topologically and evaluates them in one batched pass with cached intermediate
+values, so workbook figures are known (and checked) without opening Excel
+"""
+
+import math
+import re
+from functools import lru_cache
+from graphlib import CycleError, TopologicalSorter
+from time import perf_counter
+
+TOKEN = re.compile(r"""\s*(?:
+    (?P<number>(?:\d+\.?\d*|\.\d+)(?:[eE][-+]?\d+)?)
+  | (?P<function>[A-Za-z][A-Za-z0-9.]*)\(
+  | (?P<ref>(?:(?:'(?:[^']|'')+'|[A-Za-z_][\w.]*)!)?\$?[A-Za-z]{1,3}\$?\d+(?::\$?[A-Za-z]{1,3}\$?\d+)?)
+  | (?P<op>[-+*/^(),])
+)""", re.VERBOSE)
+
+CELL = re.compile(r"\$?([A-Za-z]{1,3})\$?(\d+)")
+
+def column_letter(column):
+    letters = ''
+    while column:
+        column, remainder = divmod(column - 1, 26)
+        letters = chr(65 + remainder) + letters
+    return letters
+
+def column_index(letters):
+    index = 0
+    for letter in letters.upper():
+        index = index * 26 + ord(letter) - 64
+    return index
+
+def coordinate(row, column):
+    return f"{column_letter(column)}{row}"
+
+def _sheet_prefix(sheet):
+    if sheet is None:
+        return ''
+    if re.fullmatch(r"[A-Za-z_][\w.]*", sheet):
+        return f"{sheet}!"
+    return "'{}'!".format(sheet.replace("'", "''"))
+
+def cell_ref(sheet, row, column, absolute=False):
+    """A1 reference, sheet-qualified when sheet is given"""
+    dollar = '$' if absolute else ''
+    return f"{_sheet_prefix(sheet)}{dollar}{column_letter(column)}{dollar}{row}"
+
+def range_ref(sheet, first_row, first_column, last_row, last_column, absolute=False):
+    dollar = '$' if absolute else ''
+    return (f"{_sheet_prefix(sheet)}{dollar}{column_letter(first_column)}{dollar}{first_row}:"
+            f"{dollar}{column_letter(last_column)}{dollar}{last_row}")
+
+def number(value):
+    """Formula literal that round-trips the float exactly"""
+    return f"{float(value):.17g}"
+
+def _split_ref(text, sheet):
+    """(sheet, first row, first column, last row, last column) for a reference token"""
+    if '!' in text:
+        name, _, text = text.rpartition('!')
+        sheet = name[1:-1].replace("''", "'") if name.startswith("'") else name
+    first, _, last = text.partition(':')
+    column, row = CELL.fullmatch(first).groups()
+    last_column, last_row = CELL.fullmatch(last).groups() if last else (column, row)
+    rows = sorted((int(row), int(last_row)))
+    columns = sorted((column_index(column), column_index(last_column)))
+    return sheet, rows[0], columns[0], rows[1], columns[1]
+
+def tokenize(formula):
+    text = formula[1:] if formula.startswith('=') else formula
+    tokens, pos = [], 0
+    while pos < len(text):
+        match = TOKEN.match(text, pos)
+        if match is None or match.end() == pos:
+            if not text[pos:].strip():
+                break
+            raise ValueError(f"Cannot parse formula {formula!r} at {text[pos:pos + 20]!r}")
+        kind = match.lastgroup
+        tokens.append((kind, match.group(kind)))
+        pos = match.end()
+    return tokens
+
+class _Parser:
+    """Recursive descent over Excel precedence: unary sign, ^, * /, + -"""
+
+    def __init__(self, tokens, sheet, formula):
+        self.tokens = tokens
+        self.pos = 0
+        self.sheet = sheet
+        self.formula = formula
+
+    def peek(self):
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else (None, None)
+
+    def take(self, value=None):
+        kind, text = self.peek()
+        if kind is None or (value is not None and text != value):
+            raise ValueError(f"Expected {value or 'an operand'} in formula {self.formula!r}")
+        self.pos += 1
+        return kind, text
+
+    def parse(self):
+        node = self.expression()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected {self.peek()[1]!r} in formula {self.formula!r}")
+        return node
+
+    def expression(self):
+        node = self.term()
+        while self.peek()[1] in ('+', '-'):
+            node = ('op', self.take()[1], node, self.term())
+        return node
+
+    def term(self):
+        node = self.power()
+        while self.peek()[1] in ('*', '/'):
+            node = ('op', self.take()[1], node, self.power())
+        return node
+
+    def power(self):
+        node = self.unary()
+        while self.peek()[1] == '^':
+            self.take()
+            node = ('op', '^', node, self.unary())
+        return node
+
+    def unary(self):
+        if self.peek()[1] in ('-', '+'):
+            sign = self.take()[1]
+            node = self.unary()
+            return ('neg', node) if sign == '-' else node
+        return self.primary()
+
+    def primary(self):
+        kind, text = self.take()
+        if kind == 'number':
+            return ('num', float(text))
+        if kind == 'ref':
+            sheet, first_row, first_column, last_row, last_column = _split_ref(text, self.sheet)
+            if (first_row, first_column) == (last_row, last_column):
+                return ('ref', (sheet, first_row, first_column))
+            return ('range', tuple((sheet, row, column) for row in range(first_row, last_row + 1)
+                                   for column in range(first_column, last_column + 1)))
+        if kind == 'function':
+            name = text.upper()
+            if name not in FUNCTIONS:
+                raise ValueError(f"Unsupported function {name} in formula {self.formula!r}")
+            args = []
+            if self.peek()[1] != ')':
+                args.append(self.expression())
+                while self.peek()[1] == ',':
+                    self.take()
+                    args.append(self.expression())
+            self.take(')')
+            return ('call', name, tuple(args))
+        if text == '(':
+            node = self.expression()
+            self.take(')')
+            return node
+        raise ValueError(f"Unexpected {text!r} in formula {self.formula!r}")
+
+def _numbers(values):
+    # Aggregates skip text and blanks, as Excel does for ranges
+    return [value for value in values if isinstance(value, (int, float))]
+
+def _sumproduct(*ranges):
+    if len({len(values) for values in ranges}) != 1:
+        raise ValueError("SUMPRODUCT ranges must be the same size")
+    total = 0.0
+    for values in zip(*ranges):
+        product = 1.0
+        for value in values:
+            product *= value if isinstance(value, (int, float)) else 0.0
+        total += product
+    return total
+
+def _round(values, digits):
+    # Excel rounds halves away from zero; Python's round() rounds them to even
+    scale = 10 ** int(digits[0])
+    return math.copysign(math.floor(abs(values[0]) * scale + 0.5) / scale, values[0])
+
+FUNCTIONS = {
+    'SUM': lambda *args: sum(sum(_numbers(arg)) for arg in args),
+    'SUMPRODUCT': _sumproduct,
+    'MAX': lambda *args: max((value for arg in args for value in _numbers(arg)), default=0.0),
+    'MIN': lambda *args: min((value for arg in args for value in _numbers(arg)), default=0.0),
+    'ABS': lambda values: abs(values[0]),
+    'ROUND': _round,
+}
+
+OPERATORS = {
+    '+': lambda a, b: a + b,
+    '-': lambda a, b: a - b,
+    '*': lambda a, b: a * b,
+    '/': lambda a, b: a / b,
+    '^': lambda a, b: a ** b,
+}
+
+@lru_cache(maxsize=None)
+def parse(formula, sheet=None):
+    """Syntax tree for a formula; unqualified references belong to sheet"""
+    return _Parser(tokenize(formula), sheet, formula).parse()
+
+def references(node):
+    """Cells a syntax tree reads, ranges expanded"""
+    kind = node[0]
+    if kind == 'ref':
+        return {node[1]}
+    if kind == 'range':
+        return set(node[1])
+    if kind == 'op':
+        return references(node[2]) | references(node[3])
+    if kind == 'neg':
+        return references(node[1])
+    if kind == 'call':
+        return set().union(*(references(arg) for arg in node[2]))
+    return set()
+
+def _scalar(value, key):
+    if value is None:
+        return 0.0
+    if isinstance(value, (int, float)):
+        return value
+    raise ValueError(f"{_sheet_prefix(key[0])}{coordinate(key[1], key[2])} holds {value!r}, not a number")
+
+def _compile(node):
+    """Closure computing a syntax tree from the values dict"""
+    kind = node[0]
+    if kind == 'num':
+        value = node[1]
+        return lambda values: value
+    if kind == 'ref':
+        key = node[1]
+        return lambda values: _scalar(values.get(key), key)
+    if kind == 'range':
+        keys = node[1]
+        return lambda values: [values.get(key) for key in keys]
+    if kind == 'neg':
+        operand = _compile(node[1])
+        return lambda values: -operand(values)
+    if kind == 'op':
+        apply, left, right = OPERATORS[node[1]], _compile(node[2]), _compile(node[3])
+        return lambda values: apply(left(values), right(values))
+    function = FUNCTIONS[node[1]]
+    # Scalars are wrapped so every function argument is a list of values
+    args = [(_compile(arg), arg[0] == 'range') for arg in node[2]]
+    return lambda values: function(*(compute(values) if is_range else [compute(values)] for compute, is_range in args))
+
+class FormulaEvaluator:
+    """Evaluates every formula cell of a workbook in dependency order
+
+    cells maps (sheet, row, column) to a value or a '=' formula. Formulas are parsed and
+    ordered once; calculate() then runs a single pass, and later calls with changed input
+    cells recompute only the formulas downstream of them.
+    """
+
+    def __init__(self, cells):
+        start = perf_counter()
+        self.values = {}
+        self._compiled = {}
+        self._dependents = {}
+        graph = {}
+        for key, value in cells.items():
+            if isinstance(value, str) and value.startswith('='):
+                node = parse(value, key[0])
+                self._compiled[key] = _compile(node)
+                graph[key] = reads = references(node)
+                for read in reads:
+                    self._dependents.setdefault(read, set()).add(key)
+            else:
+                self.values[key] = value
+        try:
+            order = TopologicalSorter({key: reads & graph.keys() for key, reads in graph.items()}).static_order()
+            self.order = [key for key in order if key in self._compiled]
+        except CycleError as error:
+            cycle = ' -> '.join(f"{_sheet_prefix(sheet)}{coordinate(row, column)}" for sheet, row, column in error.args[1])
+            raise ValueError(f"Circular reference: {cycle}") from None
+        self.seconds = perf_counter() - start
+
+    @property
+    def formulas(self):
+        return len(self._compiled)
+
+    def calculate(self, changes=None):
+        """Evaluate formulas (all, or those downstream of changed input cells); returns the count"""
+        start = perf_counter()
+        order = self.order
+        if changes:
+            for key, value in changes.items():
+                if key in self._compiled:
+                    raise ValueError(f"{_sheet_prefix(key[0])}{coordinate(key[1], key[2])} is a formula cell")
+                self.values[key] = value
+            dirty, pending = set(), list(changes)
+            while pending:
+                for dependent in self._dependents.get(pending.pop(), ()):
+                    if dependent not in dirty:
+                        dirty.add(dependent)
+                        pending.append(dependent)
+            order = [key for key in order if key in dirty]
+        values, compiled = self.values, self._compiled
+        for key in order:
+            try:
+                values[key] = compiled[key](values)
+            except ZeroDivisionError:
+                raise ValueError(f"{_sheet_prefix(key[0])}{coordinate(key[1], key[2])} divides by zero") from None
+        self.seconds += perf_counter() - start
+        return len(order)
+
+    def value(self, sheet, reference):
+        column, row = CELL.fullmatch(reference).groups()
+        return self.values.get((sheet, int(row), column_index(column)))
+
+def workbook_cells(recordings):
+    """Evaluator cells from the SheetRecordings of a generated workbook"""
+    return {(recording.title, row, column): value
+            for recording in recordings for row, column, value, _, _ in recording.cells if value is not None}
+
+def load_cells(path):
+    """Evaluator cells (formulas as written, not Excel's cached values) from an xlsx file"""
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True)
+    try:
+        return {(ws.title, cell.row, cell.column): cell.value
+                for ws in wb.worksheets for row in ws.iter_rows() for cell in row if cell.value is not None}
+    finally:
+        wb.close()
+
+def _cell_arg(text):
+    sheet, _, reference = text.rpartition('!')
+    column, row = CELL.fullmatch(reference).groups()
+    return sheet.strip("'"), int(row), column_index(column)
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Evaluate the formulas of a budget workbook without Excel")
+    parser.add_argument('workbook', help="xlsx written with --formulas (or edited in Excel)")
+    parser.add_argument('--set', nargs='+', default=[], metavar="SHEET!CELL=VALUE",
+                        help="change input cells and recalculate what depends on them")
+    parser.add_argument('--show', nargs='+', default=["Executive Summary!G13"], metavar='SHEET!CELL',
+                        help="cells to print (default: the contingency-loaded budget ask)")
+    args = parser.parse_args()
+
+    evaluator = FormulaEvaluator(load_cells(args.workbook))
+    evaluator.calculate()
+    print(f"✓ Evaluated {evaluator.formulas:,} formulas in {evaluator.seconds:.3f}s")
+    if args.set:
+        changes = {}
+        for assignment in args.set:
+            target, _, value = assignment.partition('=')
+            changes[_cell_arg(target)] = float(value)
+        print(f"✓ Recalculated {evaluator.calculate(changes):,} dependent formulas")
+    for target in args.show:
+        sheet, row, column = _cell_arg(target)
+        print(f"{target:<40} {evaluator.values.get((sheet, row, column))}")
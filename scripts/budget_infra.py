@@ -0,0 +1,196 @@
+"""
+Infrastructure Parameter Ingestion
+Parses the Bicep and environment parameter files for every environment and maps their SKUs
+and counts onto cost model drivers, replacing the assumed per-environment footprint
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+
+from budget_cost_model import ENVIRONMENTS, ENVIRONMENT_PROFILES
+
+REPO_ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..')
+DEFAULT_INFRA_DIR = os.path.join(REPO_ROOT, 'infra', 'bicep')
+DEFAULT_ENV_DIR = os.path.join(REPO_ROOT, 'env')
+
+# Elastic Premium plans scale linearly from EP1 (1 vCPU / 3.5 GB)
+FUNCTIONS_SKU_FACTOR = {'EP1': 1, 'EP2': 2, 'EP3': 4}
+
+# Hot/Cool blob price relative to LRS (approximate East US ratios)
+STORAGE_REDUNDANCY_FACTOR = {
+    'Standard_LRS': 1.0,
+    'Standard_ZRS': 1.25,
+    'Standard_GRS': 2.0,
+    'Standard_GZRS': 2.25,
+    'Standard_RAGRS': 2.5,
+    'Standard_RAGZRS': 2.8,
+}
+
+# DTU pool SKU -> driver holding its eDTU count
+SQL_DTU_POOL_DRIVERS = {'BasicPool': 'sql_pool_basic_edtus', 'StandardPool': 'sql_pool_standard_edtus'}
+
+# Log Analytics includes 31 days of interactive retention
+INCLUDED_RETENTION_DAYS = 31
+
+# main.bicep private endpoints: Key Vault, three storage accounts and SQL; Service Bus only on Premium
+PRIVATE_ENDPOINTS_BASE = 5
+
+InfraFootprint = namedtuple('InfraFootprint', ['environment', 'location', 'sources', 'parameters', 'drivers', 'notes'])
+
+@lru_cache(maxsize=32)
+def _parse_parameters(path, mtime_ns, size):
+    with open(path, encoding='utf-8') as handle:
+        content = json.load(handle)
+    # Key Vault references carry no value and never map to a meter
+    return {name: spec['value'] for name, spec in content.get('parameters', {}).items()
+            if isinstance(spec, dict) and 'value' in spec}
+
+def load_parameters(path):
+    """Parameter values from an ARM/Bicep parameters file, memoized until the file changes"""
+    stat = os.stat(path)
+    return _parse_parameters(os.path.abspath(path), stat.st_mtime_ns, stat.st_size)
+
+def parameter_files(environment, infra_dir=DEFAULT_INFRA_DIR, env_dir=DEFAULT_ENV_DIR):
+    """Existing parameter files for an environment, platform (Bicep) file first"""
+    name = environment.lower()
+    candidates = [os.path.join(infra_dir, f"main.{name}.parameters.json"),
+                  os.path.join(env_dir, f"{name}.parameters.json")]
+    return [path for path in candidates if os.path.isfile(path)]
+
+def _scenarios(value):
+    return (value, value, value)
+
+def _serverless_vcores(sku):
+    match = re.fullmatch(r'GP_S_Gen5_(\d+)', sku)
+    if not match:
+        raise ValueError(f"Unsupported serverless SQL SKU '{sku}'")
+    return int(match.group(1))
+
+def footprint_drivers(params):
+    """(drivers as (Low, Expected, High) tuples, short notes) for merged parameter values"""
+    drivers, notes = {}, []
+
+    sku = params.get('functionAppSku')
+    if sku is not None:
+        if sku not in FUNCTIONS_SKU_FACTOR:
+            raise ValueError(f"Unsupported Functions plan SKU '{sku}'")
+        low = params.get('functionAppMinInstances', 1)
+        high = min(params.get('functionAppMaxInstances', low), 2 * low)
+        drivers['functions_sku_factor'] = _scenarios(FUNCTIONS_SKU_FACTOR[sku])
+        # Always-ready minimum is the baseline; High doubles it within the plan maximum
+        drivers['functions_instances'] = (low, low, high)
+        notes.append(f"{sku} × {low} (max {params.get('functionAppMaxInstances', low)})")
+
+    premium_units = standard_namespaces = routing_units = 0
+    sku = params.get('serviceBusSku')
+    if sku is not None:
+        if sku == 'Premium':
+            routing_units = params.get('serviceBusCapacity', 1)
+            premium_units += routing_units
+        else:
+            standard_namespaces += 1
+        notes.append(f"Service Bus {sku}")
+    if params.get('schedulerEnabled'):
+        if params.get('schedulerSku') == 'Premium':
+            premium_units += 1
+        else:
+            standard_namespaces += 1
+        notes.append(f"scheduler {params.get('schedulerSku', 'Standard')}")
+    if sku is not None or params.get('schedulerEnabled'):
+        drivers['sb_units'] = _scenarios(standard_namespaces)
+        drivers['sb_premium_units'] = _scenarios(premium_units)
+        drivers['routing_sb_premium_units'] = _scenarios(routing_units)
+
+    sku = params.get('storageAccountSku')
+    if sku is not None:
+        if sku not in STORAGE_REDUNDANCY_FACTOR:
+            raise ValueError(f"Unsupported storage SKU '{sku}'")
+        drivers['storage_redundancy_factor'] = _scenarios(STORAGE_REDUNDANCY_FACTOR[sku])
+        notes.append(sku.replace('Standard_', ''))
+
+    if 'enablePrivateEndpoints' in params:
+        count = 0
+        if params['enablePrivateEndpoints']:
+            count = PRIVATE_ENDPOINTS_BASE + (params.get('serviceBusSku') == 'Premium')
+        drivers['private_endpoints'] = _scenarios(count)
+        notes.append(f"{count} private endpoints")
+
+    if 'enableDdosProtection' in params:
+        drivers['ddos_plans'] = _scenarios(int(bool(params['enableDdosProtection'])))
+        if params['enableDdosProtection']:
+            notes.append("DDoS protection")
+
+    if 'logAnalyticsRetentionInDays' in params:
+        extra_days = max(params['logAnalyticsRetentionInDays'] - INCLUDED_RETENTION_DAYS, 0)
+        drivers['log_retention_extra_months'] = _scenarios(extra_days / 30)
+        notes.append(f"{params['logAnalyticsRetentionInDays']}-day logs")
+
+    sku = params.get('elasticPoolSku')
+    if sku is not None:
+        capacity = params.get('elasticPoolCapacity', 0)
+        for name in ('sql_pool_vcores', *SQL_DTU_POOL_DRIVERS.values()):
+            drivers[name] = _scenarios(0)
+        if sku in SQL_DTU_POOL_DRIVERS:
+            drivers[SQL_DTU_POOL_DRIVERS[sku]] = _scenarios(capacity)
+            notes.append(f"{sku} {capacity} eDTU")
+        elif sku.startswith('GP_'):
+            drivers['sql_pool_vcores'] = _scenarios(capacity)
+            notes.append(f"{sku} {capacity} vCore pool")
+        else:
+            raise ValueError(f"Unsupported elastic pool SKU '{sku}'")
+
+    sku = params.get('controlNumberSku')
+    if sku is not None:
+        drivers['sql_serverless_vcores'] = _scenarios(_serverless_vcores(sku))
+        notes.append(f"control numbers {sku}")
+
+    return drivers, notes
+
+def load_footprint(environment, infra_dir=DEFAULT_INFRA_DIR, env_dir=DEFAULT_ENV_DIR):
+    """Footprint for one environment, or None when it has no parameter files"""
+    sources = parameter_files(environment, infra_dir, env_dir)
+    if not sources:
+        return None
+    params = {}
+    # Environment overlays win over the platform file where both set a value
+    for path in sources:
+        params.update(load_parameters(path))
+    drivers, notes = footprint_drivers(params)
+    return InfraFootprint(environment, params.get('location'), tuple(sources), params, drivers, tuple(notes))
+
+def load_footprints(infra_dir=DEFAULT_INFRA_DIR, env_dir=DEFAULT_ENV_DIR, environments=ENVIRONMENTS):
+    """{environment: InfraFootprint or None}, with every environment loaded concurrently"""
+    with ThreadPoolExecutor(max_workers=len(environments)) as pool:
+        footprints = pool.map(lambda env: load_footprint(env, infra_dir, env_dir), environments)
+        return dict(zip(environments, footprints))
+
+def infra_profiles(footprints, profiles=None):
+    """Environment profiles with each environment's footprint drivers layered over its overrides"""
+    profiles = ENVIRONMENT_PROFILES if profiles is None else profiles
+    merged = {}
+    for env, profile in profiles.items():
+        footprint = footprints.get(env)
+        overrides = dict(profile['overrides'])
+        if footprint is not None:
+            overrides.update(footprint.drivers)
+        merged[env] = dict(profile, overrides=overrides)
+    return merged
+
+if __name__ == "__main__":
+    from time import perf_counter
+
+    from budget_cost_model import SCENARIOS, build_drivers, evaluate, scenario_index
+
+    start = perf_counter()
+    footprints = load_footprints()
+    totals = evaluate(build_drivers(profiles=infra_profiles(footprints))).costs.sum(axis=-1)
+    for i, env in enumerate(ENVIRONMENTS):
+        footprint = footprints[env]
+        detail = '; '.join(footprint.notes) if footprint else 'no parameter files (assumed footprint)'
+        costs = '  '.join(f"{scenario} ${totals[i, scenario_index(scenario)]:>10,.2f}" for scenario in SCENARIOS)
+        print(f"{env:<5} {costs}  [{detail}]")
+    print(f"✓ Priced {len(ENVIRONMENTS)} environments in {perf_counter() - start:.3f}s")
@@ -0,0 +1,135 @@
+"""
+Monte Carlo Sensitivity Simulator
+Samples the Sensitivity Analysis levers from configurable distributions and runs the
+draws through the cost model in NumPy batches spread across a process pool
+"""
+
+import json
+import os
+from collections import namedtuple
+from concurrent.futures import ProcessPoolExecutor
+from time import perf_counter
+
+import numpy as np
+
+from budget_cost_model import build_drivers, compute_costs, env_index, price_vector, scenario_index
+
+DEFAULT_DRAWS = 200_000
+BATCH_SIZE = 50_000
+PERCENTILES = (50, 90, 99)
+
+# Sensitivity Analysis lever -> cost model driver and sampling distribution. Relative levers draw a
+# factor on the base driver so infra, scan and telemetry overrides carry through; floor_base keeps a
+# categorical lever at or above the deployed value
+LEVERS = {
+    'ST transactions per file (× factor)': {
+        'driver': 'st_per_file', 'relative': True, 'dist': 'triangular', 'low': 0.75, 'mode': 1.0, 'high': 2.0},
+    'Log verbosity (% increase)': {
+        'driver': 'log_gb_per_day', 'relative': True, 'dist': 'triangular', 'low': 0.75, 'mode': 1.0, 'high': 2.0},
+    'Functions Premium instance count': {
+        'driver': 'functions_instances', 'floor_base': True, 'dist': 'choice', 'values': [1, 2, 3],
+        'weights': [0.70, 0.25, 0.05]},
+    'Private Endpoint footprint': {
+        'driver': 'private_endpoints', 'floor_base': True, 'dist': 'choice', 'values': [4, 5, 6, 8],
+        'weights': [0.2, 0.5, 0.2, 0.1]},
+    'API Management call volume': {
+        'driver': 'api_calls_per_file', 'relative': True, 'dist': 'lognormal', 'median': 1.0, 'sigma': 0.5},
+    'Purview adoption breadth': {
+        'driver': 'purview_cu', 'dist': 'choice', 'values': [0, 1, 2], 'weights': [0.2, 0.6, 0.2]},
+    'Reprocessing rate (%)': {
+        'driver': 'reprocessing_rate', 'relative': True, 'dist': 'triangular', 'low': 0.6, 'mode': 1.0, 'high': 2.4},
+    'Lifecycle policy delay (days)': {
+        'driver': 'cool_after_days', 'relative': True, 'dist': 'triangular', 'low': 0.5, 'mode': 1.0, 'high': 2.0},
+}
+
+SimulationResult = namedtuple('SimulationResult', ['draws', 'mean', 'percentiles', 'tornado', 'seconds'])
+
+def load_levers(path):
+    """Lever distributions from a JSON file shaped like LEVERS; unlisted levers keep their defaults"""
+    with open(path, encoding='utf-8') as handle:
+        overrides = json.load(handle)
+    levers = {name: dict(spec) for name, spec in LEVERS.items()}
+    for name, spec in overrides.items():
+        levers.setdefault(name, {}).update(spec)
+    return levers
+
+def sample(spec, rng, size):
+    """Draw `size` values from a lever distribution spec"""
+    dist = spec['dist']
+    if dist == 'uniform':
+        return rng.uniform(spec['low'], spec['high'], size)
+    if dist == 'triangular':
+        return rng.triangular(spec['low'], spec['mode'], spec['high'], size)
+    if dist == 'normal':
+        values = rng.normal(spec['mean'], spec['std'], size)
+        return np.clip(values, spec.get('min', -np.inf), spec.get('max', np.inf))
+    if dist == 'lognormal':
+        return rng.lognormal(np.log(spec['median']), spec['sigma'], size)
+    if dist == 'choice':
+        weights = np.asarray(spec.get('weights') or np.ones(len(spec['values'])), dtype=np.float64)
+        return rng.choice(np.asarray(spec['values'], dtype=np.float64), size, p=weights / weights.sum())
+    raise ValueError(f"Unknown distribution '{dist}'")
+
+def lever_values(spec, base, values):
+    """Sampled lever values mapped onto the lever's driver around the base drivers"""
+    value = base[spec['driver']]
+    if spec.get('relative'):
+        return value * values
+    if spec.get('floor_base'):
+        return np.maximum(values, value)
+    return values
+
+def base_drivers(env='Prod', scenario='Expected', profiles=None):
+    """Scalar drivers for one environment/scenario cell of the deterministic model"""
+    i, j = env_index(env), scenario_index(scenario)
+    return {name: values[i, j] for name, values in build_drivers(profiles=profiles).items()}
+
+def _simulate_batch(args):
+    base, levers, size, seed, prices = args
+    rng = np.random.default_rng(seed)
+    drivers = dict(base)
+    for spec in levers.values():
+        drivers[spec['driver']] = lever_values(spec, base, sample(spec, rng, size))
+    return compute_costs(drivers, prices).sum(axis=-1)
+
+def tornado(base, levers, prices=None, samples=20_000, seed=0):
+    """One-at-a-time swing of each lever between its P10 and P90, largest swing first"""
+    rng = np.random.default_rng(seed)
+    names = list(levers)
+    drivers = {name: np.full(2 * len(names), value) for name, value in base.items()}
+    for i, name in enumerate(names):
+        spec = levers[name]
+        p10, p90 = lever_values(spec, base, np.percentile(sample(spec, rng, samples), (10, 90)))
+        drivers[spec['driver']] = drivers[spec['driver']].copy()
+        drivers[spec['driver']][2 * i:2 * i + 2] = (p10, p90)
+    totals = compute_costs(drivers, prices).sum(axis=-1).reshape(len(names), 2)
+    ranking = [(name, low, high) for name, (low, high) in zip(names, totals)]
+    return sorted(ranking, key=lambda row: abs(row[2] - row[1]), reverse=True)
+
+def run_simulation(draws=DEFAULT_DRAWS, levers=None, workers=None, seed=None, env='Prod', scenario='Expected',
+                   profiles=None, prices=None, base=None):
+    """Monthly cost distribution for `draws` samples of the levers
+
+    base holds scalar drivers to sample around (e.g. Prod with scan/telemetry overrides); by default
+    the stock env/scenario cell.
+    """
+    start = perf_counter()
+    levers = LEVERS if levers is None else levers
+    prices = price_vector() if prices is None else prices
+    base = base_drivers(env, scenario, profiles) if base is None else base
+    sizes = [BATCH_SIZE] * (draws // BATCH_SIZE)
+    if draws % BATCH_SIZE:
+        sizes.append(draws % BATCH_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    tasks = [(base, levers, size, child, prices) for size, child in zip(sizes, seeds)]
+
+    workers = min(workers or os.cpu_count() or 1, len(tasks))
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            totals = np.concatenate(list(pool.map(_simulate_batch, tasks)))
+    else:
+        totals = np.concatenate([_simulate_batch(task) for task in tasks])
+
+    percentiles = {p: float(value) for p, value in zip(PERCENTILES, np.percentile(totals, PERCENTILES))}
+    ranking = tornado(base, levers, prices, seed=seed)
+    return SimulationResult(draws, float(totals.mean()), percentiles, ranking, perf_counter() - start)
@@ -0,0 +1,264 @@
+"""
+Cost Optimizer
+Searches Functions plan, Service Bus tier and APIM scale-out for the cheapest configuration
+that keeps every Scaling Trigger SLA satisfied in each month of the growth horizon
+"""
+
+import math
+from collections import namedtuple
+from functools import lru_cache
+from time import perf_counter
+
+import numpy as np
+
+from budget_cost_model import ACK_SLA_SECONDS, DAYS_PER_MONTH, compute_volumes, evaluate
+
+HORIZON_MONTHS = 36
+
+# SLA limits behind the Scaling Triggers & Thresholds table
+STANDARD_MAX_DELIVERIES = 1_000_000
+PREMIUM_MU_DELIVERIES = 100_000_000
+FUNCTIONS_PEAK_FACTOR = 6
+EP1_INVOCATIONS_PER_HOUR = 1_800
+APIM_UNIT_SUSTAINED_REQUESTS = 40_000_000
+LOG_GB_PER_DAY_TRIGGER = 2.0
+RAW_STORAGE_TRIGGER_GB = 2048
+
+FUNCTIONS_SKUS = {'EP1': 1, 'EP2': 2, 'EP3': 4}
+MAX_FUNCTIONS_INSTANCES = 10
+SERVICE_BUS_TIERS = (('Standard', 0), ('Premium', 1), ('Premium', 2), ('Premium', 4))
+APIM_SCALE_OUT_UNITS = (0, 1, 2, 3)
+# Lifecycle thresholds are not searched: without early-deletion or tier-change costs the model always
+# prefers the earliest Cool move; the Storage Projection delay sweep shows that trade-off instead
+
+# (trigger label, threshold text, action) in Sensitivity Analysis order
+TRIGGERS = (
+    ('Routing messages', f"> {STANDARD_MAX_DELIVERIES / 1e6:g}M deliveries/month", 'Evaluate Premium Service Bus'),
+    ('Log ingestion', f"> {LOG_GB_PER_DAY_TRIGGER:g} GB/day", 'Increase sampling / reduce verbosity'),
+    ('ADF activity concurrency waits', '> 5% weekly avg', 'Split pipelines or add parallelization'),
+    ('Function cold start p95', 'Peak invocations above 1 EP1', 'Add Functions capacity'),
+    ('API Management requests', f"> {APIM_UNIT_SUSTAINED_REQUESTS / 1e6:g}M/mo", 'Review throttling or scale-out'),
+    ('Raw storage', f"> {RAW_STORAGE_TRIGGER_GB / 1024:g} TB stored", 'Accelerate lifecycle to Cool'),
+    ('Purview assets', '> 5k catalog expansion', 'Add 1 more CU or optimize schedule'),
+)
+
+Decision = namedtuple('Decision', ['name', 'labels', 'options', 'feasible'])
+
+OptimizerResult = namedtuple('OptimizerResult', [
+    'months', 'volumes', 'fan_out', 'decisions', 'choices', 'costs', 'deployed_costs', 'deployed', 'triggers',
+    'nodes', 'configurations', 'seconds',
+])
+
+def monthly_drivers(base, months=HORIZON_MONTHS):
+    """Scalar drivers with file volume (and log volume with it) compounding at growth_yoy, shaped (month,)"""
+    growth = (1 + base['growth_yoy']) ** (np.arange(months) / 12)
+    drivers = dict(base)
+    drivers['files_per_week'] = base['files_per_week'] * growth
+    drivers['log_gb_per_day'] = base['log_gb_per_day'] * growth
+    return drivers
+
+def _routing_namespace(footprint):
+    params = footprint.parameters if footprint is not None else {}
+    tier = params.get('serviceBusSku', 'Standard')
+    return tier, (params.get('serviceBusCapacity', 1) if tier == 'Premium' else 0), \
+        bool(params.get('enablePrivateEndpoints'))
+
+def build_decisions(base, volumes, footprint=None, fan_out=1.0):
+    """Decision space with per-month feasibility masks shaped (month, option)"""
+    invocations = volumes['router_invocations'] + volumes['orchestrator_invocations']
+    peak_per_hour = invocations / (DAYS_PER_MONTH * 24) * FUNCTIONS_PEAK_FACTOR
+    # Latency: one orchestrator batch window of peak-hour work must clear within the TA1 SLA on
+    # always-ready capacity, since scale-out instances cold start
+    window_hours = 24 / base['orchestrator_batches_per_day']
+    burst_hours = ACK_SLA_SECONDS['TA1'] / 3600
+    required_ep1 = np.maximum.reduce([
+        np.ceil(peak_per_hour / EP1_INVOCATIONS_PER_HOUR),
+        np.ceil(peak_per_hour * window_hours / (EP1_INVOCATIONS_PER_HOUR * burst_hours)),
+        np.ones_like(peak_per_hour),
+    ])
+    deliveries = volumes['routing_messages'] * fan_out
+
+    functions = [(sku, count) for sku in FUNCTIONS_SKUS for count in range(1, MAX_FUNCTIONS_INSTANCES + 1)]
+    capacity = np.array([FUNCTIONS_SKUS[sku] * count for sku, count in functions])
+
+    # The routing namespace is the decision; the scheduler namespace stays as deployed
+    tier, units, endpoints_enabled = _routing_namespace(footprint)
+    other_standard = base['sb_units'] - (tier == 'Standard')
+    other_premium = base['sb_premium_units'] - base['routing_sb_premium_units']
+    other_endpoints = base['private_endpoints'] - (endpoints_enabled and tier == 'Premium')
+    bus_options = []
+    for bus_tier, bus_units in SERVICE_BUS_TIERS:
+        premium = bus_tier == 'Premium'
+        bus_options.append({
+            'sb_units': other_standard + (not premium),
+            'sb_premium_units': other_premium + bus_units,
+            'routing_sb_premium_units': bus_units,
+            'private_endpoints': other_endpoints + (endpoints_enabled and premium),
+        })
+    bus_capacity = np.array([STANDARD_MAX_DELIVERIES if tier == 'Standard' else units * PREMIUM_MU_DELIVERIES
+                             for tier, units in SERVICE_BUS_TIERS])
+
+    # Without an APIM instance there is nothing to scale and no request limit to respect
+    if base['apim_units'] > 0:
+        apim_units = APIM_SCALE_OUT_UNITS
+        apim_capacity = np.array([APIM_UNIT_SUSTAINED_REQUESTS * (1 + units) for units in apim_units])
+    else:
+        apim_units, apim_capacity = (0,), np.full(1, np.inf)
+
+    months = len(deliveries)
+    return [
+        Decision('Functions', [f"{sku} × {count}" for sku, count in functions],
+                 [{'functions_sku_factor': FUNCTIONS_SKUS[sku], 'functions_instances': count}
+                  for sku, count in functions],
+                 capacity[None, :] >= required_ep1[:, None]),
+        Decision('Service Bus', [tier if tier == 'Standard' else f"{tier} × {units} MU"
+                                 for tier, units in SERVICE_BUS_TIERS],
+                 bus_options, deliveries[:, None] <= bus_capacity[None, :]),
+        Decision('APIM Scale-out', [str(units) for units in apim_units],
+                 [{'apim_scale_out_units': units} for units in apim_units],
+                 volumes['api_calls'][:, None] <= apim_capacity[None, :]),
+    ]
+
+def option_deltas(drivers, decisions, prices=None):
+    """Monthly cost change of every option against the deployed configuration, (month, option) per decision
+
+    One batched cost-model pass per decision; the cost model is separable across these decisions,
+    so a configuration's cost is the deployed cost plus the sum of its options' deltas.
+    """
+    deployed = evaluate(drivers, prices).costs.sum(axis=-1)
+    deltas = []
+    for decision in decisions:
+        batch = {name: np.asarray(value, dtype=np.float64)[..., None] for name, value in drivers.items()}
+        for name in decision.options[0]:
+            batch[name] = np.array([option[name] for option in decision.options], dtype=np.float64)
+        deltas.append(evaluate(batch, prices).costs.sum(axis=-1) - deployed[:, None])
+    return deployed, deltas
+
+def optimize(base, footprint=None, fan_out=1.0, prices=None, months=HORIZON_MONTHS):
+    """Cheapest feasible configuration for every month, found by memoized branch-and-bound"""
+    start = perf_counter()
+    drivers = monthly_drivers(base, months)
+    volumes = compute_volumes(drivers)
+    decisions = build_decisions(base, volumes, footprint, fan_out)
+    deployed, deltas = option_deltas(drivers, decisions, prices)
+
+    @lru_cache(maxsize=None)
+    def config_cost(month, config):
+        # Leaves are priced with the full cost model so the separable bound is checked, not trusted
+        leaf = {name: value[month] if np.ndim(value) else value for name, value in drivers.items()}
+        for decision, option in zip(decisions, config):
+            leaf.update(decision.options[option])
+        return float(evaluate(leaf, prices).costs.sum())
+
+    # Branch on the decisions with the widest cost spread first so bounds tighten early
+    order = sorted(range(len(decisions)), key=lambda d: -np.ptp(deltas[d]))
+    nodes = 0
+    choices, costs = [], []
+    incumbent_config = None
+    for month in range(months):
+        feasible = [np.flatnonzero(decisions[d].feasible[month]) for d in order]
+        if any(len(options) == 0 for options in feasible):
+            raise ValueError(f"No feasible configuration in month {month + 1}; widen the option ranges")
+        month_deltas = [deltas[d][month] for d in order]
+        # Cheapest remaining completion for each depth: the admissible lower bound
+        remaining = np.cumsum([min(delta[options]) for delta, options in zip(month_deltas, feasible)][::-1])[::-1]
+        remaining = np.append(remaining, 0.0)
+
+        best_cost, best = math.inf, None
+        # Last month's answer is a strong starting incumbent when it is still feasible
+        if incumbent_config is not None and all(
+                decisions[d].feasible[month, incumbent_config[d]] for d in range(len(decisions))):
+            best, best_cost = incumbent_config, config_cost(month, incumbent_config)
+
+        stack = [(0, deployed[month], ())]
+        while stack:
+            depth, partial, chosen = stack.pop()
+            nodes += 1
+            if partial + remaining[depth] >= best_cost - 1e-9:
+                continue
+            if depth == len(order):
+                config = [0] * len(decisions)
+                for d, option in zip(order, chosen):
+                    config[d] = int(option)
+                config = tuple(config)
+                cost = config_cost(month, config)
+                if cost < best_cost:
+                    best_cost, best = cost, config
+                continue
+            delta = month_deltas[depth]
+            # Push the most expensive first so the cheapest option is expanded next
+            for option in sorted(feasible[depth], key=lambda o: -delta[o]):
+                stack.append((depth + 1, partial + delta[option], chosen + (option,)))
+        choices.append(best)
+        costs.append(best_cost)
+        incumbent_config = best
+
+    configurations = math.prod(len(decision.options) for decision in decisions) * months
+    return OptimizerResult(months, volumes, fan_out, decisions, choices, np.array(costs), deployed,
+                           deployed_labels(base, footprint), trigger_months(drivers, volumes, decisions, fan_out),
+                           nodes, configurations, perf_counter() - start)
+
+def deployed_labels(base, footprint=None):
+    """Deployed configuration in the same terms as the decision labels"""
+    sku = {factor: name for name, factor in FUNCTIONS_SKUS.items()}.get(base['functions_sku_factor'], 'EP1')
+    tier, units, _ = _routing_namespace(footprint)
+    bus = tier if tier == 'Standard' else f"{tier} × {units} MU"
+    return [f"{sku} × {base['functions_instances']:g}", bus, f"{base['apim_scale_out_units']:g}"]
+
+def _first_month(mask):
+    hits = np.flatnonzero(mask)
+    return int(hits[0]) + 1 if hits.size else None
+
+def trigger_months(drivers, volumes, decisions, fan_out=1.0):
+    """{trigger label: first month (1-based) the threshold is crossed, None if not within the horizon,
+    or 'not modeled' when the cost model has no signal for it}"""
+    stored_gb = np.cumsum(volumes['raw_gb'] * (1 + drivers['storage_overhead_ratio']))
+    functions = decisions[0]
+    single_ep1 = functions.labels.index('EP1 × 1')
+    return {
+        'Routing messages': _first_month(volumes['routing_messages'] * fan_out > STANDARD_MAX_DELIVERIES),
+        'Log ingestion': _first_month(drivers['log_gb_per_day'] > LOG_GB_PER_DAY_TRIGGER),
+        'ADF activity concurrency waits': 'not modeled',
+        'Function cold start p95': _first_month(~functions.feasible[:, single_ep1]),
+        'API Management requests': _first_month(volumes['api_calls'] > APIM_UNIT_SUSTAINED_REQUESTS),
+        'Raw storage': _first_month(stored_gb > RAW_STORAGE_TRIGGER_GB),
+        'Purview assets': 'not modeled',
+    }
+
+def brute_force(base, footprint=None, fan_out=1.0, prices=None, months=HORIZON_MONTHS):
+    """Exhaustive reference search: (choices, costs); only practical for checking optimize()"""
+    drivers = monthly_drivers(base, months)
+    decisions = build_decisions(base, compute_volumes(drivers), footprint, fan_out)
+    grids = np.meshgrid(*(np.arange(len(decision.options)) for decision in decisions), indexing='ij')
+    configs = np.stack([grid.ravel() for grid in grids], axis=-1)
+    batch = {name: np.asarray(value, dtype=np.float64)[..., None] for name, value in drivers.items()}
+    for d, decision in enumerate(decisions):
+        for name in decision.options[0]:
+            values = np.array([option[name] for option in decision.options], dtype=np.float64)
+            batch[name] = values[configs[:, d]]
+    totals = evaluate(batch, prices).costs.sum(axis=-1)
+    feasible = np.ones(totals.shape, dtype=bool)
+    for d, decision in enumerate(decisions):
+        feasible &= decision.feasible[:, configs[:, d]]
+    totals = np.where(feasible, totals, np.inf)
+    best = totals.argmin(axis=1)
+    return [tuple(int(option) for option in configs[i]) for i in best], totals[np.arange(months), best]
+
+if __name__ == "__main__":
+    from budget_cost_model import build_drivers, env_index, scenario_index
+    from budget_infra import infra_profiles, load_footprints
+
+    footprints = load_footprints()
+    drivers = build_drivers(profiles=infra_profiles(footprints))
+    base = {name: values[env_index('Prod'), scenario_index('Expected')] for name, values in drivers.items()}
+    result = optimize(base, footprints['Prod'])
+    for month in range(0, result.months, 6):
+        labels = [decision.labels[option] for decision, option in zip(result.decisions, result.choices[month])]
+        print(f"Month {month + 1:>2}: ${result.costs[month]:>10,.2f} (deployed ${result.deployed_costs[month]:>10,.2f}) "
+              f"{' | '.join(labels)}")
+    for trigger, month in result.triggers.items():
+        print(f"  {trigger:<32} {month if month is not None else f'beyond {result.months} months'}")
+    start = perf_counter()
+    _, reference = brute_force(base, footprints['Prod'])
+    print(f"✓ {result.nodes:,} nodes vs {result.configurations:,} configurations in {result.seconds:.3f}s "
+          f"(brute force {perf_counter() - start:.3f}s, max diff ${np.abs(reference - result.costs).max():.6f})")
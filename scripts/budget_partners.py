@@ -0,0 +1,160 @@
+"""
+Partner Cost Attribution
+Parses trading partner configs once into an indexed, cached structure and allocates the
+metered platform costs to partners from their transaction mix and volume share
+"""
+
+import json
+import os
+from collections import namedtuple
+from functools import lru_cache
+
+import numpy as np
+
+from budget_cost_model import SERVICE_INDEX, SERVICE_KEYS
+
+DEFAULT_PARTNER_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'partners', 'samples')
+
+# Share of inbound files by transaction set (platform-wide) when no scan is available
+TRANSACTION_MIX = {
+    '837': 0.40,
+    '270': 0.25,
+    '834': 0.15,
+    '835': 0.10,
+    '276': 0.05,
+    '278': 0.05,
+}
+
+# Relative payload size by transaction set (837/835 batches are the large files)
+FILE_SIZE_FACTOR = {
+    '837': 1.6,
+    '835': 1.4,
+    '834': 1.0,
+    '270': 0.2,
+    '276': 0.2,
+    '278': 0.4,
+}
+
+INBOUND_DIRECTIONS = ('INBOUND', 'BIDIRECTIONAL')
+
+# Metered service -> allocation basis; everything else is shared platform overhead
+METERED_SERVICES = {
+    'service_bus': 'files',
+    'data_factory': 'files',
+    'functions': 'files',
+    'storage': 'gb',
+    'apim': 'api_files',
+}
+
+PartnerIndex = namedtuple('PartnerIndex', [
+    'codes', 'names', 'position', 'partner_types', 'statuses', 'directions', 'endpoints',
+    'transaction_sets', 'transactions', 'active', 'inbound', 'expects_ta1', 'expects_999',
+])
+
+# Why cost stays unallocated -> label; unallocated_by_reason keeps this order
+UNALLOCATED_REASONS = {
+    'no_sender': "Transaction sets with no active inbound partner",
+    'no_api_partner': "APIM with no active REST_API partner",
+}
+
+PartnerAttribution = namedtuple('PartnerAttribution', [
+    'index', 'files', 'costs', 'shared', 'unallocated', 'services', 'unallocated_by_reason',
+])
+
+def _partner_records(directory):
+    for name in sorted(os.listdir(directory)):
+        if not name.endswith('.json'):
+            continue
+        with open(os.path.join(directory, name), encoding='utf-8') as handle:
+            content = json.load(handle)
+        for record in content if isinstance(content, list) else [content]:
+            if isinstance(record, dict) and 'partnerCode' in record:
+                yield record
+
+@lru_cache(maxsize=8)
+def _build_index(directory, signature):
+    records = {}
+    for record in _partner_records(directory):
+        records[record['partnerCode']] = record
+    codes = tuple(sorted(records))
+    transaction_sets = tuple(sorted({ts for r in records.values() for ts in r.get('expectedTransactions', [])}))
+    set_position = {ts: i for i, ts in enumerate(transaction_sets)}
+    transactions = np.zeros((len(codes), len(transaction_sets)), dtype=bool)
+    for row, code in enumerate(codes):
+        for ts in records[code].get('expectedTransactions', []):
+            transactions[row, set_position[ts]] = True
+
+    def column(getter):
+        return [getter(records[code]) for code in codes]
+
+    return PartnerIndex(
+        codes=codes,
+        names=tuple(column(lambda r: r.get('name', r['partnerCode']))),
+        position={code: i for i, code in enumerate(codes)},
+        partner_types=tuple(column(lambda r: r.get('partnerType', 'EXTERNAL'))),
+        statuses=tuple(column(lambda r: r.get('status', 'draft'))),
+        directions=tuple(column(lambda r: r.get('dataFlow', {}).get('direction', 'INBOUND'))),
+        endpoints=tuple(column(lambda r: r.get('endpoint', {}).get('type', 'SFTP'))),
+        transaction_sets=transaction_sets,
+        transactions=transactions,
+        active=np.array(column(lambda r: r.get('status') == 'active'), dtype=bool),
+        inbound=np.array(column(lambda r: r.get('dataFlow', {}).get('direction') in INBOUND_DIRECTIONS), dtype=bool),
+        expects_ta1=np.array(column(lambda r: r.get('acknowledgments', {}).get('expectsTA1', False)), dtype=bool),
+        expects_999=np.array(column(lambda r: r.get('acknowledgments', {}).get('expects999', False)), dtype=bool),
+    )
+
+def load_partner_index(directory=DEFAULT_PARTNER_DIR):
+    """Indexed partner configs; re-parsed only when a file in the directory changes"""
+    directory = os.path.abspath(directory)
+    signature = tuple(
+        (entry.name, entry.stat().st_mtime_ns, entry.stat().st_size)
+        for entry in sorted(os.scandir(directory), key=lambda e: e.name)
+        if entry.name.endswith('.json')
+    )
+    return _build_index(directory, signature)
+
+def transaction_mix_from_scan(scan):
+    """Inbound transaction-set mix observed by the X12 scanner"""
+    total = sum(scan.transactions.values())
+    return {ts: count / total for ts, count in scan.transactions.items()} if total else None
+
+def inbound_weights(index, mix=None):
+    """(partner, transaction set) share of platform inbound files
+
+    Each set's share of traffic is split evenly across the active partners that send it.
+    Columns with no active sender stay zero and surface as unallocated.
+    """
+    mix = TRANSACTION_MIX if mix is None else mix
+    senders = index.transactions & (index.active & index.inbound)[:, None]
+    per_set = np.array([mix.get(ts, 0.0) for ts in index.transaction_sets])
+    counts = senders.sum(axis=0)
+    return np.where(counts > 0, senders * per_set / np.maximum(counts, 1), 0.0)
+
+def attribute_costs(index, service_costs, inbound_files, mix=None):
+    """Allocate one environment/scenario's per-service monthly cost to partners"""
+    mix = TRANSACTION_MIX if mix is None else mix
+    total_mix = sum(mix.values()) or 1.0
+    weights = inbound_weights(index, mix) / total_mix
+    size = np.array([FILE_SIZE_FACTOR.get(ts, 1.0) for ts in index.transaction_sets])
+    api = np.array([endpoint == 'REST_API' for endpoint in index.endpoints])
+
+    file_share = weights.sum(axis=1)
+    api_share = np.where(api, file_share, 0.0)
+    platform_gb = sum(share * FILE_SIZE_FACTOR.get(ts, 1.0) for ts, share in mix.items()) / total_mix
+    bases = {
+        'files': file_share,
+        'gb': (weights * size).sum(axis=1) / platform_gb,
+        # APIM only carries REST_API partners; with none configured it stays unallocated
+        'api_files': api_share / api_share.sum() if api_share.sum() else api_share,
+    }
+
+    services = tuple(METERED_SERVICES)
+    costs = np.column_stack([service_costs[SERVICE_INDEX[s]] * bases[METERED_SERVICES[s]] for s in services])
+    shared_total = sum(cost for key, cost in zip(SERVICE_KEYS, service_costs) if key not in METERED_SERVICES)
+    shared = shared_total * file_share
+    unallocated = float(np.sum(service_costs) - costs.sum() - shared.sum())
+    # APIM either follows the REST_API partners entirely or, with none sending, stays whole
+    no_api = sum(service_costs[SERVICE_INDEX[s]] for s, basis in METERED_SERVICES.items()
+                 if basis == 'api_files' and not api_share.sum())
+    by_reason = {'no_sender': unallocated - float(no_api), 'no_api_partner': float(no_api)}
+    return PartnerAttribution(index, file_share * inbound_files, costs, shared, unallocated, services, by_reason)
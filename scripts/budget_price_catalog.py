@@ -0,0 +1,241 @@
+"""
+Offline Retail Price Catalog
+Indexes a locally stored Azure Retail Prices export (JSON pages/array or CSV) once, persists the
+index next to the export, and prices the cost model meters for any region from it
+"""
+
+import csv
+import os
+import pickle
+import sys
+import tempfile
+from collections import namedtuple
+from functools import lru_cache
+
+from budget_cost_model import PRICING
+
+INDEX_VERSION = 1
+INDEX_SUFFIX = '.index.pkl'
+DEFAULT_REGION = 'eastus'
+DEFAULT_CURRENCY = 'USD'
+
+# Reservations and Dev/Test rates never apply to this PAYG budget
+PRICE_TYPE = 'Consumption'
+
+HOURS_PER_MONTH = 730
+
+PriceIndex = namedtuple('PriceIndex', ['version', 'source', 'size', 'mtime_ns', 'rows', 'regions', 'effective',
+                                       'prices'])
+
+# One catalog meter: tiers are (tierMinimumUnits, retailPrice) ascending
+CatalogPrice = namedtuple('CatalogPrice', ['unit', 'tiers', 'effective'])
+
+# Cost model meter -> catalog components (service, product, sku, meter, unit of measure, tier floor, factor);
+# the meter's price is the sum of retailPrice * factor, converting to the PRICING row's unit
+CATALOG_METERS = {
+    'blob_hot': [('Storage', 'General Block Blob v2', 'Hot LRS', 'Hot LRS Data Stored', '1 GB/Month', 0, 1)],
+    'blob_cool': [('Storage', 'General Block Blob v2', 'Cool LRS', 'Cool LRS Data Stored', '1 GB/Month', 0, 1)],
+    'blob_cold': [('Storage', 'General Block Blob v2', 'Cold LRS', 'Cold LRS Data Stored', '1 GB/Month', 0, 1)],
+    'blob_archive': [('Storage', 'General Block Blob v2', 'Archive LRS', 'Archive LRS Data Stored', '1 GB/Month',
+                      0, 1)],
+    'adf_orchestration': [('Azure Data Factory v2', 'Azure Data Factory v2', 'Cloud',
+                           'Cloud Orchestration Activity Run', '1K', 0, 1)],
+    'adf_data_movement': [('Azure Data Factory v2', 'Azure Data Factory v2', 'Cloud', 'Cloud Data Movement',
+                           '1 Hour', 0, 1)],
+    'func_ep1_vcpu': [('Functions', 'Functions Premium', 'Premium', 'vCPU Duration', '1 Hour', 0, HOURS_PER_MONTH)],
+    'func_ep1_memory': [('Functions', 'Functions Premium', 'Premium', 'Memory Duration', '1 GB Hour', 0,
+                         HOURS_PER_MONTH)],
+    # EP1 is 1 vCPU + 3.5 GB for a month
+    'func_ep1': [('Functions', 'Functions Premium', 'Premium', 'vCPU Duration', '1 Hour', 0, HOURS_PER_MONTH),
+                 ('Functions', 'Functions Premium', 'Premium', 'Memory Duration', '1 GB Hour', 0,
+                  3.5 * HOURS_PER_MONTH)],
+    'func_executions': [('Functions', 'Functions', 'Standard', 'Total Executions', '10', 0, 100_000)],
+    'func_gb_seconds': [('Functions', 'Functions', 'Standard', 'Execution Time', '1 GB Second', 0, 1)],
+    'event_grid_ops': [('Event Grid', 'Event Grid', 'Basic', 'Basic Operations', '1M', 0, 1)],
+    'sb_standard_base': [('Service Bus', 'Service Bus', 'Standard', 'Standard Base Unit', '1/Hour', 0, 1)],
+    'sb_standard_ops': [('Service Bus', 'Service Bus', 'Standard', 'Standard Messaging Operations', '1M', 13, 1)],
+    'sb_premium_unit': [('Service Bus', 'Service Bus', 'Premium', 'Premium Messaging Unit', '1 Hour', 0, 1)],
+    'kv_operations': [('Key Vault', 'Key Vault', 'Standard', 'Operations', '10K', 0, 1)],
+    'log_ingestion': [('Log Analytics', 'Log Analytics', 'Analytics Logs', 'Analytics Logs Data Ingestion', '1 GB',
+                       0, 1)],
+    'log_retention': [('Log Analytics', 'Log Analytics', 'Analytics Logs', 'Analytics Logs Data Retention',
+                       '1 GB/Month', 0, 1)],
+    'monitor_alert_rules': [('Azure Monitor', 'Azure Monitor', 'Alerts', 'Alerts Log Monitored at 15 Minute Frequency',
+                             '1/Month', 0, 1)],
+    'private_endpoint_hours': [('Virtual Network', 'Virtual Network Private Link', 'Standard',
+                                'Standard Private Endpoint', '1 Hour', 0, 1)],
+    'private_link_gb': [('Virtual Network', 'Virtual Network Private Link', 'Standard',
+                         'Standard Data Processed - Ingress', '1 GB', 0, 1)],
+    'ddos_protection': [('Azure DDOS Protection', 'Azure DDOS Protection', 'Network Protection',
+                         'Network Protection Resource Instance', '1/Month', 0, 1)],
+    'sql_vcore': [('SQL Database', 'SQL Database Elastic Pool - General Purpose - Compute Gen5', 'vCore', 'vCore',
+                   '1 Hour', 0, 1)],
+    'sql_serverless_vcore': [('SQL Database', 'SQL Database Single/Elastic Pool General Purpose - Serverless - '
+                              'Compute Gen5', '1 vCore', 'vCore', '1 Hour', 0, 1)],
+    'sql_edtu_basic': [('SQL Database', 'SQL Database Elastic Pool - Basic', 'Basic', 'eDTUs', '1/Hour', 0, 1)],
+    'sql_edtu_standard': [('SQL Database', 'SQL Database Elastic Pool - Standard', 'Standard', 'eDTUs', '1/Hour',
+                           0, 1)],
+    'apim_base': [('API Management', 'API Management', 'Standard v2', 'Standard v2 Unit', '1/Month', 0, 1)],
+    'apim_requests': [('API Management', 'API Management', 'Standard v2', 'Standard v2 Calls', '1M', 0, 1)],
+    'apim_scale_out': [('API Management', 'API Management', 'Standard v2', 'Standard v2 Unit', '1/Month', 0, 1)],
+    'apim_consumption': [('API Management', 'API Management', 'Consumption', 'Consumption Calls', '10K', 0, 1)],
+}
+
+CatalogPricing = namedtuple('CatalogPricing', ['region', 'source', 'effective', 'pricing', 'matched', 'missing'])
+
+def _field(record, *names):
+    for name in names:
+        value = record.get(name)
+        if value not in (None, ''):
+            return value
+    return None
+
+def iter_catalog(path):
+    """Price items from a Retail Prices export: API pages ({"Items": [...]}), a JSON array or CSV"""
+    with open(path, encoding='utf-8-sig', newline='') as handle:
+        if path.lower().endswith('.csv'):
+            yield from csv.DictReader(handle)
+            return
+        from budget_telemetry import iter_json
+        for record in iter_json(handle):
+            if isinstance(record, dict) and 'Items' in record:
+                yield from record['Items']
+            else:
+                yield record
+
+def build_index(path):
+    """Parse the export into {(service, product, sku, meter, region): CatalogPrice}
+
+    Strings are interned so the pickled index stores each distinct name once.
+    """
+    stat = os.stat(path)
+    tiers, units, effective = {}, {}, {}
+    regions = set()
+    rows = 0
+    for item in iter_catalog(path):
+        rows += 1
+        if _field(item, 'type', 'Type') not in (None, PRICE_TYPE):
+            continue
+        if _field(item, 'currencyCode', 'CurrencyCode') not in (None, DEFAULT_CURRENCY):
+            continue
+        region = sys.intern(str(_field(item, 'armRegionName', 'ArmRegionName') or 'global').lower())
+        key = tuple(sys.intern(str(_field(item, name, name[0].upper() + name[1:]) or ''))
+                    for name in ('serviceName', 'productName', 'skuName', 'meterName')) + (region,)
+        tier = float(_field(item, 'tierMinimumUnits', 'TierMinimumUnits') or 0)
+        price = float(_field(item, 'retailPrice', 'RetailPrice', 'unitPrice', 'UnitPrice') or 0)
+        start = str(_field(item, 'effectiveStartDate', 'EffectiveStartDate') or '')[:10]
+        # Exports can carry superseded rates; the latest effective date wins per tier
+        previous = effective.get((key, tier))
+        if previous is not None and previous > start:
+            continue
+        effective[(key, tier)] = start
+        tiers.setdefault(key, {})[tier] = price
+        units[key] = sys.intern(str(_field(item, 'unitOfMeasure', 'UnitOfMeasure') or ''))
+        regions.add(region)
+    prices = {}
+    for key, by_tier in tiers.items():
+        latest = max(effective[(key, tier)] for tier in by_tier)
+        prices[key] = CatalogPrice(units[key], tuple(sorted(by_tier.items())), latest)
+    latest = max((price.effective for price in prices.values()), default='')
+    return PriceIndex(INDEX_VERSION, os.path.abspath(path), stat.st_size, stat.st_mtime_ns, rows,
+                      tuple(sorted(regions)), latest, prices)
+
+def index_path(path, index_dir=None):
+    name = os.path.basename(path) + INDEX_SUFFIX
+    return os.path.join(index_dir, name) if index_dir else os.path.join(os.path.dirname(os.path.abspath(path)), name)
+
+def _fresh(index, path, stat):
+    return (isinstance(index, PriceIndex) and index.version == INDEX_VERSION
+            and index.source == os.path.abspath(path) and index.size == stat.st_size
+            and index.mtime_ns == stat.st_mtime_ns)
+
+@lru_cache(maxsize=4)
+def _load_index(path, mtime_ns, size, index_dir):
+    stat = os.stat(path)
+    persisted = index_path(path, index_dir)
+    try:
+        with open(persisted, 'rb') as handle:
+            index = pickle.load(handle)
+        if _fresh(index, path, stat):
+            return index
+    except (OSError, EOFError, pickle.UnpicklingError, AttributeError):
+        pass
+    index = build_index(path)
+    directory = os.path.dirname(persisted)
+    os.makedirs(directory, exist_ok=True)
+    fd, temp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as handle:
+        pickle.dump(index, handle, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_path, persisted)
+    return index
+
+def load_index(path, index_dir=None):
+    """Price index for an export, parsed only when the export changed since the persisted index was built"""
+    stat = os.stat(path)
+    return _load_index(os.path.abspath(path), stat.st_mtime_ns, stat.st_size, index_dir)
+
+def lookup(index, service, product, sku, meter, region=DEFAULT_REGION, tier=0):
+    """Retail price of the tier that applies at `tier` units, or None when the meter is not in the catalog"""
+    price = index.prices.get((service, product, sku, meter, region.lower()))
+    if price is None:
+        return None, None
+    applicable = [value for floor, value in price.tiers if floor <= tier]
+    return (applicable[-1] if applicable else price.tiers[0][1]), price.unit
+
+def meter_price(index, components, region=DEFAULT_REGION):
+    """Price in the PRICING row's unit, or (None, reason) when a component is missing or in another unit"""
+    total = 0.0
+    for service, product, sku, meter, unit, tier, factor in components:
+        price, found_unit = lookup(index, service, product, sku, meter, region, tier)
+        if price is None:
+            return None, f"{service} / {meter} not in catalog for {region}"
+        if found_unit != unit:
+            return None, f"{service} / {meter} priced per {found_unit!r}, expected {unit!r}"
+        total += price * factor
+    return total, None
+
+def check_region(index, region):
+    """Raise ValueError unless the catalog prices region"""
+    if region.lower() not in index.regions:
+        raise ValueError(f"Region '{region}' is not in {os.path.basename(index.source)} "
+                         f"({len(index.regions)} regions indexed)")
+
+def catalog_pricing(index, region=DEFAULT_REGION, pricing=PRICING, meters=CATALOG_METERS):
+    """PRICING-shaped rows priced from the catalog for region; unmatched meters keep their listed price"""
+    check_region(index, region)
+    rows, matched, missing = [], [], {}
+    for key, label, price, unit, source in pricing:
+        components = meters.get(key)
+        value, reason = meter_price(index, components, region) if components else (None, 'no catalog mapping')
+        if value is None:
+            missing[key] = reason
+            rows.append((key, label, price, unit, f"{source} (listed; {reason})"))
+            continue
+        matched.append(key)
+        rows.append((key, label, value, unit, f"Retail price catalog ({region.lower()})"))
+    return CatalogPricing(region.lower(), index.source, index.effective, rows, tuple(matched), missing)
+
+def describe(priced):
+    """One-line provenance for the Unit Pricing sheet"""
+    return (f"Retail price catalog {os.path.basename(priced.source)} ({priced.region}, effective through "
+            f"{priced.effective or 'unknown'}); {len(priced.matched)} of {len(priced.pricing)} meters from catalog")
+
+if __name__ == "__main__":
+    import argparse
+    from time import perf_counter
+
+    parser = argparse.ArgumentParser(description="Index an Azure retail price export and price the budget meters")
+    parser.add_argument('catalog', help="Retail Prices export (JSON pages/array or CSV)")
+    parser.add_argument('--region', default=DEFAULT_REGION, help="armRegionName to price (default: eastus)")
+    parser.add_argument('--index-dir', help="directory for the persisted index (default: next to the export)")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    index = load_index(args.catalog, args.index_dir)
+    loaded = perf_counter() - start
+    priced = catalog_pricing(index, args.region)
+    for (key, label, price, unit, source), (_, _, listed, _, _) in zip(priced.pricing, PRICING):
+        flag = '' if key in priced.matched else f"  [{priced.missing[key]}]"
+        print(f"{label:<45} {price:>12.6f} (listed {listed:g}) {unit}{flag}")
+    print(f"✓ {index.rows:,} catalog rows, {len(index.prices):,} meters, {len(index.regions)} regions; "
+          f"index ready in {loaded:.3f}s")
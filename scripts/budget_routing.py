@@ -0,0 +1,318 @@
+"""
+Routing Rule Simulator
+Compiles the Service Bus SQL filters in config/routing/routing-rules.json into a dispatch table
+and replays envelope streams through it to count subscription deliveries and billable operations
+"""
+
+import json
+import os
+import re
+from collections import namedtuple
+from time import perf_counter
+
+import numpy as np
+
+DEFAULT_RULES_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'config', 'routing',
+                                  'routing-rules.json')
+
+DEFAULT_REPLAY_MESSAGES = 1_000_000
+DEFAULT_SEED = 0
+BATCH_SIZE = 250_000
+
+# Standard tier bills every API call: one send per message, receive + complete per delivery
+SEND_OPS = 1
+DELIVERY_OPS = 2
+
+ROUTING_TRIGGER_DELIVERIES = 1_000_000
+
+DispatchTable = namedtuple('DispatchTable', ['keys', 'rules', 'subscriptions', 'rule_matches', 'deliveries'])
+
+RoutingResult = namedtuple('RoutingResult', [
+    'table', 'messages', 'key_counts', 'rule_counts', 'subscription_counts', 'unrouted', 'seconds',
+])
+
+_TOKEN = re.compile(r"""
+    \s*(?:
+        (?P<string>'(?:[^']|'')*')
+      | (?P<number>\d+(?:\.\d+)?)
+      | (?P<op><>|!=|<=|>=|=|<|>|\(|\)|,)
+      | (?P<word>[A-Za-z_][\w.]*)
+    )""", re.VERBOSE)
+
+KEYWORDS = {'AND', 'OR', 'NOT', 'LIKE', 'ESCAPE', 'IN', 'IS', 'NULL', 'TRUE', 'FALSE'}
+
+def _tokenize(expression):
+    tokens, pos = [], 0
+    expression = expression.rstrip()
+    while pos < len(expression):
+        match = _TOKEN.match(expression, pos)
+        if not match:
+            raise ValueError(f"Unsupported filter syntax at {expression[pos:]!r}")
+        kind = match.lastgroup
+        text = match.group(kind)
+        if kind == 'string':
+            tokens.append(('literal', text[1:-1].replace("''", "'")))
+        elif kind == 'number':
+            tokens.append(('literal', float(text)))
+        elif kind == 'word' and text.upper() in KEYWORDS:
+            tokens.append(('keyword', text.upper()))
+        else:
+            tokens.append((kind, text))
+        pos = match.end()
+    return tokens
+
+def _like_pattern(pattern, escape=None):
+    parts = []
+    chars = iter(pattern)
+    for char in chars:
+        if escape and char == escape:
+            parts.append(re.escape(next(chars, '')))
+        elif char == '%':
+            parts.append('.*')
+        elif char == '_':
+            parts.append('.')
+        else:
+            parts.append(re.escape(char))
+    return re.compile(''.join(parts), re.DOTALL)
+
+def _and(left, right):
+    if left is False or right is False:
+        return False
+    return None if left is None or right is None else True
+
+def _or(left, right):
+    if left is True or right is True:
+        return True
+    return None if left is None or right is None else False
+
+_COMPARISONS = {
+    '=': lambda a, b: a == b,
+    '<>': lambda a, b: a != b,
+    '!=': lambda a, b: a != b,
+    '<': lambda a, b: a < b,
+    '<=': lambda a, b: a <= b,
+    '>': lambda a, b: a > b,
+    '>=': lambda a, b: a >= b,
+}
+
+class _FilterParser:
+    """Recursive-descent parser for the Service Bus SQL filter subset used by routing rules
+
+    Each node compiles to a closure over a message-properties dict returning True, False or
+    None (SQL unknown); a message matches only when the whole filter is True.
+    """
+
+    def __init__(self, expression):
+        self.expression = expression
+        self.tokens = _tokenize(expression)
+        self.pos = 0
+
+    def parse(self):
+        node = self._or()
+        if self.pos != len(self.tokens):
+            raise ValueError(f"Unexpected {self.tokens[self.pos][1]!r} in filter {self.expression!r}")
+        return node
+
+    def _peek(self, kind=None, value=None):
+        if self.pos >= len(self.tokens):
+            return False
+        token_kind, token_value = self.tokens[self.pos]
+        return (kind is None or token_kind == kind) and (value is None or token_value == value)
+
+    def _take(self, kind=None, value=None):
+        if not self._peek(kind, value):
+            found = self.tokens[self.pos][1] if self.pos < len(self.tokens) else 'end of filter'
+            raise ValueError(f"Expected {value or kind} but found {found!r} in filter {self.expression!r}")
+        token = self.tokens[self.pos]
+        self.pos += 1
+        return token[1]
+
+    def _or(self):
+        node = self._and()
+        while self._peek('keyword', 'OR'):
+            self._take()
+            left, right = node, self._and()
+            node = lambda props, left=left, right=right: _or(left(props), right(props))
+        return node
+
+    def _and(self):
+        node = self._not()
+        while self._peek('keyword', 'AND'):
+            self._take()
+            left, right = node, self._not()
+            node = lambda props, left=left, right=right: _and(left(props), right(props))
+        return node
+
+    def _not(self):
+        if self._peek('keyword', 'NOT'):
+            self._take()
+            inner = self._not()
+            return lambda props: None if (value := inner(props)) is None else not value
+        return self._predicate()
+
+    def _operand(self):
+        if self._peek('literal'):
+            value = self._take()
+            return lambda props: value
+        if self._peek('keyword', 'TRUE') or self._peek('keyword', 'FALSE'):
+            value = self._take() == 'TRUE'
+            return lambda props: value
+        if self._peek('keyword', 'NULL'):
+            self._take()
+            return lambda props: None
+        name = self._take('word')
+        # Custom properties may be written with the user. prefix; sys.* properties are not replayed
+        if name.lower().startswith('user.'):
+            name = name[5:]
+        return lambda props: props.get(name)
+
+    def _predicate(self):
+        if self._peek('op', '('):
+            self._take()
+            node = self._or()
+            self._take('op', ')')
+            return node
+
+        left = self._operand()
+        negate = False
+        if self._peek('keyword', 'IS'):
+            self._take()
+            if self._peek('keyword', 'NOT'):
+                self._take()
+                negate = True
+            self._take('keyword', 'NULL')
+            return lambda props: (left(props) is None) != negate
+        if self._peek('keyword', 'NOT'):
+            self._take()
+            negate = True
+
+        if self._peek('keyword', 'LIKE'):
+            self._take()
+            pattern = self._take('literal')
+            escape = None
+            if self._peek('keyword', 'ESCAPE'):
+                self._take()
+                escape = self._take('literal')
+            regex = _like_pattern(str(pattern), escape)
+
+            def like(props):
+                value = left(props)
+                return None if value is None else (regex.fullmatch(str(value)) is not None) != negate
+            return like
+
+        if self._peek('keyword', 'IN'):
+            self._take()
+            self._take('op', '(')
+            values = [self._take('literal')]
+            while self._peek('op', ','):
+                self._take()
+                values.append(self._take('literal'))
+            self._take('op', ')')
+            members = frozenset(values)
+            return lambda props: None if (value := left(props)) is None else (value in members) != negate
+
+        if negate:
+            raise ValueError(f"NOT must precede LIKE or IN in filter {self.expression!r}")
+        op = self._take('op')
+        if op not in _COMPARISONS:
+            raise ValueError(f"Unsupported operator {op!r} in filter {self.expression!r}")
+        right = self._operand()
+        compare = _COMPARISONS[op]
+
+        def comparison(props):
+            a, b = left(props), right(props)
+            if a is None or b is None:
+                return None
+            try:
+                return compare(a, b)
+            except TypeError:
+                return None
+        return comparison
+
+def compile_filter(expression):
+    """Predicate over a message-properties dict for one SQL filter expression"""
+    node = _FilterParser(expression).parse()
+    return lambda props: node(props) is True
+
+def load_routing_rules(path=DEFAULT_RULES_PATH):
+    """Routing rules ordered by priority"""
+    with open(path, encoding='utf-8') as handle:
+        rules = json.load(handle)['rules']
+    names = [rule['name'] for rule in rules]
+    if len(set(names)) != len(names):
+        raise ValueError(f"Duplicate routing rule names in {path}")
+    return sorted(rules, key=lambda rule: rule.get('priority', 0))
+
+def compile_dispatch_table(rules, keys, key_property='transactionSet'):
+    """Evaluate every filter once per distinct key instead of once per message
+
+    rule_matches is (key, rule); deliveries is (key, subscription). A subscription receives one
+    copy of a message however many of its rules match, as Service Bus ORs a subscription's rules.
+    """
+    keys = tuple(keys)
+    predicates = [compile_filter(rule['filter']) for rule in rules]
+    rule_matches = np.array([[predicate({key_property: key}) for predicate in predicates] for key in keys],
+                            dtype=bool).reshape(len(keys), len(rules))
+    subscriptions = tuple(dict.fromkeys(rule['subscription'] for rule in rules))
+    owner = np.array([subscriptions.index(rule['subscription']) for rule in rules], dtype=np.intp)
+    deliveries = np.zeros((len(keys), len(subscriptions)), dtype=bool)
+    for column, subscription in enumerate(owner):
+        deliveries[:, subscription] |= rule_matches[:, column]
+    return DispatchTable(keys, tuple(rules), subscriptions, rule_matches, deliveries)
+
+def synthetic_stream(mix, messages, seed=None, batch_size=BATCH_SIZE):
+    """Batches of key codes (indices into the mix keys) drawn from the transaction-set mix"""
+    weights = np.asarray(list(mix.values()), dtype=np.float64)
+    rng = np.random.default_rng(seed)
+    remaining = messages
+    while remaining > 0:
+        size = min(batch_size, remaining)
+        yield rng.choice(len(weights), size, p=weights / weights.sum())
+        remaining -= size
+
+def replay(table, batches):
+    """Route a stream of key-code batches; memory is bounded by the largest batch"""
+    start = perf_counter()
+    key_counts = np.zeros(len(table.keys), dtype=np.int64)
+    for codes in batches:
+        key_counts += np.bincount(codes, minlength=len(table.keys))
+    return routing_result(table, key_counts, perf_counter() - start)
+
+def routing_result(table, key_counts, seconds=0.0):
+    """Deliveries per rule and subscription for observed message counts per key"""
+    key_counts = np.asarray(key_counts, dtype=np.int64)
+    unrouted = int(key_counts[~table.deliveries.any(axis=1)].sum())
+    return RoutingResult(table, int(key_counts.sum()), key_counts, key_counts @ table.rule_matches,
+                         key_counts @ table.deliveries, unrouted, seconds)
+
+def fan_out(result):
+    """Average subscription deliveries per routed message"""
+    return result.subscription_counts.sum() / result.messages if result.messages else 0.0
+
+def ops_per_message(result):
+    """Billable Service Bus operations per published message"""
+    return SEND_OPS + DELIVERY_OPS * fan_out(result)
+
+def simulate_routing(rules_path=DEFAULT_RULES_PATH, mix=None, messages=DEFAULT_REPLAY_MESSAGES, seed=DEFAULT_SEED):
+    """Replay a synthetic envelope stream drawn from the transaction mix through the routing rules"""
+    from budget_partners import TRANSACTION_MIX
+    mix = TRANSACTION_MIX if mix is None else mix
+    table = compile_dispatch_table(load_routing_rules(rules_path), mix)
+    return replay(table, synthetic_stream(mix, messages, seed))
+
+def replay_counts(counts, rules_path=DEFAULT_RULES_PATH):
+    """Route observed per-transaction-set counts (e.g. from the X12 scan) exactly"""
+    table = compile_dispatch_table(load_routing_rules(rules_path), counts)
+    return routing_result(table, list(counts.values()))
+
+def budget_routing(rules_path=DEFAULT_RULES_PATH, transactions=None, messages=None, seed=None):
+    """Routing replay the budget is priced from: scanned counts route exactly, otherwise the seeded
+    synthetic stream of the partner mix"""
+    if transactions:
+        return replay_counts(transactions, rules_path)
+    return simulate_routing(rules_path, messages=messages or DEFAULT_REPLAY_MESSAGES,
+                            seed=DEFAULT_SEED if seed is None else seed)
+
+def driver_overrides(result):
+    """Cost model drivers implied by the replay"""
+    return {'sb_ops_per_message': ops_per_message(result)} if result.messages else {}
@@ -0,0 +1,90 @@
+"""
+Storage Lifecycle Projection
+Month-by-month projection of raw storage over the 7-year retention window: each month's
+ingest is a cohort that ages Hot -> Cool -> Cold -> Archive on configurable day thresholds
+"""
+
+from collections import namedtuple
+
+import numpy as np
+
+from budget_cost_model import METER_INDEX, env_index, price_vector, scenario_index
+
+TIERS = ('Hot', 'Cool', 'Cold', 'Archive')
+TIER_METERS = ('blob_hot', 'blob_cool', 'blob_cold', 'blob_archive')
+RETENTION_MONTHS = 84
+DAYS_PER_CALENDAR_MONTH = 365 / 12
+
+# Lifecycle policy delays reported for the Expected scenario
+SWEEP_DELAYS = (0, 30, 60, 90, 180, 365)
+
+StorageProjection = namedtuple('StorageProjection', ['ingest_gb', 'tier_gb', 'monthly_cost'])
+
+def tier_prices(prices=None):
+    prices = price_vector() if prices is None else prices
+    return np.array([prices[METER_INDEX[meter]] for meter in TIER_METERS])
+
+def ingest_schedule(first_month_gb, growth_yoy, months=RETENTION_MONTHS):
+    """Monthly ingest GB compounding at the YoY growth rate, shaped (..., month)"""
+    first = np.asarray(first_month_gb, dtype=np.float64)[..., None]
+    growth = np.asarray(growth_yoy, dtype=np.float64)[..., None]
+    return first * (1 + growth) ** (np.arange(months) / 12)
+
+def tier_masks(thresholds_days, months=RETENTION_MONTHS, retention_months=RETENTION_MONTHS):
+    """One-hot tier for every cohort age, shaped (..., age, tier); aged-out cohorts are zero
+
+    thresholds_days is (..., 3): days after which data moves to Cool, Cold and Archive.
+    """
+    thresholds = np.asarray(thresholds_days, dtype=np.float64)
+    age_days = (np.arange(months) + 0.5) * DAYS_PER_CALENDAR_MONTH
+    tier = (age_days[:, None] >= thresholds[..., None, :]).sum(axis=-1)
+    masks = (tier[..., None] == np.arange(len(TIERS))).astype(np.float64)
+    masks[..., retention_months:, :] = 0.0
+    return masks
+
+def project_storage(first_month_gb, growth_yoy, thresholds_days, prices=None,
+                    months=RETENTION_MONTHS, retention_months=RETENTION_MONTHS, redundancy_factor=1.0):
+    """GB per tier and storage cost for every month; all inputs broadcast over leading axes
+
+    redundancy_factor scales the LRS tier prices for GRS/RA-GRS accounts.
+    """
+    ingest = ingest_schedule(first_month_gb, growth_yoy, months)
+    # Cohort x month lag matrix: lagged[..., m, a] is the ingest of the cohort aged a at month m
+    lag = np.arange(months)[:, None] - np.arange(months)[None, :]
+    lagged = np.where(lag >= 0, ingest[..., np.clip(lag, 0, None)], 0.0)
+    masks = tier_masks(thresholds_days, months, retention_months)
+    tier_gb = np.einsum('...ma,...at->...mt', lagged, masks)
+    monthly_cost = (tier_gb @ tier_prices(prices)) * np.asarray(redundancy_factor, dtype=np.float64)[..., None]
+    return StorageProjection(ingest, tier_gb, monthly_cost)
+
+def thresholds_from_drivers(drivers, delay_days=0):
+    """(..., 3) lifecycle thresholds; a policy delay extends the Hot segment"""
+    cool = drivers['cool_after_days'] + delay_days
+    cold = np.maximum(drivers['cold_after_days'], cool)
+    archive = np.maximum(drivers['archive_after_days'], cold)
+    return np.stack(np.broadcast_arrays(cool, cold, archive), axis=-1)
+
+def first_month_ingest_gb(drivers, volumes):
+    """Stored GB landing in the first projected month (raw + landing/outbound overhead)"""
+    return volumes['raw_gb'] * (1 + drivers['storage_overhead_ratio'])
+
+def sweep_lifecycle_delay(drivers, volumes, delays_days, prices=None):
+    """Total retention-window storage cost for each lifecycle policy delay in one batched pass"""
+    delays = np.asarray(delays_days, dtype=np.float64)
+    thresholds = thresholds_from_drivers(drivers, delays)
+    projection = project_storage(first_month_ingest_gb(drivers, volumes), drivers['growth_yoy'],
+                                 thresholds, prices, redundancy_factor=drivers['storage_redundancy_factor'])
+    return projection.monthly_cost.sum(axis=-1)
+
+def environment_projection(breakdown, env='Prod', delays_days=SWEEP_DELAYS):
+    """(projection for every scenario, Expected delay sweep totals) for one environment of a CostBreakdown"""
+    i, expected = env_index(env), scenario_index('Expected')
+    drivers = {name: values[i] for name, values in breakdown.drivers.items()}
+    volumes = {name: values[i] for name, values in breakdown.volumes.items()}
+    projection = project_storage(first_month_ingest_gb(drivers, volumes), drivers['growth_yoy'],
+                                 thresholds_from_drivers(drivers), breakdown.prices,
+                                 redundancy_factor=drivers['storage_redundancy_factor'])
+    sweep = sweep_lifecycle_delay({name: values[expected] for name, values in drivers.items()},
+                                  {name: values[expected] for name, values in volumes.items()},
+                                  delays_days, breakdown.prices)
+    return projection, sweep
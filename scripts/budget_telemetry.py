@@ -0,0 +1,361 @@
+"""
+Telemetry Calibration
+Streams exported Log Analytics query results (CSV, JSON array or JSON Lines) in fixed-size chunks
+and keeps running aggregates: daily GB ingested, message and invocation counts, latency percentiles
+"""
+
+import csv
+import json
+import os
+from collections import Counter
+from datetime import datetime, timedelta
+from glob import glob
+
+import numpy as np
+
+CHUNK_ROWS = 50_000
+READ_BYTES = 4 * 1024 * 1024
+ROLLING_DAYS = 7
+
+DEFAULT_PATTERNS = ('*.csv', '*.json', '*.jsonl', '*.ndjson')
+
+# Log-spaced latency bins, 0.1 to 1e8 units at ~2.3% resolution; percentiles are bin midpoints
+LATENCY_EDGES = 10 ** np.arange(-1, 8.01, 0.01)
+
+# Portal CSV exports use the browser locale; ISO-8601 is tried first
+_TIME_FORMATS = ('%m/%d/%Y, %I:%M:%S.%f %p', '%m/%d/%Y, %I:%M:%S %p', '%m/%d/%Y %H:%M:%S', '%Y-%m-%d %H:%M:%S')
+
+class LatencyHistogram:
+    """Mergeable fixed-bin histogram; memory is constant however many values are added"""
+
+    def __init__(self):
+        self.counts = np.zeros(len(LATENCY_EDGES) + 1, dtype=np.int64)
+        self.total = 0.0
+
+    def add(self, values):
+        values = np.asarray(values, dtype=np.float64)
+        values = values[np.isfinite(values)]
+        # Clock skew can make a latency slightly negative; it counts in the lowest bin
+        values = np.maximum(values, 0.0)
+        self.counts += np.bincount(np.searchsorted(LATENCY_EDGES, values), minlength=len(self.counts))
+        self.total += float(values.sum())
+
+    @property
+    def count(self):
+        return int(self.counts.sum())
+
+    @property
+    def mean(self):
+        return self.total / self.count if self.count else None
+
+    def percentile(self, q):
+        if not self.count:
+            return None
+        index = int(np.searchsorted(np.cumsum(self.counts), q / 100 * self.count))
+        lower = LATENCY_EDGES[index - 1] if index > 0 else 0.0
+        upper = LATENCY_EDGES[min(index, len(LATENCY_EDGES) - 1)]
+        return float(np.sqrt(lower * upper)) if lower else float(upper)
+
+class TelemetrySummary:
+    """Running totals across every export; per-day dictionaries are the only state that grows"""
+
+    def __init__(self):
+        self.files = 0
+        self.rows = 0
+        self.skipped = []
+        self.sources = Counter()
+        self.usage_gb = Counter()
+        self.billed_gb = Counter()
+        self.messages = Counter()
+        self.invocations = Counter()
+        self.acks = Counter()
+        self.dead_letters = Counter()
+        self.routing_latency_ms = LatencyHistogram()
+        self.outbound_latency_ms = LatencyHistogram()
+        self.ack_latency_s = {}
+
+    @property
+    def daily_gb(self):
+        """GB ingested per day; the Usage table is authoritative over summed _BilledSize"""
+        return self.usage_gb if self.usage_gb else self.billed_gb
+
+    @property
+    def mean_daily_gb(self):
+        return _daily_mean(self.daily_gb)
+
+    @property
+    def messages_per_day(self):
+        return _daily_mean(self.messages)
+
+    @property
+    def invocations_per_day(self):
+        return _daily_mean(self.invocations)
+
+    def ack_latency(self, ack_type):
+        return self.ack_latency_s.setdefault(ack_type, LatencyHistogram())
+
+def _daily_mean(by_day):
+    """Mean per calendar day over the span the export covers (missing days count as zero)"""
+    if not by_day:
+        return 0.0
+    first, last = min(by_day), max(by_day)
+    return sum(by_day.values()) / ((last - first).days + 1)
+
+def rolling_daily(by_day, window=ROLLING_DAYS):
+    """[(day, value, trailing `window`-day mean)] for every day in the span, gaps filled with zero"""
+    if not by_day:
+        return []
+    first, last = min(by_day), max(by_day)
+    days = [first + timedelta(days=i) for i in range((last - first).days + 1)]
+    values = np.array([by_day.get(day, 0.0) for day in days], dtype=np.float64)
+    sums = np.cumsum(values)
+    trailing = sums - np.concatenate([np.zeros(window), sums[:-window]])[:len(sums)]
+    counts = np.minimum(np.arange(1, len(values) + 1), window)
+    return list(zip(days, values.tolist(), (trailing / counts).tolist()))
+
+def iter_json(handle, read_bytes=READ_BYTES):
+    """Objects from a JSON array, JSON Lines or concatenated-object stream without materializing it"""
+    decoder = json.JSONDecoder()
+    buffer, pos, eof = '', 0, False
+    while True:
+        # Skip array punctuation and whitespace between records
+        while pos < len(buffer) and buffer[pos] in ' \t\r\n,[]':
+            pos += 1
+        if pos >= len(buffer):
+            if eof:
+                return
+            buffer, pos = handle.read(read_bytes), 0
+            eof = not buffer
+            continue
+        try:
+            record, end = decoder.raw_decode(buffer, pos)
+        except json.JSONDecodeError:
+            if eof:
+                raise ValueError(f"Truncated or invalid JSON near {buffer[pos:pos + 80]!r}")
+            more = handle.read(read_bytes)
+            eof = not more
+            buffer, pos = buffer[pos:] + more, 0
+            continue
+        yield record
+        pos = end
+
+def read_chunks(path, chunk_rows=CHUNK_ROWS):
+    """Columnar chunks {column: [values]} of at most chunk_rows rows from a CSV or JSON export"""
+    with open(path, encoding='utf-8-sig', newline='') as handle:
+        if path.lower().endswith('.csv'):
+            reader = csv.reader(handle)
+            header = next(reader, None)
+            if header is None:
+                return
+            rows = []
+            for row in reader:
+                rows.append(row)
+                if len(rows) == chunk_rows:
+                    yield dict(zip(header, (list(column) for column in zip(*rows))))
+                    rows = []
+            if rows:
+                yield dict(zip(header, (list(column) for column in zip(*rows))))
+            return
+
+        records = []
+        for record in iter_json(handle):
+            if isinstance(record, dict) and 'tables' in record:
+                raise ValueError("Query API responses must be exported as CSV or a JSON array of rows")
+            records.append(record)
+            if len(records) == chunk_rows:
+                yield _columns(records)
+                records = []
+        if records:
+            yield _columns(records)
+
+def _columns(records):
+    names = dict.fromkeys(name for record in records for name in record)
+    return {name: [record.get(name) for record in records] for name in names}
+
+def _lookup(columns, *names):
+    """First present column among names, matched case-insensitively"""
+    folded = {name.lower(): name for name in columns}
+    for name in names:
+        if name.lower() in folded:
+            return folded[name.lower()]
+    return None
+
+def _parse_times(values):
+    """datetime64[ms] array; unparseable or empty values become NaT"""
+    text = ['' if value is None else str(value).strip().rstrip('Z') for value in values]
+    try:
+        return np.array([value or 'NaT' for value in text], dtype='datetime64[ms]')
+    except ValueError:
+        return np.array([_parse_time(value) for value in text], dtype='datetime64[ms]')
+
+def _parse_time(value):
+    if not value:
+        return 'NaT'
+    try:
+        return np.datetime64(value[:23], 'ms')
+    except ValueError:
+        pass
+    for pattern in _TIME_FORMATS:
+        try:
+            return np.datetime64(datetime.strptime(value, pattern), 'ms')
+        except ValueError:
+            continue
+    return 'NaT'
+
+def _numbers(values):
+    out = np.empty(len(values), dtype=np.float64)
+    for i, value in enumerate(values):
+        try:
+            out[i] = float(value)
+        except (TypeError, ValueError):
+            out[i] = np.nan
+    return out
+
+def _truthy(values):
+    return np.array([str(value).strip().lower() in ('true', '1') for value in values], dtype=bool)
+
+def _add_by_day(counter, times, weights=None):
+    valid = ~np.isnat(times)
+    if not valid.any():
+        return
+    days = times[valid].astype('datetime64[D]')
+    unique, inverse = np.unique(days, return_inverse=True)
+    totals = np.bincount(inverse, weights=None if weights is None else weights[valid], minlength=len(unique))
+    for day, total in zip(unique.tolist(), totals.tolist()):
+        counter[day] += total
+
+def _elapsed(times_end, times_start, unit):
+    delta = (times_end - times_start).astype(np.float64)
+    delta[np.isnat(times_end) | np.isnat(times_start)] = np.nan
+    return delta / (1000.0 if unit == 's' else 1.0)
+
+def classify(columns):
+    """Which telemetry an export holds, from its column names (one query result per file)"""
+    if _lookup(columns, 'DataType') and _lookup(columns, 'Quantity'):
+        return 'usage'
+    if _lookup(columns, 'publishTime_t', 'publishTime') and _lookup(columns, 'validationCompleteTime_t',
+                                                                    'validationCompleteTime'):
+        return 'routing'
+    if _lookup(columns, 'ackType'):
+        return 'ack'
+    if _lookup(columns, 'deadLetterReason'):
+        return 'dead_letter'
+    if _lookup(columns, 'DurationMs', 'duration') and _lookup(columns, 'OperationName', 'Name', 'name'):
+        return 'invocation'
+    if _lookup(columns, '_BilledSize'):
+        return 'billed'
+    return None
+
+def add_chunk(summary, kind, columns):
+    """Fold one columnar chunk of a classified export into the summary"""
+    rows = len(next(iter(columns.values()))) if columns else 0
+    summary.rows += rows
+    time_column = _lookup(columns, 'TimeGenerated', 'timestamp', 'TimeGenerated [UTC]')
+    times = _parse_times(columns[time_column]) if time_column else np.full(rows, 'NaT', dtype='datetime64[ms]')
+
+    if kind == 'usage':
+        quantity = _numbers(columns[_lookup(columns, 'Quantity')])
+        billable = _lookup(columns, 'IsBillable')
+        if billable:
+            quantity = np.where(_truthy(columns[billable]), quantity, 0.0)
+        # Usage.Quantity is in MB
+        _add_by_day(summary.usage_gb, times, np.nan_to_num(quantity) / 1000)
+    elif kind == 'routing':
+        published = _parse_times(columns[_lookup(columns, 'publishTime_t', 'publishTime')])
+        validated = _parse_times(columns[_lookup(columns, 'validationCompleteTime_t', 'validationCompleteTime')])
+        summary.routing_latency_ms.add(_elapsed(published, validated, 'ms'))
+        _add_by_day(summary.messages, times)
+    elif kind == 'ack':
+        ack_types = np.array([str(value) for value in columns[_lookup(columns, 'ackType')]])
+        persisted = _parse_times(columns[_lookup(columns, 'filePersistedTime_t', 'filePersistedTime')])
+        started = _lookup(columns, 'triggerStartTime_t', 'triggerStartTime')
+        ready = _lookup(columns, 'lastOutcomeReadyTime_t', 'lastOutcomeReadyTime')
+        if ready:
+            summary.outbound_latency_ms.add(_elapsed(persisted, _parse_times(columns[ready]), 'ms'))
+        latency = _elapsed(persisted, _parse_times(columns[started]), 's') if started else None
+        for ack_type in np.unique(ack_types).tolist():
+            mask = ack_types == ack_type
+            summary.acks[ack_type] += int(mask.sum())
+            if latency is not None:
+                summary.ack_latency(ack_type).add(latency[mask])
+    elif kind == 'dead_letter':
+        summary.dead_letters.update(str(value) for value in columns[_lookup(columns, 'deadLetterReason')])
+    elif kind == 'invocation':
+        _add_by_day(summary.invocations, times)
+
+    # Any table exported with _BilledSize also reports its own ingestion
+    billed = _lookup(columns, '_BilledSize')
+    if billed:
+        _add_by_day(summary.billed_gb, times, np.nan_to_num(_numbers(columns[billed])) / 1e9)
+
+def export_files(paths, patterns=DEFAULT_PATTERNS):
+    """Export files from a mix of file and directory paths, sorted within each directory"""
+    files = []
+    for path in paths:
+        if os.path.isdir(path):
+            found = {match for pattern in patterns for match in glob(os.path.join(path, '**', pattern), recursive=True)}
+            files.extend(sorted(found))
+        else:
+            files.append(path)
+    return files
+
+def export_signature(paths):
+    """Path, size and mtime of every export, for cache keys"""
+    signature = []
+    for path in export_files(paths):
+        stat = os.stat(path)
+        signature.append((os.path.abspath(path), stat.st_size, stat.st_mtime_ns))
+    return signature
+
+def load_telemetry(paths, chunk_rows=CHUNK_ROWS):
+    """Aggregate every export under paths; peak memory is one chunk plus the running totals"""
+    summary = TelemetrySummary()
+    for path in export_files(paths):
+        kind = None
+        for columns in read_chunks(path, chunk_rows):
+            kind = kind or classify(columns)
+            if kind is None:
+                break
+            add_chunk(summary, kind, columns)
+        if kind is None:
+            summary.skipped.append(path)
+            continue
+        summary.files += 1
+        summary.sources[kind] += 1
+    return summary
+
+def driver_overrides(summary, prod_drivers=None, scenario='Expected'):
+    """Cost model drivers measured by telemetry; file rate is backed out of routed messages"""
+    from budget_cost_model import PROD_DRIVERS, scenario_index
+    prod_drivers = PROD_DRIVERS if prod_drivers is None else prod_drivers
+    column = scenario_index(scenario)
+    overrides = {}
+    if summary.daily_gb:
+        overrides['log_gb_per_day'] = summary.mean_daily_gb
+    if summary.messages:
+        # One routing event per routed ST (reprocessed files route again)
+        per_file = prod_drivers['st_per_file'][column] * (1 + prod_drivers['reprocessing_rate'][column])
+        overrides['files_per_week'] = summary.messages_per_day * 7 / per_file
+    return overrides
+
+def period(summary):
+    """(first day, last day) covered by any daily series, or None"""
+    days = [day for series in (summary.daily_gb, summary.messages, summary.invocations) for day in series]
+    return (min(days), max(days)) if days else None
+
+if __name__ == "__main__":
+    import sys
+    from time import perf_counter
+
+    start = perf_counter()
+    summary = load_telemetry(sys.argv[1:])
+    span = period(summary)
+    print(f"{summary.rows:,} rows from {summary.files} exports {dict(summary.sources)}; "
+          f"skipped {len(summary.skipped)}")
+    if span:
+        print(f"  {span[0]:%Y-%m-%d} .. {span[1]:%Y-%m-%d}: {summary.mean_daily_gb:.2f} GB/day, "
+              f"{summary.messages_per_day:,.0f} messages/day, {summary.invocations_per_day:,.0f} invocations/day")
+    print(f"  routing p95 {summary.routing_latency_ms.percentile(95)} ms")
+    for ack_type, histogram in sorted(summary.ack_latency_s.items()):
+        print(f"  {ack_type} p95 {histogram.percentile(95)} s")
+    print(f"✓ Aggregated in {perf_counter() - start:.2f}s")
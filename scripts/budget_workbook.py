@@ -0,0 +1,230 @@
+"""
+Budget Workbook Backends
+Shared named styles plus a write-only streaming backend that flushes one row at a time,
+so sheets of any size are written with flat peak memory, and a recording backend whose
+sheets can be cached and replayed into either of the other two
+"""
+
+from collections import namedtuple
+
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, NamedStyle, PatternFill
+from openpyxl.utils.cell import column_index_from_string, coordinate_from_string
+
+DOCUMENT_TITLE_STYLE = 'Budget Document Title'
+TITLE_STYLE = 'Budget Title'
+NOTE_STYLE = 'Budget Note'
+HEADER_STYLE = 'Budget Header'
+TOTAL_STYLE = 'Budget Total'
+HIGHLIGHT_STYLE = 'Budget Highlight'
+
+def _named_styles():
+    return [
+        NamedStyle(name=DOCUMENT_TITLE_STYLE, font=Font(size=16, bold=True)),
+        NamedStyle(name=TITLE_STYLE, font=Font(size=14, bold=True)),
+        NamedStyle(name=NOTE_STYLE, font=Font(size=10, italic=True)),
+        NamedStyle(name=HEADER_STYLE, font=Font(bold=True, color="FFFFFF"),
+                   fill=PatternFill(start_color="366092", end_color="366092", fill_type="solid")),
+        NamedStyle(name=TOTAL_STYLE, font=Font(bold=True),
+                   fill=PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")),
+        NamedStyle(name=HIGHLIGHT_STYLE, font=Font(bold=True, size=12),
+                   fill=PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")),
+    ]
+
+def register_styles(wb):
+    """Register the shared named styles once per workbook"""
+    for style in _named_styles():
+        if style.name not in wb.named_styles:
+            wb.add_named_style(style)
+
+def apply_style(cell, style):
+    """Apply a named style without losing the cell's number format"""
+    number_format = cell.number_format
+    cell.style = style
+    cell.number_format = number_format
+    return cell
+
+class StreamingWorksheet:
+    """Cell-addressed facade over a write-only worksheet
+
+    Cells may be addressed like a normal worksheet as long as rows are visited in
+    increasing order; only the current row is held in memory. Column widths must be
+    set before the first row is flushed.
+    """
+
+    def __init__(self, ws):
+        self._ws = ws
+        self._row = 0
+        self._written = 0
+        self._cells = {}
+
+    @property
+    def title(self):
+        return self._ws.title
+
+    @property
+    def column_dimensions(self):
+        return self._ws.column_dimensions
+
+    def cell(self, row, column, value=None):
+        if row < self._row:
+            raise ValueError(f"Row {row} of '{self.title}' was already streamed (current row {self._row})")
+        if row > self._row:
+            self.flush()
+            self._row = row
+        cell = self._cells.get(column)
+        if cell is None:
+            cell = self._cells[column] = WriteOnlyCell(self._ws)
+        if value is not None:
+            cell.value = value
+        return cell
+
+    def __getitem__(self, coordinate):
+        column, row = coordinate_from_string(coordinate)
+        return self.cell(row=row, column=column_index_from_string(column))
+
+    def __setitem__(self, coordinate, value):
+        self[coordinate].value = value
+
+    def flush(self):
+        if not self._cells:
+            return
+        while self._written < self._row - 1:
+            self._ws.append([])
+            self._written += 1
+        width = max(self._cells)
+        self._ws.append([self._cells.get(column) for column in range(1, width + 1)])
+        self._written += 1
+        self._cells = {}
+
+class StreamingWorkbook:
+    """Write-only workbook whose sheets are StreamingWorksheet facades"""
+
+    def __init__(self):
+        self._wb = Workbook(write_only=True)
+        self._sheets = []
+
+    @property
+    def sheetnames(self):
+        return self._wb.sheetnames
+
+    @property
+    def named_styles(self):
+        return self._wb.named_styles
+
+    def add_named_style(self, style):
+        self._wb.add_named_style(style)
+
+    def create_sheet(self, title=None, index=None):
+        sheet = StreamingWorksheet(self._wb.create_sheet(title, index))
+        self._sheets.append(sheet)
+        return sheet
+
+    def save(self, filename):
+        for sheet in self._sheets:
+            sheet.flush()
+        self._wb.save(filename)
+
+SheetRecording = namedtuple('SheetRecording', ['title', 'index', 'widths', 'cells'])
+
+class _RecordedCell:
+    __slots__ = ('value', 'number_format', 'style')
+
+    def __init__(self):
+        self.value = None
+        self.number_format = 'General'
+        self.style = 'Normal'
+
+class _RecordedDimension:
+    __slots__ = ('width',)
+
+    def __init__(self):
+        self.width = None
+
+class _RecordedDimensions(dict):
+    def __missing__(self, key):
+        value = self[key] = _RecordedDimension()
+        return value
+
+class RecordingWorksheet:
+    """Worksheet stand-in that keeps values, number formats, named styles and widths"""
+
+    def __init__(self, title, index=None):
+        self.title = title
+        self.index = index
+        self.column_dimensions = _RecordedDimensions()
+        self._cells = {}
+
+    def cell(self, row, column, value=None):
+        cell = self._cells.get((row, column))
+        if cell is None:
+            cell = self._cells[(row, column)] = _RecordedCell()
+        if value is not None:
+            cell.value = value
+        return cell
+
+    def __getitem__(self, coordinate):
+        column, row = coordinate_from_string(coordinate)
+        return self.cell(row=row, column=column_index_from_string(column))
+
+    def __setitem__(self, coordinate, value):
+        self[coordinate].value = value
+
+    def recording(self):
+        widths = {key: dimension.width for key, dimension in self.column_dimensions.items()
+                  if dimension.width is not None}
+        cells = tuple((row, column, cell.value, cell.number_format, cell.style)
+                      for (row, column), cell in sorted(self._cells.items()))
+        return SheetRecording(self.title, self.index, widths, cells)
+
+class RecordingWorkbook:
+    """Captures the single sheet a create_*_sheet stage builds"""
+
+    def __init__(self):
+        self.sheet = None
+
+    def create_sheet(self, title=None, index=None):
+        self.sheet = RecordingWorksheet(title, index)
+        return self.sheet
+
+def record_sheet(build, *args, **kwargs):
+    """Run a sheet stage against the recording backend and return its SheetRecording"""
+    wb = RecordingWorkbook()
+    build(wb, *args, **kwargs)
+    return wb.sheet.recording()
+
+def replay_sheet(wb, recording):
+    """Write a SheetRecording into a formatted or streaming workbook"""
+    ws = wb.create_sheet(recording.title, recording.index)
+    for key, width in recording.widths.items():
+        ws.column_dimensions[key].width = width
+    # Recordings are row-major, which the streaming backend requires
+    for row, column, value, number_format, style in recording.cells:
+        cell = ws.cell(row=row, column=column, value=value)
+        if number_format != 'General':
+            cell.number_format = number_format
+        if style != 'Normal':
+            apply_style(cell, style)
+    return ws
+
+def append_rows(ws, rows, start_row, number_formats=()):
+    """Write an iterable (typically a generator) of row values on either backend
+
+    number_formats lists a format per column; None leaves the column as General.
+    Returns the first row after the written block.
+    """
+    row = start_row
+    for values in rows:
+        for column, value in enumerate(values, start=1):
+            cell = ws.cell(row=row, column=column, value=value)
+            if column <= len(number_formats) and number_formats[column - 1]:
+                cell.number_format = number_formats[column - 1]
+        row += 1
+    return row
+
+def new_workbook(streaming=False):
+    """Formatted in-memory workbook, or the write-only streaming backend"""
+    wb = StreamingWorkbook() if streaming else Workbook()
+    register_styles(wb)
+    return wb
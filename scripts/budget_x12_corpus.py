@@ -0,0 +1,293 @@
+"""
+Synthetic X12 Corpus Generator
+Writes replay corpora of valid ISA/GS/ST envelopes with sequential control numbers, grown from the
+tests/TestData samples to the file counts, transaction mix and file sizes the budget assumes;
+files are streamed in bounded chunks across a process pool
+"""
+
+import os
+from collections import Counter, namedtuple
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from datetime import datetime
+from functools import lru_cache
+from time import perf_counter
+
+import numpy as np
+
+from budget_cost_model import PROD_DRIVERS, SCENARIOS, scenario_index
+from budget_partners import FILE_SIZE_FACTOR, TRANSACTION_MIX
+from budget_x12_scan import ISA_LENGTH, MB
+
+DEFAULT_TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'tests', 'TestData')
+
+# Repeating detail loop grown to reach a file size: (anchor tag, HL level when the anchor is HL, end tag)
+DETAIL_LOOPS = {
+    '270': ('HL', '22', None),
+    '271': ('HL', '22', None),
+    '837': ('HL', '22', None),
+    '834': ('INS', None, None),
+    '835': ('CLP', None, 'PLB'),
+}
+
+# Lognormal spread of file sizes around each set's mean, and the 837/835 batch peaks
+SIZE_SIGMA = 0.8
+MAX_FILE_MB = 100
+PEAK_BATCH_MB = (50, 100)
+PEAK_BATCH_SETS = ('837', '835')
+PEAK_BATCH_SHARE = 0.01
+
+WRITE_BYTES = 1024 * 1024
+MAX_CONTROL_NUMBER = 999_999_999
+
+Template = namedtuple('Template', [
+    'transaction_set', 'element', 'terminator', 'isa', 'gs', 'st', 'header', 'block', 'trailer', 'block_bytes',
+    'fixed_bytes',
+])
+
+CorpusPlan = namedtuple('CorpusPlan', ['transaction_sets', 'sets', 'sizes', 'st_counts', 'skipped'])
+
+CorpusSummary = namedtuple('CorpusSummary', [
+    'directory', 'files', 'bytes', 'transactions', 'first_control', 'last_control', 'skipped', 'seconds',
+])
+
+def _segments(text, element, terminator):
+    return [segment.strip().split(element) for segment in text.split(terminator) if segment.strip()]
+
+def _block_bounds(transaction_set, body):
+    """(start, end) of the repeating detail loop within the ST body"""
+    anchor, level, end_tag = DETAIL_LOOPS.get(transaction_set, (None, None, None))
+    starts = [i for i, segment in enumerate(body)
+              if segment[0] == anchor and (level is None or segment[3:4] == [level])]
+    if not starts:
+        return len(body), len(body)
+    # A subscriber HL repeats from the last one; other loops repeat from their first occurrence
+    start = starts[-1] if level else starts[0]
+    end = next((i for i in range(start, len(body)) if body[i][0] == end_tag), len(body))
+    return start, end
+
+def parse_template(path):
+    """Template from a sample interchange: envelopes plus the first ST split around its detail loop"""
+    with open(path, encoding='ascii') as handle:
+        text = handle.read()
+    start = text.find('ISA')
+    if start < 0 or len(text) - start < ISA_LENGTH:
+        raise ValueError(f"{path} is not an X12 interchange")
+    text = text[start:]
+    element = text[3]
+    # Keep the sample's line break after each terminator so generated files read the same way
+    terminator = text[ISA_LENGTH - 1] + ('\n' if text[ISA_LENGTH:ISA_LENGTH + 1] in ('\n', '\r') else '')
+    segments = _segments(text, element, text[ISA_LENGTH - 1])
+    tags = [segment[0] for segment in segments]
+    if tags[:3] != ['ISA', 'GS', 'ST'] or 'SE' not in tags:
+        raise ValueError(f"{path} does not start with ISA/GS/ST")
+    se = tags.index('SE')
+    body = segments[3:se]
+    transaction_set = segments[2][1]
+    first, last = _block_bounds(transaction_set, body)
+    header, block, trailer = body[:first], body[first:last], body[last:]
+    join = lambda rows: sum(len(element.join(row)) + len(terminator) for row in rows)
+    return Template(transaction_set, element, terminator, segments[0], segments[1], segments[2], header, block,
+                    trailer, join(block), join(header) + join(trailer) + join([segments[2], segments[se]]))
+
+@lru_cache(maxsize=4)
+def load_templates(directory=DEFAULT_TEMPLATE_DIR):
+    """{transaction set: Template} for every parseable sample under directory"""
+    templates = {}
+    for name in sorted(os.listdir(directory)):
+        try:
+            template = parse_template(os.path.join(directory, name))
+        except (OSError, ValueError, UnicodeDecodeError):
+            continue
+        templates.setdefault(template.transaction_set, template)
+    return templates
+
+def corpus_drivers(scenario='Expected'):
+    """Prod file rate, size and ST-per-file drivers the corpus is drawn from"""
+    column = scenario_index(scenario)
+    return {name: PROD_DRIVERS[name][column] for name in ('files_per_week', 'avg_file_mb', 'st_per_file')}
+
+def plan_corpus(files, templates, mix=None, avg_file_mb=None, st_per_file=None, seed=None,
+                peak_share=PEAK_BATCH_SHARE):
+    """Transaction set, target size and ST count for every file
+
+    Sizes follow the cost model's mean file size weighted by FILE_SIZE_FACTOR, as in partner
+    attribution; sets without a template are dropped from the mix and reported.
+    """
+    drivers = corpus_drivers()
+    avg_file_mb = drivers['avg_file_mb'] if avg_file_mb is None else avg_file_mb
+    st_per_file = drivers['st_per_file'] if st_per_file is None else st_per_file
+    mix = TRANSACTION_MIX if mix is None else mix
+    transaction_sets = tuple(sorted(ts for ts in mix if ts in templates and mix[ts] > 0))
+    skipped = tuple(sorted(ts for ts in mix if ts not in templates))
+    if not transaction_sets:
+        raise ValueError(f"No template for any transaction set in the mix ({', '.join(sorted(mix))})")
+    weights = np.array([mix[ts] for ts in transaction_sets], dtype=np.float64)
+    weights /= weights.sum()
+    factors = np.array([FILE_SIZE_FACTOR.get(ts, 1.0) for ts in transaction_sets])
+    means_mb = avg_file_mb * factors / (weights * factors).sum()
+
+    rng = np.random.default_rng(seed)
+    sets = rng.choice(len(transaction_sets), size=files, p=weights)
+    sizes_mb = rng.lognormal(np.log(means_mb[sets]) - SIZE_SIGMA ** 2 / 2, SIZE_SIGMA)
+    peaks = np.isin(np.array(transaction_sets)[sets], PEAK_BATCH_SETS) & (rng.random(files) < peak_share)
+    sizes_mb = np.where(peaks, rng.uniform(*PEAK_BATCH_MB, size=files), np.minimum(sizes_mb, MAX_FILE_MB))
+    st_counts = 1 + rng.poisson(max(st_per_file - 1, 0), size=files)
+    return CorpusPlan(transaction_sets, sets, (sizes_mb * MB).astype(np.int64), st_counts, skipped)
+
+def _envelopes(template, control, stamp):
+    """ISA and GS segments with the interchange/group control number and timestamp"""
+    isa = list(template.isa)
+    isa[9], isa[10], isa[13] = stamp.strftime('%y%m%d'), stamp.strftime('%H%M'), f"{control:09d}"
+    gs = list(template.gs)
+    gs[4], gs[5], gs[6] = stamp.strftime('%Y%m%d'), stamp.strftime('%H%M'), str(control)
+    return isa, gs
+
+def _block_renderer(template):
+    """(first, last) -> bytes of those detail loop repetitions, renumbering HL ids and in-loop parents"""
+    element, terminator = template.element, template.terminator
+    ids = [row[1] for row in template.block if row[0] == 'HL']
+    if not ids:
+        static = ''.join(element.join(row) + terminator for row in template.block).encode('ascii')
+        return lambda first, last: static * (last - first)
+    # One printf-style pass per batch; offsets hold the HL id each placeholder counts up from
+    rows, offsets = [], []
+    for row in template.block:
+        row = [part.replace('%', '%%') for part in row]
+        if row[0] == 'HL':
+            offsets.append(int(row[1]))
+            row[1] = '%d'
+            if row[2] in ids:
+                offsets.append(int(row[2]))
+                row[2] = '%d'
+        rows.append(element.join(row) + terminator)
+    layout, base = ''.join(rows), np.array(offsets)
+
+    def render(first, last):
+        numbers = base + np.arange(first, last)[:, None] * len(ids)
+        return (layout * (last - first) % tuple(numbers.ravel().tolist())).encode('ascii')
+    return render
+
+def write_interchange(path, template, target_bytes, st_count, control, stamp):
+    """Stream one interchange of st_count transaction sets grown toward target_bytes; returns bytes written"""
+    element, terminator = template.element, template.terminator
+    segment = lambda row: (element.join(row) + terminator).encode('ascii')
+    isa, gs = _envelopes(template, control, stamp)
+    reps = 0
+    if template.block:
+        reps = max(1, round((target_bytes / st_count - template.fixed_bytes) / template.block_bytes))
+    render = _block_renderer(template)
+    batch = max(1, WRITE_BYTES // max(template.block_bytes, 1))
+    head = b''.join(segment(row) for row in template.header)
+    tail = b''.join(segment(row) for row in template.trailer)
+    count = 2 + len(template.header) + reps * len(template.block) + len(template.trailer)
+    with open(path, 'wb', buffering=WRITE_BYTES) as handle:
+        handle.write(segment(isa) + segment(gs))
+        for number in range(1, st_count + 1):
+            st_control = f"{number:04d}"
+            handle.write(segment([template.st[0], template.st[1], st_control, *template.st[3:]]) + head)
+            for first in range(0, reps, batch):
+                # Only one batch of the detail loop is ever held in memory
+                handle.write(render(first, min(first + batch, reps)))
+            handle.write(tail + segment(['SE', str(count), st_control]))
+        handle.write(segment(['GE', str(st_count), str(control)]) + segment(['IEA', '1', f"{control:09d}"]))
+        return handle.tell()
+
+def _write_spec(spec):
+    path, transaction_set, target_bytes, st_count, control, stamp, template_dir = spec
+    template = load_templates(template_dir)[transaction_set]
+    return transaction_set, st_count, write_interchange(path, template, target_bytes, st_count, control, stamp)
+
+def generate_corpus(directory, files=None, weeks=1.0, scenario='Expected', template_dir=DEFAULT_TEMPLATE_DIR,
+                    workers=None, seed=None, first_control=1, peak_share=PEAK_BATCH_SHARE, mix=None):
+    """Write a synthetic corpus sized from the budget drivers; files defaults to files_per_week × weeks"""
+    start = perf_counter()
+    drivers = corpus_drivers(scenario)
+    files = int(round(drivers['files_per_week'] * weeks)) if files is None else files
+    if first_control < 1 or first_control + files - 1 > MAX_CONTROL_NUMBER:
+        raise ValueError(f"Control numbers {first_control}..{first_control + files - 1} exceed ISA13's 9 digits")
+    template_dir = os.path.abspath(template_dir)
+    templates = load_templates(template_dir)
+    plan = plan_corpus(files, templates, mix, drivers['avg_file_mb'], drivers['st_per_file'], seed, peak_share)
+    os.makedirs(directory, exist_ok=True)
+    stamp = datetime.now()
+    width = len(str(first_control + files - 1))
+    specs = (
+        (os.path.join(directory, f"{plan.transaction_sets[s]}_{first_control + i:0{width}d}.x12"),
+         plan.transaction_sets[s], int(plan.sizes[i]), int(plan.st_counts[i]), first_control + i, stamp, template_dir)
+        for i, s in enumerate(plan.sets)
+    )
+
+    written, transactions = 0, Counter()
+
+    def add(result):
+        nonlocal written
+        transaction_set, st_count, size = result
+        written += size
+        transactions[transaction_set] += st_count
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1:
+        # Bounded in-flight window keeps the plan lazy and memory flat however large the corpus
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for spec in specs:
+                pending.add(pool.submit(_write_spec, spec))
+                if len(pending) >= workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        add(future.result())
+            for future in pending:
+                add(future.result())
+    else:
+        for spec in specs:
+            add(_write_spec(spec))
+    return CorpusSummary(directory, files, written, transactions, first_control, first_control + files - 1,
+                         plan.skipped, perf_counter() - start)
+
+def parse_args(argv=None):
+    import argparse
+
+    parser = argparse.ArgumentParser(prog='generate_budget_spreadsheet.py corpus',
+                                     description="Write a synthetic X12 replay corpus sized from the budget drivers")
+    parser.add_argument('directory', help="output directory for the generated .x12 files")
+    parser.add_argument('--files', type=int, default=None, metavar='N',
+                        help="number of files (default: the scenario's files/week × --weeks)")
+    parser.add_argument('--weeks', type=float, default=1.0, help="weeks of traffic to generate (default: 1)")
+    parser.add_argument('--scenario', choices=SCENARIOS, default='Expected',
+                        help="Prod scenario whose file rate, size and ST-per-file drivers are used")
+    parser.add_argument('--templates', default=DEFAULT_TEMPLATE_DIR, metavar='DIR',
+                        help="sample interchanges used as templates (default: tests/TestData)")
+    parser.add_argument('--peak-share', type=float, default=PEAK_BATCH_SHARE, metavar='FRACTION',
+                        help=f"share of 837/835 files drawn as {PEAK_BATCH_MB[0]}-{PEAK_BATCH_MB[1]} MB batch peaks")
+    parser.add_argument('--first-control', type=int, default=1, metavar='N',
+                        help="first ISA13/GS06 control number; files number sequentially from it")
+    parser.add_argument('--workers', type=int, default=None, help="writer processes (default: CPU count)")
+    parser.add_argument('--seed', type=int, default=None, help="random seed for a reproducible corpus")
+    parser.add_argument('--verify', action='store_true', help="re-scan the corpus and check its envelope counts")
+    return parser.parse_args(argv)
+
+def main(argv=None):
+    args = parse_args(argv)
+    summary = generate_corpus(args.directory, args.files, args.weeks, args.scenario, args.templates, args.workers,
+                              args.seed, args.first_control, args.peak_share)
+    mix = ', '.join(f"{ts} {count:,}" for ts, count in sorted(summary.transactions.items()))
+    print(f"✓ Wrote {summary.files:,} files ({summary.bytes / 1024 ** 3:,.2f} GB, {mix} ST) to {summary.directory} "
+          f"in {summary.seconds:.2f}s ({summary.bytes / MB / max(summary.seconds, 1e-9):,.0f} MB/s); "
+          f"control numbers {summary.first_control}-{summary.last_control}")
+    if summary.skipped:
+        print(f"  No template for {', '.join(summary.skipped)}; their share of the mix was redistributed")
+    if args.verify:
+        from budget_x12_scan import scan_directory
+        scan = scan_directory(args.directory, workers=args.workers)
+        expected = (summary.files, summary.files, summary.files, dict(summary.transactions))
+        observed = (scan.files, scan.interchanges, scan.groups, dict(scan.transactions))
+        if observed != expected:
+            print(f"✗ Scan found {observed[:3]} files/ISA/GS and {observed[3]} ST, expected {expected}")
+            return 1
+        print(f"✓ Verified {scan.files:,} files, {scan.interchanges:,} ISA, {scan.groups:,} GS, "
+              f"{sum(scan.transactions.values()):,} ST ({scan.avg_file_mb:,.2f} MB average)")
+    return 0
+
+if __name__ == "__main__":
+    import sys
+    sys.exit(main())
@@ -0,0 +1,174 @@
+"""
+X12 Envelope Scanner
+Walks a directory of raw X12 files and counts ISA/GS/ST envelopes by transaction set plus
+file-size histograms, feeding observed volumes into the budget cost model
+"""
+
+import mmap
+import os
+import re
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from fnmatch import fnmatch
+
+CHUNK_BYTES = 8 * 1024 * 1024
+ISA_LENGTH = 106
+MB = 1024 * 1024
+
+DEFAULT_PATTERNS = ('*.x12', '*.edi', '*.dat', '*.txt')
+
+# File-size histogram bucket upper edges in MB (last bucket is open-ended)
+SIZE_BUCKETS_MB = (0.1, 0.5, 1, 5, 10, 50, 100)
+
+class ScanSummary:
+    """Running totals across all scanned files; memory stays constant regardless of file count"""
+
+    def __init__(self):
+        self.files = 0
+        self.skipped = 0
+        self.bytes = 0
+        self.max_bytes = 0
+        self.interchanges = 0
+        self.groups = 0
+        self.transactions = Counter()
+        self.groups_by_function = Counter()
+        self.size_histogram = [0] * (len(SIZE_BUCKETS_MB) + 1)
+        self.size_histogram_by_set = {}
+
+    def add(self, result):
+        if result is None:
+            self.skipped += 1
+            return
+        size, interchanges, groups, transactions, functions = result
+        self.files += 1
+        self.bytes += size
+        self.max_bytes = max(self.max_bytes, size)
+        self.interchanges += interchanges
+        self.groups += groups
+        self.transactions.update(transactions)
+        self.groups_by_function.update(functions)
+        bucket = size_bucket(size)
+        self.size_histogram[bucket] += 1
+        primary = transactions.most_common(1)[0][0] if transactions else 'none'
+        by_set = self.size_histogram_by_set.setdefault(primary, [0] * len(self.size_histogram))
+        by_set[bucket] += 1
+
+    @property
+    def st_per_file(self):
+        return sum(self.transactions.values()) / self.files if self.files else 0.0
+
+    @property
+    def avg_file_mb(self):
+        return self.bytes / self.files / MB if self.files else 0.0
+
+def size_bucket(size):
+    size_mb = size / MB
+    for i, edge in enumerate(SIZE_BUCKETS_MB):
+        if size_mb < edge:
+            return i
+    return len(SIZE_BUCKETS_MB)
+
+def size_bucket_labels():
+    labels = []
+    lower = 0
+    for edge in SIZE_BUCKETS_MB:
+        labels.append(f"{lower:g}-{edge:g} MB")
+        lower = edge
+    labels.append(f"≥ {lower:g} MB")
+    return labels
+
+def _envelope_pattern(element_sep, segment_term):
+    sep, term = re.escape(element_sep), re.escape(segment_term)
+    stop = re.escape(element_sep + segment_term)
+    return re.compile(term + rb'\s*(ISA|GS|ST)' + sep + rb'([^' + stop + rb']*)')
+
+def scan_file(path, chunk_bytes=CHUNK_BYTES):
+    """(size, ISA count, GS count, ST Counter, GS functional-id Counter), or None when not X12"""
+    size = os.path.getsize(path)
+    if size < ISA_LENGTH:
+        return None
+    with open(path, 'rb') as handle, mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ) as view:
+        start = view.find(b'ISA', 0, 1024)
+        if start < 0 or size - start < ISA_LENGTH:
+            return None
+        # ISA is fixed width: element separator follows the tag, segment terminator ends it
+        element_sep = view[start + 3:start + 4]
+        segment_term = view[start + ISA_LENGTH - 1:start + ISA_LENGTH]
+        pattern = _envelope_pattern(element_sep, segment_term)
+
+        interchanges, groups = 1, 0
+        transactions, functions = Counter(), Counter()
+        pos = start + ISA_LENGTH - 1
+        while pos < size:
+            # Windows end on a terminator so no envelope segment straddles two windows
+            end = view.find(segment_term, min(pos + chunk_bytes, size))
+            end = size if end < 0 else end
+            for match in pattern.finditer(view, pos, end):
+                tag = match.group(1)
+                if tag == b'ST':
+                    transactions[match.group(2).decode('ascii', 'replace').strip()] += 1
+                elif tag == b'GS':
+                    groups += 1
+                    functions[match.group(2).decode('ascii', 'replace').strip()] += 1
+                else:
+                    interchanges += 1
+            pos = end
+    return size, interchanges, groups, transactions, functions
+
+def iter_files(root, patterns=DEFAULT_PATTERNS):
+    """Lazily yield matching file paths under root"""
+    if os.path.isfile(root):
+        yield root
+        return
+    for dirpath, _, filenames in os.walk(root):
+        for name in filenames:
+            if any(fnmatch(name.lower(), pattern) for pattern in patterns):
+                yield os.path.join(dirpath, name)
+
+def directory_signature(root, patterns=DEFAULT_PATTERNS):
+    """(path, mtime, size) for every matching file; changes whenever a rescan would"""
+    signature = []
+    for path in iter_files(root, patterns):
+        stat = os.stat(path)
+        signature.append((os.path.relpath(path, root), stat.st_mtime_ns, stat.st_size))
+    return sorted(signature)
+
+def _scan_safely(path):
+    try:
+        return scan_file(path)
+    except (OSError, ValueError):
+        return None
+
+def scan_directory(root, patterns=DEFAULT_PATTERNS, workers=None):
+    """Scan every matching file under root across a process pool"""
+    summary = ScanSummary()
+    workers = workers or os.cpu_count() or 1
+    paths = iter_files(root, patterns)
+    if workers > 1:
+        # Bounded in-flight window keeps memory flat however many files the walk yields
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            pending = set()
+            for path in paths:
+                pending.add(pool.submit(_scan_safely, path))
+                if len(pending) >= workers * 4:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        summary.add(future.result())
+            for future in pending:
+                summary.add(future.result())
+    else:
+        for path in paths:
+            summary.add(_scan_safely(path))
+    return summary
+
+def driver_overrides(summary, period_days=None):
+    """Cost model drivers observed by the scan; file rate needs the period the files cover"""
+    if not summary.files:
+        return {}
+    overrides = {
+        'st_per_file': summary.st_per_file,
+        'avg_file_mb': summary.avg_file_mb,
+    }
+    if period_days:
+        overrides['files_per_week'] = summary.files * 7 / period_days
+    return overrides
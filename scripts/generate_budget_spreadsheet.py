@@ -1,73 +1,400 @@
 """
 Generate Azure EDI Platform Budget Spreadsheet
-Creates a detailed Excel workbook with service costs, transaction estimates, and scenarios
+Creates a detailed Excel workbook with service costs, transaction estimates, and scenarios,
+plus the same tables as typed Parquet, Arrow, CSV or JSON outputs
 """
 
-from openpyxl import Workbook
-from openpyxl.styles import Font, PatternFill, Alignment, Border, Side
-from openpyxl.utils import get_column_letter
+import argparse
+import importlib
+import sys
+
 from datetime import datetime
 
-def create_budget_spreadsheet():
-    wb = Workbook()
+from budget_cost_model import (
+    CONTINGENCY_RATE, ENVIRONMENTS, METER_INDEX, METER_KEYS, PRICING, SCENARIOS, SERVICES, SERVICE_INDEX,
+    ACK_SLA_SECONDS, DAYS_PER_MONTH, METER_SERVICE, build_drivers, evaluate, env_index, format_price, override_drivers,
+    WEEKS_PER_MONTH, price_vector, scenario_index,
+)
+
+CURRENCY_FORMAT = '"$"#,##0'
+CURRENCY_CENTS_FORMAT = '"$"#,##0.00'
+COUNT_FORMAT = '#,##0'
+PERCENT_FORMAT = '0%'
+DATE_FORMAT = 'yyyy-mm-dd'
+DECIMAL_FORMAT = '#,##0.00'
+PRICE_FORMAT = '"$"#,##0.00####'
+
+# Cell layout the live formulas (--formulas) reference across sheets
+PRICING_SHEET = "Unit Pricing"
+PRICING_ROW = 5
+VOLUMES_SHEET = "Transaction Volumes"
+VOLUME_ROW = 15
+VOLUME_METRICS = (
+    'inbound_files', 'adf_activity_runs', 'router_invocations', 'orchestrator_invocations', 'routing_messages',
+    'service_bus_ops', 'event_grid_events', 'log_gb', 'raw_gb', 'api_calls',
+)
+QUANTITIES_SHEET = "Meter Quantities"
+QUANTITY_ROW = 5
+MONTHLY_COSTS_SHEET = "Monthly Costs (Prod)"
+MONTHLY_COSTS_ROW = 5
+MONTHLY_TOTAL_ROW = MONTHLY_COSTS_ROW + len(SERVICES)
+ROLLUP_SHEET = "Environment Roll-Up"
+ROLLUP_ROW = 4
+
+def create_budget_spreadsheet(simulate_draws=0, levers_path=None, workers=None, seed=None,
+                              scan_dir=None, scan_period_days=None, streaming=False, partners_dir=None,
+                              routing_rules=None, replay_messages=None, cache_dir=None, cache_max_mb=None,
+                              infra_dir=None, env_dir=None, use_infra=True, optimize_months=None,
+                              optimize_scenario='Expected', telemetry_paths=None, formats=('xlsx',),
+                              output_dir=None, price_catalog=None, region=None, catalog_index_dir=None,
+                              formulas=False):
+    from budget_export import check_formats
+    check_formats(formats)
+    
+    # Stage results are content-hashed into the cache; unchanged stages are not recomputed
+    cache = None
+    if cache_dir:
+        from budget_cache import DEFAULT_MAX_BYTES, StageCache
+        max_bytes = int(cache_max_mb * 1024 * 1024) if cache_max_mb else DEFAULT_MAX_BYTES
+        cache = StageCache(cache_dir, max_bytes)
+    
+    # Observed envelope counts and file sizes replace the Expected volume guesses
+    scan = None
+    prod_drivers = None
+    if scan_dir:
+        from budget_x12_scan import directory_signature, driver_overrides, scan_directory
+        scan = _cached(cache, lambda: scan_directory(scan_dir, workers=workers),
+                       'scan', directory_signature(scan_dir), modules=('budget_x12_scan',))
+        prod_drivers = override_drivers(driver_overrides(scan, scan_period_days))
+        print(f"✓ Scanned {scan.files:,} X12 files ({scan.bytes / 1024 ** 3:,.2f} GB) under {scan_dir}")
+    
+    # Routing fan-out replaces the flat ops-per-message guess; scanned counts replay exactly
+    from budget_routing import DEFAULT_RULES_PATH, budget_routing
+    from budget_routing import driver_overrides as routing_overrides
+    routing = budget_routing(routing_rules or DEFAULT_RULES_PATH, scan.transactions if scan is not None else None,
+                             replay_messages, seed)
+    for scenario in SCENARIOS:
+        prod_drivers = override_drivers(routing_overrides(routing), prod_drivers, scenario)
+    print(f"✓ Replayed {routing.messages:,} envelopes through {len(routing.table.rules)} routing rules "
+          f"in {routing.seconds:.2f}s")
+    
+    # Measured log ingestion and routed message rates replace the Expected assumptions
+    telemetry = None
+    plan_drivers = prod_drivers
+    if telemetry_paths:
+        from budget_telemetry import driver_overrides as telemetry_overrides
+        from budget_telemetry import export_signature, load_telemetry
+        telemetry = _cached(cache, lambda: load_telemetry(telemetry_paths), 'telemetry',
+                            export_signature(telemetry_paths), modules=('budget_telemetry',))
+        prod_drivers = override_drivers(telemetry_overrides(telemetry, prod_drivers), prod_drivers)
+        print(f"✓ Aggregated {telemetry.rows:,} telemetry rows from {telemetry.files} exports"
+              + (f" (skipped {len(telemetry.skipped)} unrecognized)" if telemetry.skipped else ''))
+    
+    # Deployed SKUs and counts from the parameter files replace the assumed environment footprint
+    footprints = None
+    profiles = None
+    if use_infra:
+        from budget_infra import DEFAULT_ENV_DIR, DEFAULT_INFRA_DIR, infra_profiles, load_footprints
+        footprints = load_footprints(infra_dir or DEFAULT_INFRA_DIR, env_dir or DEFAULT_ENV_DIR)
+        profiles = infra_profiles(footprints)
+        loaded = [env for env, footprint in footprints.items() if footprint is not None]
+        print(f"✓ Loaded infra parameters for {', '.join(loaded) or 'no environments'}")
+    
+    # Regional retail prices from an offline catalog export replace the listed PAYG prices
+    pricing = PRICING
+    price_source = priced_region = None
+    if price_catalog:
+        from budget_price_catalog import DEFAULT_REGION, catalog_pricing, describe, load_index
+        priced = catalog_pricing(load_index(price_catalog, catalog_index_dir), region or DEFAULT_REGION)
+        pricing = priced.pricing
+        price_source = describe(priced)
+        priced_region = priced.region
+        print(f"✓ Priced {len(priced.matched)} of {len(pricing)} meters from {price_catalog} ({priced.region})"
+              + (f"; {len(priced.missing)} kept listed prices" if priced.missing else ''))
+    elif region:
+        raise ValueError("--region selects prices from a catalog; pass --price-catalog as well")
+    prices = price_vector(pricing)
+    
+    # Price every environment and scenario once; sheets render from the breakdown
+    breakdown = evaluate(build_drivers(prod_drivers, profiles), prices)
+    plan = evaluate(build_drivers(plan_drivers, profiles), prices) if telemetry is not None else breakdown
+    
+    simulation = None
+    if simulate_draws:
+        from budget_monte_carlo import LEVERS, load_levers, run_simulation
+        levers = load_levers(levers_path) if levers_path else LEVERS
+        # Sample around the Prod Expected cell the Monthly Costs sheet shows, overrides included
+        base = {name: float(values[env_index('Prod'), scenario_index('Expected')])
+                for name, values in breakdown.drivers.items()}
+        run = lambda: run_simulation(simulate_draws, levers=levers, workers=workers, seed=seed, prices=prices,
+                                     base=base)
+        # Unseeded draws differ on every run, so only seeded simulations are worth caching
+        if seed is None:
+            simulation = run()
+        else:
+            simulation = _cached(cache, run, 'simulation', simulate_draws, levers, seed, base, prices,
+                                 modules=('budget_monte_carlo', 'budget_cost_model'))
+        print(f"✓ Simulated {simulation.draws:,} draws in {simulation.seconds:.2f}s")
+    
+    # Cheapest SLA-feasible configuration per month as Prod volumes grow
+    from budget_optimizer import HORIZON_MONTHS, optimize
+    from budget_routing import fan_out
+    prod_base = {name: values[env_index('Prod'), scenario_index(optimize_scenario)]
+                 for name, values in breakdown.drivers.items()}
+    optimization = optimize(prod_base, footprints.get('Prod') if footprints else None, fan_out(routing),
+                            breakdown.prices, optimize_months or HORIZON_MONTHS)
+    print(f"✓ Optimized {optimization.months} months in {optimization.seconds:.3f}s "
+          f"({optimization.nodes:,} nodes vs {optimization.configurations:,} configurations)")
+    
+    # Outbound TA1/999 acknowledgments and business responses per partner, set and month
+    from budget_acks import ack_volumes
+    from budget_partners import DEFAULT_PARTNER_DIR, load_partner_index, transaction_mix_from_scan
+    partners = load_partner_index(partners_dir or DEFAULT_PARTNER_DIR)
+    envelopes = {}
+    if scan is not None and scan.files:
+        envelopes = {'interchanges_per_file': scan.interchanges / scan.files, 'groups_per_file': scan.groups / scan.files}
+    expected_base = {name: values[env_index('Prod'), scenario_index('Expected')]
+                     for name, values in breakdown.drivers.items()}
+    acks = ack_volumes(partners, expected_base, transaction_mix_from_scan(scan) if scan is not None else None,
+                       breakdown.prices, optimize_months or HORIZON_MONTHS, **envelopes)
+    print(f"✓ Modeled {acks.messages[..., 0].sum():,.0f} ack/response messages in month 1 across "
+          f"{len(acks.partners):,} partners × {len(acks.transaction_sets)} sets × {acks.months} months "
+          f"in {acks.seconds:.3f}s")
+    
+    inputs = {
+        'breakdown': breakdown,
+        'prepared': datetime.now().strftime('%Y-%m-%d'),
+        'pricing': pricing,
+        'price_source': price_source,
+        'region': priced_region,
+        'scan': scan,
+        'simulation': simulation,
+        'routing': routing,
+        'partners': partners,
+        'infra': footprints,
+        'optimization': optimization,
+        'plan': plan,
+        'telemetry': telemetry,
+        'formulas': formulas,
+        'acks': acks,
+    }
+    
+    outputs = []
+    basename = f"Azure_EDI_Budget_Plan_{datetime.now().strftime('%Y%m%d')}"
+    if 'xlsx' in formats:
+        outputs.append(write_workbook(inputs, f"{basename}.xlsx", streaming, cache))
+    
+    # Typed tables come from the computed inputs, so they never depend on the workbook
+    table_formats = [name for name in formats if name != 'xlsx']
+    if table_formats:
+        from budget_export import build_tables, write_tables
+        directory = output_dir or basename
+        paths = write_tables(build_tables(inputs), directory, table_formats)
+        print(f"✓ Wrote {len(paths)} {'/'.join(table_formats)} tables to {directory}")
+        outputs.extend(paths)
+    
+    if cache is not None:
+        print(f"✓ Cache: {cache.hits} reused, {cache.misses} recomputed ({cache_dir})")
+    return outputs
+
+def write_workbook(inputs, filename, streaming=False, cache=None):
+    """Render every sheet stage from the computed inputs and save the workbook"""
+    from budget_workbook import new_workbook, record_sheet, replay_sheet
+    
+    # Streaming mode writes through write-only worksheets; rows are flushed as they are produced
+    wb = new_workbook(streaming)
     
     # Remove default sheet
     if 'Sheet' in wb.sheetnames:
         wb.remove(wb['Sheet'])
     
-    # Create sheets
-    create_summary_sheet(wb)
-    create_unit_pricing_sheet(wb)
-    create_monthly_costs_sheet(wb)
-    create_transaction_volumes_sheet(wb)
-    create_environment_rollup_sheet(wb)
-    create_sensitivity_analysis_sheet(wb)
+    # Create sheets; formula mode records them so the formulas can be evaluated before saving
+    recordings = []
+    for build, names, modules in SHEET_STAGES:
+        stage_inputs = {name: inputs[name] for name in names}
+        if cache is None and not inputs.get('formulas'):
+            build(wb, **stage_inputs)
+            continue
+        recording = _cached(cache, lambda: record_sheet(build, **stage_inputs),
+                            build.__name__, stage_inputs, modules=modules)
+        replay_sheet(wb, recording)
+        recordings.append(recording)
+    
+    if inputs.get('formulas'):
+        check_formulas(recordings, inputs['breakdown'])
     
     # Save workbook
-    filename = f"Azure_EDI_Budget_Plan_{datetime.now().strftime('%Y%m%d')}.xlsx"
     wb.save(filename)
     print(f"✓ Created: {filename}")
     return filename
 
-def create_summary_sheet(wb):
+def _cached(cache, compute, *key_parts, modules=()):
+    """compute() through the stage cache, keyed on its inputs and the code that produces it"""
+    if cache is None:
+        return compute()
+    from budget_cache import content_hash, source_hash
+    
+    # Every sheet renders through budget_workbook and prices with budget_cost_model helpers
+    names = dict.fromkeys(('budget_workbook', 'budget_cost_model') + tuple(modules))
+    modules = [importlib.import_module(name) for name in names]
+    code = source_hash(sys.modules[__name__], *modules)
+    return cache.memoize(content_hash(code, *key_parts), compute)
+
+def check_formulas(recordings, breakdown):
+    """Evaluate the live cost formulas and confirm they reproduce the cost model"""
+    from budget_formulas import FormulaEvaluator, coordinate, workbook_cells
+    
+    evaluator = FormulaEvaluator(workbook_cells(recordings))
+    evaluator.calculate()
+    totals = breakdown.costs.sum(axis=-1)
+    expected = []
+    for col, scenario in enumerate(SCENARIOS, start=2):
+        s = scenario_index(scenario)
+        for row, (key, _) in enumerate(SERVICES, start=MONTHLY_COSTS_ROW):
+            expected.append((MONTHLY_COSTS_SHEET, row, col, breakdown.costs[env_index('Prod'), s, SERVICE_INDEX[key]]))
+        for row, env in enumerate(ENVIRONMENTS, start=ROLLUP_ROW):
+            expected.append((ROLLUP_SHEET, row, col, totals[env_index(env), s]))
+    annual = totals[:, scenario_index('Expected')].sum() * 12
+    expected.append(("Executive Summary", 13, 7, annual * (1 + CONTINGENCY_RATE)))
+    
+    for sheet, row, column, value in expected:
+        actual = evaluator.values.get((sheet, row, column))
+        if actual is None or abs(actual - value) > 1e-6 * max(1.0, abs(value)):
+            raise ValueError(f"'{sheet}'!{coordinate(row, column)} evaluates to {actual} but the cost model "
+                             f"gives {float(value)}")
+    print(f"✓ Evaluated {evaluator.formulas:,} formulas in {evaluator.seconds:.3f}s; "
+          f"{len(expected)} cost cells match the cost model")
+    return evaluator
+
+def _money(ws, row, column, value, number_format=CURRENCY_FORMAT, formula=None):
+    """Currency cell holding the formula when one is given, else the rounded value"""
+    cell = ws.cell(row=row, column=column, value=formula or round(float(value), 2))
+    cell.number_format = number_format
+    return cell
+
+def _price_ref(key, absolute=True):
+    from budget_formulas import cell_ref
+    return cell_ref(PRICING_SHEET, PRICING_ROW + METER_INDEX[key], 2, absolute)
+
+def _quantity_column(env, scenario):
+    return 3 + env_index(env) * len(SCENARIOS) + scenario_index(scenario)
+
+def _volume_ref(name):
+    from budget_formulas import cell_ref
+    return cell_ref(VOLUMES_SHEET, VOLUME_ROW + VOLUME_METRICS.index(name), 2)
+
+def _cost_formula(meters, env, scenario):
+    """SUMPRODUCT of unit prices and billable quantities, one term per contiguous run of meters"""
+    from budget_formulas import range_ref
+    rows = sorted(METER_INDEX[key] for key in meters)
+    runs = []
+    for index in rows:
+        if runs and runs[-1][1] == index - 1:
+            runs[-1][1] = index
+        else:
+            runs.append([index, index])
+    column = _quantity_column(env, scenario)
+    return '=' + '+'.join(
+        f"SUMPRODUCT({range_ref(PRICING_SHEET, PRICING_ROW + first, 2, PRICING_ROW + last, 2, True)},"
+        f"{range_ref(QUANTITIES_SHEET, QUANTITY_ROW + first, column, QUANTITY_ROW + last, column)})"
+        for first, last in runs
+    )
+
+def _service_cost_formula(key, env, scenario):
+    return _cost_formula([meter for meter, service in METER_SERVICE.items() if service == key], env, scenario)
+
+def _quantity_formulas(breakdown):
+    """Prod Expected billable quantities as formulas over the Transaction Volumes cells
+
+    Mirrors compute_quantities with the Prod Expected drivers inlined as constants.
+    """
+    from budget_formulas import number
+    
+    prod, expected = env_index('Prod'), scenario_index('Expected')
+    d = {name: float(values[prod, expected]) for name, values in breakdown.drivers.items()}
+    raw, router = _volume_ref('raw_gb'), _volume_ref('router_invocations')
+    hot_days = min(d['cool_after_days'], 365)
+    cool_days = min(max(d['cold_after_days'], hot_days), 365) - hot_days
+    stored = f"{raw}*(1+{number(d['storage_overhead_ratio'])})"
+    redundancy = number(d['storage_redundancy_factor'])
+    formulas = {
+        'blob_hot': f"={stored}*{number(hot_days)}/{DAYS_PER_MONTH}*{redundancy}",
+        'blob_cool': f"={stored}*{number(cool_days)}/{DAYS_PER_MONTH}*{redundancy}",
+        'adf_orchestration': f"={_volume_ref('adf_activity_runs')}/1000",
+        'adf_data_movement': f"={router}*{number(d['copy_diu'])}*{number(d['copy_minutes'])}/60",
+        'event_grid_ops': f"=MAX({_volume_ref('event_grid_events')}-100000,0)/1000000",
+        'kv_operations': f"=({router}+{_volume_ref('orchestrator_invocations')})"
+                         f"*{number(d['kv_ops_per_invocation'])}/10000",
+        'log_ingestion': f"={_volume_ref('log_gb')}",
+        'log_retention': f"={_volume_ref('log_gb')}*{number(d['log_retention_extra_months'])}",
+        'private_link_gb': f"={raw}*{number(d['private_link_passes'])}",
+    }
+    # Premium namespaces include operations and APIM overage only applies when APIM is deployed
+    if d['routing_sb_premium_units'] == 0:
+        formulas['sb_standard_ops'] = f"=MAX({_volume_ref('service_bus_ops')}-13000000,0)/1000000"
+    if d['apim_units'] > 0:
+        formulas['apim_requests'] = f"=MAX({_volume_ref('api_calls')}-50000000,0)/1000000"
+    return formulas
+
+def create_summary_sheet(wb, breakdown, prepared=None, region=None, infra=None, formulas=False):
     """Executive summary with key numbers"""
+    from budget_workbook import (
+        DOCUMENT_TITLE_STYLE, HEADER_STYLE, HIGHLIGHT_STYLE, NOTE_STYLE, TITLE_STYLE, apply_style,
+    )
+    
     ws = wb.create_sheet("Executive Summary", 0)
     
+    # Set column widths
+    ws.column_dimensions['A'].width = 35
+    ws.column_dimensions['B'].width = 15
+    ws.column_dimensions['C'].width = 15
+    ws.column_dimensions['D'].width = 40
+    ws.column_dimensions['E'].width = 15
+    ws.column_dimensions['F'].width = 15
+    ws.column_dimensions['G'].width = 20
+    
+    prod = env_index('Prod')
+    totals = breakdown.costs.sum(axis=-1)
+    if formulas:
+        from budget_formulas import cell_ref
+        prod_total_ref = lambda col: cell_ref(MONTHLY_COSTS_SHEET, MONTHLY_TOTAL_ROW, col)
+    
     # Header
     ws['A1'] = "Healthcare EDI Platform - Azure Budget Summary"
-    ws['A1'].font = Font(size=16, bold=True)
-    ws['A2'] = f"Prepared: {datetime.now().strftime('%Y-%m-%d')}"
-    ws['A2'].font = Font(size=10, italic=True)
+    apply_style(ws['A1'], DOCUMENT_TITLE_STYLE)
+    ws['A2'] = f"Prepared: {prepared or datetime.now().strftime('%Y-%m-%d')}"
+    apply_style(ws['A2'], NOTE_STYLE)
     
     # Key metrics
     ws['A4'] = "Budget Scenarios (Production Monthly)"
-    ws['A4'].font = Font(size=14, bold=True)
+    apply_style(ws['A4'], TITLE_STYLE)
     
     headers = ['Scenario', 'Monthly Cost', 'Annual Cost', 'Notes']
     for col, header in enumerate(headers, start=1):
         cell = ws.cell(row=6, column=col)
         cell.value = header
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
+        apply_style(cell, HEADER_STYLE)
     
     scenarios = [
-        ['Low (Optimized)', '$439', '$5,268', 'Deferred features (no APIM, no Purview)'],
-        ['Expected (Baseline)', '$1,438', '$17,256', 'Full VNet integration + API Management'],
-        ['High (Peak/Contingency)', '$2,147', '$25,764', 'Peak volume + 2x Functions instances'],
+        ['Low (Optimized)', 'Deferred features (no APIM, no Purview)'],
+        ['Expected (Baseline)', 'Full VNet integration + API Management'],
+        ['High (Peak/Contingency)', 'Peak volume + 2x Functions instances'],
     ]
     
-    for row, data in enumerate(scenarios, start=7):
-        for col, value in enumerate(data, start=1):
-            ws.cell(row=row, column=col, value=value)
+    for row, (data, scenario) in enumerate(zip(scenarios, SCENARIOS), start=7):
+        monthly = totals[prod, scenario_index(scenario)]
+        ws.cell(row=row, column=1, value=data[0])
+        _money(ws, row, 2, monthly, formula=f"={prod_total_ref(2 + scenario_index(scenario))}" if formulas else None)
+        _money(ws, row, 3, monthly * 12, formula=f"=B{row}*12" if formulas else None)
+        ws.cell(row=row, column=4, value=data[1])
     
     # Annual budget ask
     ws['A11'] = "Year 1 Budget Request (All Environments)"
-    ws['A11'].font = Font(size=14, bold=True)
+    apply_style(ws['A11'], TITLE_STYLE)
     
     ws['A12'] = "Scenario"
-    ws['B12'] = "Dev (25%)"
-    ws['C12'] = "Test (40%)"
+    ws['B12'] = "Dev"
+    ws['C12'] = "Test"
     ws['D12'] = "Prod"
     ws['E12'] = "Total/Month"
     ws['F12'] = "Annual"
@@ -75,32 +402,39 @@ def create_summary_sheet(wb):
     
     for col in range(1, 8):
         cell = ws.cell(row=12, column=col)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
+        apply_style(cell, HEADER_STYLE)
     
+    expected = scenario_index('Expected')
+    monthly_total = totals[:, expected].sum()
     ws['A13'] = "Expected"
-    ws['B13'] = "$424"
-    ws['C13'] = "$603"
-    ws['D13'] = "$1,438"
-    ws['E13'] = "$2,465"
-    ws['F13'] = "$29,580"
-    ws['G13'] = "$35,500"
+    for col, env in enumerate(ENVIRONMENTS, start=2):
+        _money(ws, 13, col, totals[env_index(env), expected],
+               formula=f"={cell_ref(ROLLUP_SHEET, ROLLUP_ROW + env_index(env), 2 + expected)}" if formulas else None)
+    _money(ws, 13, 5, monthly_total, formula="=SUM(B13:D13)" if formulas else None)
+    _money(ws, 13, 6, monthly_total * 12, formula="=E13*12" if formulas else None)
+    _money(ws, 13, 7, monthly_total * 12 * (1 + CONTINGENCY_RATE),
+           formula=f"=F13*(1+{CONTINGENCY_RATE})" if formulas else None)
     
-    ws['G13'].font = Font(bold=True, size=12)
-    ws['G13'].fill = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
+    apply_style(ws['G13'], HIGHLIGHT_STYLE)
     
     # Key assumptions
     ws['A16'] = "Key Assumptions"
-    ws['A16'].font = Font(size=14, bold=True)
+    apply_style(ws['A16'], TITLE_STYLE)
     
+    prod_footprint = (infra or {}).get('Prod')
+    prod_drivers = {name: values[env_index('Prod'), expected] for name, values in breakdown.drivers.items()}
+    files_per_week = prod_drivers['files_per_week']
+    transactions_per_year = files_per_week * 52 * prod_drivers['st_per_file']
     assumptions = [
         "• VNet Integration: All services use private endpoints and managed VNet",
-        "• Functions: Premium EP1 plan required for VNet integration",
+        f"• Prod footprint (parameter files): {', '.join(prod_footprint.notes)}" if prod_footprint
+        else "• Functions: Premium EP1 plan required for VNet integration",
         "• API Management: Standard v2 tier (50M requests/mo included)",
-        "• Volume: ~5,000 files/week, ~250K claims/year",
+        f"• Volume: ~{files_per_week:,.0f} files/week, "
+        f"~{transactions_per_year / 1000:,.0f}K transactions/year (Prod)",
         "• Environments: Dev, Test, Prod (3 total)",
-        "• Region: Single primary region (East US assumed)",
+        f"• Region: Single primary region ({region} catalog prices)" if region
+        else "• Region: Single primary region (East US assumed)",
         "• Retention: 7-year immutable storage with lifecycle tiering",
     ]
     
@@ -109,7 +443,7 @@ def create_summary_sheet(wb):
     
     # Top cost drivers
     ws['A26'] = "Top Cost Drivers (Expected Scenario)"
-    ws['A26'].font = Font(size=14, bold=True)
+    apply_style(ws['A26'], TITLE_STYLE)
     
     ws['A27'] = "Service"
     ws['B27'] = "Monthly Cost"
@@ -117,167 +451,191 @@ def create_summary_sheet(wb):
     
     for col in range(1, 4):
         cell = ws.cell(row=27, column=col)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
-    
-    drivers = [
-        ['API Management', '$700', '49%'],
-        ['Purview Data Governance', '$190', '13%'],
-        ['Data Factory', '$215', '15%'],
-        ['Functions Premium', '$170', '12%'],
-        ['Log Analytics', '$85', '6%'],
-        ['Other', '$78', '5%'],
-    ]
+        apply_style(cell, HEADER_STYLE)
     
-    for row, data in enumerate(drivers, start=28):
-        for col, value in enumerate(data, start=1):
-            ws.cell(row=row, column=col, value=value)
+    service_costs = breakdown.costs[prod, expected]
+    prod_total = service_costs.sum()
+    ranked = sorted(zip(service_costs, (label for _, label in SERVICES)), reverse=True)
+    drivers = [[label, cost] for cost, label in ranked[:5]]
+    drivers.append(['Other', sum(cost for cost, _ in ranked[5:])])
     
-    # Set column widths
-    ws.column_dimensions['A'].width = 35
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 40
-    ws.column_dimensions['E'].width = 15
-    ws.column_dimensions['F'].width = 15
-    ws.column_dimensions['G'].width = 20
+    # Live formulas keep the ranking from generation time but follow edited prices and volumes
+    expected_total = prod_total_ref(2 + expected) if formulas else None
+    service_rows = {label: row for row, (_, label) in enumerate(SERVICES, start=MONTHLY_COSTS_ROW)}
+    for row, (label, cost) in enumerate(drivers, start=28):
+        ws.cell(row=row, column=1, value=label)
+        if not formulas:
+            formula = None
+        elif label in service_rows:
+            formula = f"={cell_ref(MONTHLY_COSTS_SHEET, service_rows[label], 2 + expected)}"
+        else:
+            formula = f"={expected_total}-SUM(B28:B{row - 1})"
+        _money(ws, row, 2, cost, formula=formula)
+        share = ws.cell(row=row, column=3, value=f"=B{row}/{expected_total}" if formulas and prod_total
+                        else float(cost / prod_total) if prod_total else 0.0)
+        share.number_format = PERCENT_FORMAT
 
-def create_unit_pricing_sheet(wb):
+def create_unit_pricing_sheet(wb, pricing=PRICING, price_source=None, formulas=False):
     """Detailed unit pricing for all services"""
-    ws = wb.create_sheet("Unit Pricing")
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, append_rows, apply_style
+    
+    ws = wb.create_sheet(PRICING_SHEET)
+    
+    # Set column widths
+    ws.column_dimensions['A'].width = 40
+    ws.column_dimensions['B'].width = 15
+    ws.column_dimensions['C'].width = 30
+    ws.column_dimensions['D'].width = 35
     
     ws['A1'] = "Azure Service Unit Pricing (PAYG)"
-    ws['A1'].font = Font(size=14, bold=True)
-    ws['A2'] = "Retrieved: 2025-09-29 from Microsoft pricing pages"
-    ws['A2'].font = Font(size=10, italic=True)
+    apply_style(ws['A1'], TITLE_STYLE)
+    ws['A2'] = price_source or "Retrieved: 2025-09-29 from Microsoft pricing pages"
+    apply_style(ws['A2'], NOTE_STYLE)
     
     headers = ['Service / Meter', 'Unit Price (USD)', 'Unit', 'Source']
     for col, header in enumerate(headers, start=1):
         cell = ws.cell(row=4, column=col)
         cell.value = header
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
+        apply_style(cell, HEADER_STYLE)
     
+    # Live formulas multiply these cells, so formula mode writes numeric prices
     pricing_data = [
-        ['Blob Storage - Hot (LRS)', '$0.018', 'per GB-month', 'Azure Blob Storage pricing'],
-        ['Blob Storage - Cool (LRS)', '$0.010', 'per GB-month', 'Azure Blob Storage pricing'],
-        ['Blob Storage - Cold (LRS)', '$0.0036', 'per GB-month', 'Azure Blob Storage pricing'],
-        ['Blob Storage - Archive (LRS)', '$0.002', 'per GB-month', 'Azure Blob Storage pricing'],
-        ['Data Factory - Orchestration', '$1.00', 'per 1,000 activity runs', 'Azure Data Factory pricing'],
-        ['Data Factory - Data Movement', '$0.25', 'per DIU-hour', 'Azure Data Factory pricing'],
-        ['Functions Premium - EP1 vCPU', '$126.29', 'per vCPU-month', 'Azure Functions pricing'],
-        ['Functions Premium - EP1 Memory', '$8.979', 'per GB-month (3.5 GB)', 'Azure Functions pricing'],
-        ['Functions Premium - EP1 Total', '$158.00', 'per instance-month', 'Calculated (1 vCPU + 3.5 GB)'],
-        ['Functions Consumption - Execution', '$0.20', 'per million (after 1M free)', 'Azure Functions pricing'],
-        ['Functions Consumption - GB-seconds', '$0.000016', 'per GB-s (after 400K free)', 'Azure Functions pricing'],
-        ['Event Grid - Basic Operations', '$0.60', 'per million (after 100K free)', 'Azure Event Grid pricing'],
-        ['Service Bus - Standard Base', '$0.0135', 'per hour (~$9.86/mo)', 'Azure Service Bus pricing'],
-        ['Service Bus - Standard Ops (excess)', '$0.80', 'per million (13-100M)', 'Azure Service Bus pricing'],
-        ['Key Vault - Secret Operations', '$0.03', 'per 10K operations', 'Azure Key Vault pricing'],
-        ['Log Analytics - Analytics Logs', '$2.30', 'per GB ingested', 'Azure Monitor pricing'],
-        ['Log Analytics - Retention (extra)', '$0.10', 'per GB-month', 'Azure Monitor pricing'],
-        ['Private Endpoints', '$0.01', 'per hour (~$7.30/mo)', 'Azure Private Link pricing'],
-        ['Private Link - Data Processing', '$0.01', 'per GB (0-1 PB tier)', 'Azure Private Link pricing'],
-        ['API Management - Standard v2 Base', '$700.00', 'per month', 'Azure API Management pricing'],
-        ['API Management - Standard v2 Requests', '$2.50', 'per million (after 50M)', 'Azure API Management pricing'],
-        ['API Management - Standard v2 Scale-out', '$500.00', 'per additional unit', 'Azure API Management pricing'],
-        ['API Management - Consumption', '$0.042', 'per 10K operations', 'Azure API Management pricing'],
-        ['Purview - Data Map CU (placeholder)', '$190.00', 'per CU-month', 'Estimate (needs confirmation)'],
+        [meter, float(price) if formulas else format_price(price), unit, source]
+        for _, meter, price, unit, source in sorted(pricing, key=lambda row: METER_INDEX[row[0]])
     ]
     
-    for row, data in enumerate(pricing_data, start=5):
-        for col, value in enumerate(data, start=1):
-            ws.cell(row=row, column=col, value=value)
-    
-    # Set column widths
-    ws.column_dimensions['A'].width = 40
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 30
-    ws.column_dimensions['D'].width = 35
+    append_rows(ws, pricing_data, PRICING_ROW, [None, PRICE_FORMAT if formulas else None])
+
+def _cost_basis(breakdown):
+    """Basis / Formula text for each service, quoting the Expected prod drivers"""
+    prod, expected = env_index('Prod'), scenario_index('Expected')
+    d = {name: values[prod, expected] for name, values in breakdown.drivers.items()}
+    v = {name: values[prod, expected] for name, values in breakdown.volumes.items()}
+    price = {key: format_price(value) for key, value in zip(METER_KEYS, breakdown.prices)}
+    log_gb = breakdown.volumes['log_gb'][prod]
+    return {
+        'storage': f"Hot {v['hot_gb']:,.0f} GB * {price['blob_hot']} + Cool {v['cool_gb']:,.0f} GB * {price['blob_cool']} "
+                   f"(incl. {d['storage_overhead_ratio']:.0%} landing/outbound overhead)"
+                   + (f" × {d['storage_redundancy_factor']:g} redundancy" if d['storage_redundancy_factor'] != 1 else ""),
+        'data_factory': f"Orchestration: {v['adf_activity_runs'] / 1000:,.1f}K runs * {price['adf_orchestration']}/1K; "
+                        f"Data movement: {v['processed_files'] / 1000:,.1f}K copies "
+                        f"({d['copy_diu']:.0f} DIU * {d['copy_minutes']:g} min)",
+        'functions': f"{d['functions_instances']:.0f} × {_functions_sku(d['functions_sku_factor'])} "
+                     f"always ready for VNet; "
+                     f"High = {breakdown.drivers['functions_instances'][prod, -1]:.0f} pre-warmed instances",
+        'event_grid': f"~{v['event_grid_events'] / 1000:,.0f}K ops vs 100K free",
+        'service_bus': f"{d['sb_units']:.0f} Standard namespace(s) at {price['sb_standard_base']}/hr + "
+                       f"{d['sb_premium_units']:.0f} Premium MU at {price['sb_premium_unit']}/hr; "
+                       f"{v['service_bus_ops'] / 1e6:,.2f}M ops vs 13M included",
+        'key_vault': f"~{v['kv_operations'] / 1000:,.0f}K secret ops * {price['kv_operations']}/10K",
+        'purview': "Low = deferred; Expected = 1 CU; High = 2 CUs",
+        'log_analytics': "Ingestion GB * {} ({} GB)".format(
+            price['log_ingestion'], ' / '.join(f"{gb:,.0f}" for gb in log_gb)),
+        'monitoring': f"{d['alert_rules']:.0f} log alert rules * {price['monitor_alert_rules']}",
+        'networking': f"{d['private_endpoints']:.0f} endpoints * {price['private_endpoint_hours']}/hr + "
+                      f"{v['private_link_gb']:,.0f} GB Private Link data"
+                      + (f" + DDoS plan {price['ddos_protection']}/mo" if d['ddos_plans'] else ""),
+        'apim': "Low = deferred; Expected = Standard v2 baseline; High = overage calls",
+        'sql': f"Pool: {d['sql_pool_vcores']:.0f} vCore / "
+               f"{d['sql_pool_basic_edtus'] + d['sql_pool_standard_edtus']:.0f} eDTU; "
+               f"control numbers {d['sql_serverless_vcores']:.0f} serverless vCores at "
+               f"{d['sql_serverless_utilization']:.0%} billed",
+    }
 
-def create_monthly_costs_sheet(wb):
+def _functions_sku(factor):
+    from budget_infra import FUNCTIONS_SKU_FACTOR
+    names = {value: sku for sku, value in FUNCTIONS_SKU_FACTOR.items()}
+    return names.get(factor, f"{factor:g}× EP1")
+
+def create_monthly_costs_sheet(wb, breakdown, formulas=False):
     """Detailed monthly cost breakdown by service"""
-    ws = wb.create_sheet("Monthly Costs (Prod)")
+    from openpyxl.utils import get_column_letter
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, TOTAL_STYLE, apply_style
+    
+    ws = wb.create_sheet(MONTHLY_COSTS_SHEET)
+    
+    # Set column widths
+    ws.column_dimensions['A'].width = 35
+    ws.column_dimensions['B'].width = 12
+    ws.column_dimensions['C'].width = 12
+    ws.column_dimensions['D'].width = 12
+    ws.column_dimensions['E'].width = 70
+    
+    prod = env_index('Prod')
     
     ws['A1'] = "Production Environment - Monthly Cost Breakdown"
-    ws['A1'].font = Font(size=14, bold=True)
+    apply_style(ws['A1'], TITLE_STYLE)
     ws['A2'] = "All figures in USD"
-    ws['A2'].font = Font(size=10, italic=True)
+    apply_style(ws['A2'], NOTE_STYLE)
     
     headers = ['Category', 'Low', 'Expected', 'High', 'Basis / Formula']
     for col, header in enumerate(headers, start=1):
         cell = ws.cell(row=4, column=col)
         cell.value = header
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
-    
-    cost_data = [
-        ['Storage (Landing + Raw + Outbound)', '$18', '$25', '$45', 'Hot 250 GB * $0.018 + Cool 500 GB * $0.01 + misc'],
-        ['Data Factory', '$150', '$215', '$400', 'Orchestration: 30K runs * $0.001; Data movement: 22K copies (2 DIU * 1 min)'],
-        ['Functions (Premium plan baseline)', '$158', '$170', '$320', '1 EP1 instance always on for VNet; High = 2 pre-warmed instances'],
-        ['Event Grid', '$0', '$0', '$1', '~22K ops < 100K free; High = ~2M ops'],
-        ['Service Bus (Standard)', '$10', '$10', '$40', 'Base ~$9.86; High adds excess ops (20M → 7M billable)'],
-        ['Key Vault', '$0.50', '$1', '$3', 'Secret ops + occasional cert ops'],
-        ['Purview Data Governance', '$0', '$190', '$380', 'Low = deferred; Expected = 1 CU; High = 2 CUs'],
-        ['Log Analytics (+ App Insights)', '$69', '$85', '$138', 'Ingestion GB * $2.30 (30 / 37 / 60 GB)'],
-        ['Monitoring & Alerts', '$3', '$5', '$10', 'Alert rule queries & notifications'],
-        ['Networking (Private Endpoints)', '$30', '$37', '$60', '4-6 endpoints * $0.01/hr plus Private Link data buffer'],
-        ['API Management', '$0', '$700', '$750', 'Low = deferred; Expected = Standard v2 baseline; High = overage calls'],
-    ]
+        apply_style(cell, HEADER_STYLE)
     
-    row = 5
-    for data in cost_data:
-        for col, value in enumerate(data, start=1):
-            ws.cell(row=row, column=col, value=value)
+    basis = _cost_basis(breakdown)
+    
+    row = MONTHLY_COSTS_ROW
+    for key, label in SERVICES:
+        ws.cell(row=row, column=1, value=label)
+        for col, scenario in enumerate(SCENARIOS, start=2):
+            _money(ws, row, col, breakdown.costs[prod, scenario_index(scenario), SERVICE_INDEX[key]],
+                   CURRENCY_CENTS_FORMAT, _service_cost_formula(key, 'Prod', scenario) if formulas else None)
+        ws.cell(row=row, column=5, value=basis[key])
         row += 1
     
     # Total row
     total_row = row
     ws[f'A{total_row}'] = "Total (Prod Monthly)"
-    ws[f'A{total_row}'].font = Font(bold=True, size=12)
-    ws[f'B{total_row}'] = "$439"
-    ws[f'C{total_row}'] = "$1,438"
-    ws[f'D{total_row}'] = "$2,147"
-    ws[f'E{total_row}'] = "Summation (rounded)"
+    for col, scenario in enumerate(SCENARIOS, start=2):
+        letter = get_column_letter(col)
+        _money(ws, total_row, col, breakdown.costs[prod, scenario_index(scenario)].sum(),
+               formula=f"=SUM({letter}{MONTHLY_COSTS_ROW}:{letter}{total_row - 1})" if formulas else None)
+    ws[f'E{total_row}'] = "Summation"
     
     for col in range(1, 6):
         cell = ws.cell(row=total_row, column=col)
-        cell.fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        cell.font = Font(bold=True)
-    
-    # Set column widths
-    ws.column_dimensions['A'].width = 35
-    ws.column_dimensions['B'].width = 12
-    ws.column_dimensions['C'].width = 12
-    ws.column_dimensions['D'].width = 12
-    ws.column_dimensions['E'].width = 70
+        apply_style(cell, TOTAL_STYLE)
 
-def create_transaction_volumes_sheet(wb):
+def create_transaction_volumes_sheet(wb, breakdown, scan=None, formulas=False):
     """Transaction volume assumptions and calculations"""
-    ws = wb.create_sheet("Transaction Volumes")
+    from budget_workbook import HEADER_STYLE, TITLE_STYLE, apply_style
+    
+    ws = wb.create_sheet(VOLUMES_SHEET)
+    
+    # Set column widths
+    ws.column_dimensions['A'].width = 40
+    ws.column_dimensions['B'].width = 25
+    ws.column_dimensions['C'].width = 50
+    ws.column_dimensions['D'].width = 50
+    
+    prod, expected = env_index('Prod'), scenario_index('Expected')
+    d = {name: values[prod, expected] for name, values in breakdown.drivers.items()}
+    v = {name: values[prod, expected] for name, values in breakdown.volumes.items()}
     
     ws['A1'] = "Transaction Volume Assumptions"
-    ws['A1'].font = Font(size=14, bold=True)
+    apply_style(ws['A1'], TITLE_STYLE)
     
     headers = ['Volume Driver', 'Current/Year 0', 'Projection (Jan 1)', 'Notes']
     for col, header in enumerate(headers, start=1):
         cell = ws.cell(row=3, column=col)
         cell.value = header
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
+        apply_style(cell, HEADER_STYLE)
     
     volume_data = [
         ['Active EDI Processes', '5-10', '10-12', '834, 837/835, plus TA1/999 and outbound assembly'],
-        ['Weekly Transactions (inbound files)', '~5,000', 'Scale +15-20% YoY', '≈260,000 / year'],
+        ['Weekly Transactions (inbound files)', f"~{d['files_per_week']:,.0f}", 'Scale +15-20% YoY',
+         f"≈{d['files_per_week'] * 52:,.0f} / year"],
         ['Annual Claims (837)', '~250,000', 'Could rise with payer feeds', 'Drives storage + routing + ack volume'],
         ['Subscribers / Members', '7,200', '10,000', 'Used for 834 enrollment updates'],
-        ['X12 Sets Phase 1', '834, 837, 835, TA1, 999, 277CA', 'Add 271, 277, 278 later', 'Outbound responses increase volume'],
+        ['X12 Sets Phase 1', '834, 837, 835, TA1, 999, 277CA', 'Add 271, 277, 278 later',
+         'Outbound acks/responses: see Ack & Response Volumes'],
         ['Average File Size', '1-5 MB (peaks 50-100 MB)', 'Similar', 'Larger 837/835 batch peaks'],
     ]
+    if scan is not None and scan.files:
+        volume_data[-1] = ['Average File Size', f"{scan.avg_file_mb:,.2f} MB (max {scan.max_bytes / 1024 ** 2:,.1f} MB)",
+                           'Similar', f"Observed across {scan.files:,} scanned files"]
     
     for row, data in enumerate(volume_data, start=4):
         for col, value in enumerate(data, start=1):
@@ -285,127 +643,230 @@ def create_transaction_volumes_sheet(wb):
     
     # Monthly breakdown
     ws['A12'] = "Monthly Volume Estimates (Production)"
-    ws['A12'].font = Font(size=14, bold=True)
+    apply_style(ws['A12'], TITLE_STYLE)
     
     headers2 = ['Metric', 'Volume', 'Calculation']
     for col, header in enumerate(headers2, start=1):
         cell = ws.cell(row=14, column=col)
         cell.value = header
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
+        apply_style(cell, HEADER_STYLE)
     
+    files = v['inbound_files']
+    reprocess = f"(incl. {d['reprocessing_rate']:.0%} reprocessing)"
+    # Rows follow VOLUME_METRICS; live quantity formulas reference these volume cells
     monthly_data = [
-        ['Inbound Files', '~21,700', '5,000/week * 52 / 12'],
-        ['ADF Activity Runs', '~28,000', '21,700 * 1.3 (includes lookups & retries)'],
-        ['Function Invocations (Router)', '~22,000', '~1 per inbound file'],
-        ['Function Invocations (Orchestrator)', '~6,000', '192 batches/day (5-min intervals, 16 hrs)'],
-        ['Service Bus Messages (Routing)', '~76,000', 'Avg 3.5 ST sets per file * 21,700'],
-        ['Service Bus Operations (Total)', '~400,000', 'Publish + deliveries + management'],
-        ['Event Grid Events', '~21,700', 'Blob Created triggers'],
-        ['Log Analytics Ingestion', '30-45 GB', '1.0-1.5 GB/day * 30 days'],
-        ['Storage Growth (Raw)', '~65 GB', '21,700 files * 3 MB avg'],
-        ['API Calls (Expected)', '~5,000', 'Assuming 10% of files arrive via API vs SFTP'],
+        ['Inbound Files', f"{d['files_per_week']:,.0f}/week * 52 / 12"],
+        ['ADF Activity Runs', f"{files:,.0f} * {d['adf_runs_per_file']:g} (includes lookups & retries) {reprocess}"],
+        ['Function Invocations (Router)', f"~1 per inbound file {reprocess}"],
+        ['Function Invocations (Orchestrator)', f"{d['orchestrator_batches_per_day']:,.0f} batches/day * 30 days"],
+        ['Service Bus Messages (Routing)', f"Avg {d['st_per_file']:g} ST sets per file * {files:,.0f} {reprocess}"],
+        ['Service Bus Operations (Total)',
+         f"{d['sb_ops_per_message']:.2f} ops per message (send + receive/complete per subscription delivery)"],
+        ['Event Grid Events', 'Blob Created triggers'],
+        ['Log Analytics Ingestion (GB)', f"{d['log_gb_per_day']:g} GB/day * 30 days"],
+        ['Storage Growth (Raw GB)', f"{files:,.0f} files * {d['avg_file_mb']:.3g} MB avg"],
+        ['API Calls (Expected)', f"Assuming {d['api_share']:.0%} of files arrive via API vs SFTP, "
+                                 f"{d['api_calls_per_file']:g} calls each"],
     ]
     
-    for row, data in enumerate(monthly_data, start=15):
-        for col, value in enumerate(data, start=1):
-            ws.cell(row=row, column=col, value=value)
+    for row, ((metric, calculation), name) in enumerate(zip(monthly_data, VOLUME_METRICS), start=VOLUME_ROW):
+        volume = float(v[name])
+        ws.cell(row=row, column=1, value=metric)
+        cell = ws.cell(row=row, column=2, value=volume if formulas else round(volume, 1))
+        cell.number_format = COUNT_FORMAT
+        ws.cell(row=row, column=3, value=calculation)
+    
+    if scan is not None:
+        write_scan_results(ws, scan, start_row=27)
+
+def create_meter_quantities_sheet(wb, breakdown, formulas=False):
+    """Billable quantity per meter for every environment and scenario"""
+    from openpyxl.utils import get_column_letter
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, append_rows, apply_style
+    
+    ws = wb.create_sheet(QUANTITIES_SHEET)
     
     # Set column widths
     ws.column_dimensions['A'].width = 40
-    ws.column_dimensions['B'].width = 25
-    ws.column_dimensions['C'].width = 50
-    ws.column_dimensions['D'].width = 50
+    ws.column_dimensions['B'].width = 30
+    for col in range(3, 3 + len(ENVIRONMENTS) * len(SCENARIOS)):
+        ws.column_dimensions[get_column_letter(col)].width = 14
+    
+    ws['A1'] = "Billable Meter Quantities (per month)"
+    apply_style(ws['A1'], TITLE_STYLE)
+    ws['A2'] = ("Cost = quantity × Unit Pricing; Prod Expected volume meters are formulas over Transaction Volumes"
+                if formulas else "Quantities in each meter's pricing unit; cost = quantity × unit price")
+    apply_style(ws['A2'], NOTE_STYLE)
+    
+    headers = ['Service / Meter', 'Unit'] + [f"{env} {scenario}" for env in ENVIRONMENTS for scenario in SCENARIOS]
+    for col, header in enumerate(headers, start=1):
+        cell = ws.cell(row=QUANTITY_ROW - 1, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    live = _quantity_formulas(breakdown) if formulas else {}
+    prod_expected = _quantity_column('Prod', 'Expected')
+    quantities = breakdown.quantities.reshape(-1, len(METER_KEYS))
+    rows = (
+        [label, unit] + [live[key] if key in live and col == prod_expected else float(quantity)
+                         for col, quantity in enumerate(quantities[:, METER_INDEX[key]], start=3)]
+        for key, label, _, unit, _ in PRICING
+    )
+    append_rows(ws, rows, QUANTITY_ROW, [None, None] + [DECIMAL_FORMAT] * quantities.shape[0])
+
+def write_scan_results(ws, scan, start_row):
+    """Observed envelope counts by transaction set and file-size histogram"""
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, apply_style
+    from budget_x12_scan import size_bucket_labels
+    
+    ws[f'A{start_row}'] = "Observed X12 Envelopes (raw file scan)"
+    apply_style(ws[f'A{start_row}'], TITLE_STYLE)
+    ws[f'A{start_row + 1}'] = (f"{scan.files:,} files, {scan.interchanges:,} ISA, {scan.groups:,} GS, "
+                               f"{sum(scan.transactions.values()):,} ST ({scan.skipped:,} non-X12 skipped)")
+    apply_style(ws[f'A{start_row + 1}'], NOTE_STYLE)
+    
+    headers = ['Transaction Set', 'ST Count', 'Share', 'ST per File']
+    row = start_row + 3
+    for col, header in enumerate(headers, start=1):
+        cell = ws.cell(row=row, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    total = sum(scan.transactions.values())
+    for transaction_set, count in sorted(scan.transactions.items()):
+        row += 1
+        ws.cell(row=row, column=1, value=transaction_set)
+        ws.cell(row=row, column=2, value=count).number_format = COUNT_FORMAT
+        ws.cell(row=row, column=3, value=count / total if total else 0.0).number_format = PERCENT_FORMAT
+        ws.cell(row=row, column=4, value=round(count / scan.files, 2) if scan.files else 0.0)
+    
+    row += 2
+    sets = sorted(scan.size_histogram_by_set)
+    headers2 = ['File Size', 'All Files'] + [f'Files ({name})' for name in sets]
+    for col, header in enumerate(headers2, start=1):
+        cell = ws.cell(row=row, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    for bucket, label in enumerate(size_bucket_labels()):
+        row += 1
+        ws.cell(row=row, column=1, value=label)
+        ws.cell(row=row, column=2, value=scan.size_histogram[bucket])
+        for col, name in enumerate(sets, start=3):
+            ws.cell(row=row, column=col, value=scan.size_histogram_by_set[name][bucket])
 
-def create_environment_rollup_sheet(wb):
+def create_environment_rollup_sheet(wb, breakdown, infra=None, formulas=False):
     """Multi-environment cost rollup"""
-    ws = wb.create_sheet("Environment Roll-Up")
+    from openpyxl.utils import get_column_letter
+    from budget_workbook import HEADER_STYLE, HIGHLIGHT_STYLE, TITLE_STYLE, TOTAL_STYLE, apply_style
+    
+    ws = wb.create_sheet(ROLLUP_SHEET)
+    
+    # Set column widths
+    ws.column_dimensions['A'].width = 30
+    ws.column_dimensions['B'].width = 15
+    ws.column_dimensions['C'].width = 15
+    ws.column_dimensions['D'].width = 15
+    ws.column_dimensions['E'].width = 110
+    
+    totals = breakdown.costs.sum(axis=-1)
+    
+    if formulas:
+        from budget_formulas import cell_ref
     
     ws['A1'] = "All Environments - Monthly Cost Roll-Up"
-    ws['A1'].font = Font(size=14, bold=True)
+    apply_style(ws['A1'], TITLE_STYLE)
     
     headers = ['Environment', 'Low', 'Expected', 'High', 'Notes']
     for col, header in enumerate(headers, start=1):
         cell = ws.cell(row=3, column=col)
         cell.value = header
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
-    
-    env_data = [
-        ['Dev (~25%)', '$172', '$424', '$611', 'Includes shared Premium Functions + Private Endpoints + APIM allocation'],
-        ['Test (~40%)', '$209', '$603', '$877', 'Load/replay tests with shared Premium Functions + Private Endpoints + APIM'],
-        ['Prod', '$439', '$1,438', '$2,147', 'From detailed breakdown'],
-    ]
+        apply_style(cell, HEADER_STYLE)
     
-    for row, data in enumerate(env_data, start=4):
-        for col, value in enumerate(data, start=1):
-            ws.cell(row=row, column=col, value=value)
+    env_notes = {
+        'Dev': 'Includes shared Premium Functions + Private Endpoints + APIM allocation',
+        'Test': 'Load/replay tests with shared Premium Functions + Private Endpoints + APIM',
+        'Prod': 'From detailed breakdown',
+    }
+    
+    # Environments with parameter files are priced from their deployed SKUs and counts
+    for env, footprint in (infra or {}).items():
+        if footprint is not None:
+            env_notes[env] = "From parameters: " + '; '.join(footprint.notes)
+    
+    # Prod follows the detailed breakdown; other environments price their own quantity columns
+    for row, env in enumerate(ENVIRONMENTS, start=ROLLUP_ROW):
+        ws.cell(row=row, column=1, value=env)
+        for col, scenario in enumerate(SCENARIOS, start=2):
+            formula = None
+            if formulas and env == 'Prod':
+                formula = f"={cell_ref(MONTHLY_COSTS_SHEET, MONTHLY_TOTAL_ROW, col)}"
+            elif formulas:
+                formula = _cost_formula(METER_KEYS, env, scenario)
+            _money(ws, row, col, totals[env_index(env), scenario_index(scenario)], formula=formula)
+        ws.cell(row=row, column=5, value=env_notes[env])
     
     # Total row
     ws['A7'] = "Total / Month"
-    ws['B7'] = "$820"
-    ws['C7'] = "$2,465"
-    ws['D7'] = "$3,635"
+    for col, scenario in enumerate(SCENARIOS, start=2):
+        letter = get_column_letter(col)
+        _money(ws, 7, col, totals[:, scenario_index(scenario)].sum(),
+               formula=f"=SUM({letter}{ROLLUP_ROW}:{letter}6)" if formulas else None)
     ws['E7'] = "All environments combined"
     
     for col in range(1, 6):
         cell = ws.cell(row=7, column=col)
-        cell.fill = PatternFill(start_color="D9E1F2", end_color="D9E1F2", fill_type="solid")
-        cell.font = Font(bold=True)
+        apply_style(cell, TOTAL_STYLE)
     
     # Annual calculations
     ws['A10'] = "Annual Costs (Expected Scenario)"
-    ws['A10'].font = Font(size=14, bold=True)
+    apply_style(ws['A10'], TITLE_STYLE)
     
     ws['A12'] = "Component"
     ws['B12'] = "Amount"
     for col in range(1, 3):
         cell = ws.cell(row=12, column=col)
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
+        apply_style(cell, HEADER_STYLE)
     
+    monthly_total = totals[:, scenario_index('Expected')].sum()
+    annual_total = monthly_total * 12
     annual_data = [
-        ['Monthly Total (Expected)', '$2,465'],
-        ['Annual (×12)', '$29,580'],
-        ['Contingency (20%)', '$5,916'],
-        ['Total Budget Ask', '$35,496'],
+        ['Monthly Total (Expected)', monthly_total, "=C7"],
+        ['Annual (×12)', annual_total, "=B13*12"],
+        [f'Contingency ({CONTINGENCY_RATE:.0%})', annual_total * CONTINGENCY_RATE, f"=B14*{CONTINGENCY_RATE}"],
+        ['Total Budget Ask', annual_total * (1 + CONTINGENCY_RATE), "=B14+B15"],
     ]
     
     for row, data in enumerate(annual_data, start=13):
         ws[f'A{row}'] = data[0]
-        ws[f'B{row}'] = data[1]
+        _money(ws, row, 2, data[1], formula=data[2] if formulas else None)
         if 'Total Budget' in data[0]:
-            ws[f'A{row}'].font = Font(bold=True, size=12)
-            ws[f'B{row}'].font = Font(bold=True, size=12)
-            ws[f'A{row}'].fill = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
-            ws[f'B{row}'].fill = PatternFill(start_color="C6E0B4", end_color="C6E0B4", fill_type="solid")
-    
-    # Set column widths
-    ws.column_dimensions['A'].width = 30
-    ws.column_dimensions['B'].width = 15
-    ws.column_dimensions['C'].width = 15
-    ws.column_dimensions['D'].width = 15
-    ws.column_dimensions['E'].width = 60
+            apply_style(ws[f'A{row}'], HIGHLIGHT_STYLE)
+            apply_style(ws[f'B{row}'], HIGHLIGHT_STYLE)
 
-def create_sensitivity_analysis_sheet(wb):
+def create_sensitivity_analysis_sheet(wb, simulation=None, breakdown=None, routing=None):
     """Cost sensitivity analysis"""
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, apply_style
+    
     ws = wb.create_sheet("Sensitivity Analysis")
     
+    # Set column widths
+    ws.column_dimensions['A'].width = 35
+    ws.column_dimensions['B'].width = 30
+    ws.column_dimensions['C'].width = 40
+    ws.column_dimensions['D'].width = 30
+    ws.column_dimensions['E'].width = 40
+    
     ws['A1'] = "Cost Sensitivity Levers"
-    ws['A1'].font = Font(size=14, bold=True)
+    apply_style(ws['A1'], TITLE_STYLE)
     ws['A2'] = "Understanding what drives cost changes"
-    ws['A2'].font = Font(size=10, italic=True)
+    apply_style(ws['A2'], NOTE_STYLE)
     
     headers = ['Driver', 'Elasticity', 'Impact', 'Comment']
     for col, header in enumerate(headers, start=1):
         cell = ws.cell(row=4, column=col)
         cell.value = header
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
+        apply_style(cell, HEADER_STYLE)
     
     sensitivity_data = [
         ['ST transactions per file (× factor)', 'High', 'ADF + SB + Functions', 'Each extra ST adds routing message + log events'],
@@ -424,15 +885,13 @@ def create_sensitivity_analysis_sheet(wb):
     
     # Scaling triggers
     ws['A15'] = "Scaling Triggers & Thresholds"
-    ws['A15'].font = Font(size=14, bold=True)
+    apply_style(ws['A15'], TITLE_STYLE)
     
     headers2 = ['Trigger Metric', 'Threshold', 'Action', 'Impact']
     for col, header in enumerate(headers2, start=1):
         cell = ws.cell(row=17, column=col)
         cell.value = header
-        cell.font = Font(bold=True)
-        cell.fill = PatternFill(start_color="366092", end_color="366092", fill_type="solid")
-        cell.font = Font(bold=True, color="FFFFFF")
+        apply_style(cell, HEADER_STYLE)
     
     trigger_data = [
         ['Routing messages', '> 1M/month sustained', 'Evaluate Premium Service Bus', '+$300-$500/mo'],
@@ -444,15 +903,654 @@ def create_sensitivity_analysis_sheet(wb):
         ['Purview assets', '> 5k catalog expansion', 'Add 1 more CU or optimize schedule', '+$190/mo'],
     ]
     
+    if routing is not None and breakdown is not None:
+        trigger_data[0].append(_routing_trigger_status(breakdown, routing))
+        apply_style(ws.cell(row=17, column=5, value='Model (Prod Expected)'), HEADER_STYLE)
+    
     for row, data in enumerate(trigger_data, start=18):
         for col, value in enumerate(data, start=1):
             ws.cell(row=row, column=col, value=value)
     
+    if simulation is not None:
+        write_simulation_results(ws, simulation, start_row=27)
+
+def _routing_trigger_status(breakdown, routing):
+    from budget_routing import ROUTING_TRIGGER_DELIVERIES, fan_out
+    
+    prod, expected = env_index('Prod'), scenario_index('Expected')
+    deliveries = breakdown.volumes['routing_messages'][prod, expected] * fan_out(routing)
+    state = 'FIRES' if deliveries > ROUTING_TRIGGER_DELIVERIES else 'below threshold'
+    return f"{deliveries:,.0f} deliveries/month ({state})"
+
+def write_simulation_results(ws, simulation, start_row):
+    """Monte Carlo confidence bands and tornado ranking below the trigger table"""
+    from budget_workbook import HEADER_STYLE, TITLE_STYLE, apply_style
+    
+    ws[f'A{start_row}'] = f"Monte Carlo Simulation (Prod Monthly, {simulation.draws:,} draws)"
+    apply_style(ws[f'A{start_row}'], TITLE_STYLE)
+    
+    headers = ['Percentile', 'Monthly Cost', 'Annual Cost']
+    for col, header in enumerate(headers, start=1):
+        cell = ws.cell(row=start_row + 2, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    bands = [(f'P{p}', value) for p, value in simulation.percentiles.items()]
+    bands.append(('Mean', simulation.mean))
+    row = start_row + 3
+    for label, value in bands:
+        ws.cell(row=row, column=1, value=label)
+        _money(ws, row, 2, value)
+        _money(ws, row, 3, value * 12)
+        row += 1
+    
+    row += 1
+    ws[f'A{row}'] = "Tornado Ranking (one-at-a-time P10 → P90 swing)"
+    apply_style(ws[f'A{row}'], TITLE_STYLE)
+    row += 2
+    
+    headers2 = ['Lever', 'Monthly @ P10', 'Monthly @ P90', 'Swing']
+    for col, header in enumerate(headers2, start=1):
+        cell = ws.cell(row=row, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    for lever, low, high in simulation.tornado:
+        row += 1
+        ws.cell(row=row, column=1, value=lever)
+        _money(ws, row, 2, low)
+        _money(ws, row, 3, high)
+        _money(ws, row, 4, abs(high - low))
+
+def create_storage_projection_sheet(wb, breakdown):
+    """84-month storage lifecycle projection by cohort"""
+    from openpyxl.utils import get_column_letter
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, append_rows, apply_style
+    from budget_storage_projection import RETENTION_MONTHS, SWEEP_DELAYS, TIERS, environment_projection
+    
+    ws = wb.create_sheet("Storage Projection")
+    
     # Set column widths
-    ws.column_dimensions['A'].width = 35
-    ws.column_dimensions['B'].width = 30
-    ws.column_dimensions['C'].width = 40
-    ws.column_dimensions['D'].width = 30
+    ws.column_dimensions['A'].width = 30
+    for col in range(2, 9):
+        ws.column_dimensions[get_column_letter(col)].width = 18
+    
+    prod, expected = env_index('Prod'), scenario_index('Expected')
+    drivers = {name: values[prod] for name, values in breakdown.drivers.items()}
+    
+    # All scenarios in one batched projection, shaped (scenario, month, tier)
+    projection, sweep = environment_projection(breakdown)
+    
+    ws['A1'] = f"Raw Storage Lifecycle Projection (Prod, {RETENTION_MONTHS} months)"
+    apply_style(ws['A1'], TITLE_STYLE)
+    ws['A2'] = (f"Expected: Cool after {drivers['cool_after_days'][expected]:.0f} days, "
+                f"Cold after {drivers['cold_after_days'][expected]:.0f} days, "
+                f"Archive after {drivers['archive_after_days'][expected]:.0f} days; "
+                f"ingest grows {drivers['growth_yoy'][expected]:.1%} YoY")
+    apply_style(ws['A2'], NOTE_STYLE)
+    
+    headers = ['Scenario', 'Year 1 Avg / Month', 'Year 7 Avg / Month', '7-Year Total', 'Year 7 Stored GB']
+    for col, header in enumerate(headers, start=1):
+        cell = ws.cell(row=4, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    for row, scenario in enumerate(SCENARIOS, start=5):
+        monthly = projection.monthly_cost[scenario_index(scenario)]
+        ws.cell(row=row, column=1, value=scenario)
+        _money(ws, row, 2, monthly[:12].mean(), CURRENCY_CENTS_FORMAT)
+        _money(ws, row, 3, monthly[-12:].mean(), CURRENCY_CENTS_FORMAT)
+        _money(ws, row, 4, monthly.sum())
+        stored = ws.cell(row=row, column=5, value=round(float(projection.tier_gb[scenario_index(scenario), -1].sum()), 1))
+        stored.number_format = COUNT_FORMAT
+    
+    # Lifecycle policy delay sweep (Expected scenario)
+    ws['A10'] = "Lifecycle Policy Delay Sweep (Expected)"
+    apply_style(ws['A10'], TITLE_STYLE)
+    
+    headers2 = ['Delay (days)', '7-Year Storage Cost', 'vs. No Delay']
+    for col, header in enumerate(headers2, start=1):
+        cell = ws.cell(row=12, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    for row, (delay, total) in enumerate(zip(SWEEP_DELAYS, sweep), start=13):
+        ws.cell(row=row, column=1, value=delay)
+        _money(ws, row, 2, total)
+        _money(ws, row, 3, total - sweep[0])
+    
+    # Month-by-month detail (Expected)
+    detail_row = 13 + len(SWEEP_DELAYS) + 2
+    ws[f'A{detail_row}'] = "Monthly Detail (Expected)"
+    apply_style(ws[f'A{detail_row}'], TITLE_STYLE)
+    
+    headers3 = ['Month', 'Ingest GB'] + [f'{tier} GB' for tier in TIERS] + ['Total GB', 'Monthly Cost']
+    header_row = detail_row + 2
+    for col, header in enumerate(headers3, start=1):
+        cell = ws.cell(row=header_row, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    tier_gb = projection.tier_gb[expected]
+    rows = (
+        [month + 1, round(float(projection.ingest_gb[expected, month]), 1),
+         *(round(float(gb), 1) for gb in tier_gb[month]), round(float(tier_gb[month].sum()), 1),
+         round(float(projection.monthly_cost[expected, month]), 2)]
+        for month in range(tier_gb.shape[0])
+    )
+    formats = [None] + [COUNT_FORMAT] * (len(TIERS) + 2) + [CURRENCY_CENTS_FORMAT]
+    append_rows(ws, rows, header_row + 1, formats)
+
+def create_partner_attribution_sheet(wb, breakdown, partners, scan=None):
+    """Prod monthly cost allocated to trading partners from their configs"""
+    from openpyxl.utils import get_column_letter
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, TOTAL_STYLE, append_rows, apply_style
+    from budget_partners import UNALLOCATED_REASONS, attribute_costs, transaction_mix_from_scan
+    
+    ws = wb.create_sheet("Partner Attribution")
+    
+    # Set column widths
+    ws.column_dimensions['A'].width = 25
+    ws.column_dimensions['B'].width = 12
+    ws.column_dimensions['C'].width = 14
+    ws.column_dimensions['D'].width = 22
+    for col in range(5, 14):
+        ws.column_dimensions[get_column_letter(col)].width = 15
+    
+    prod, expected = env_index('Prod'), scenario_index('Expected')
+    index = partners
+    mix = transaction_mix_from_scan(scan) if scan is not None else None
+    attribution = attribute_costs(index, breakdown.costs[prod, expected],
+                                  breakdown.volumes['inbound_files'][prod, expected], mix)
+    
+    ws['A1'] = "Partner Cost Attribution (Prod Monthly, Expected)"
+    apply_style(ws['A1'], TITLE_STYLE)
+    ws['A2'] = (f"{len(index.codes):,} partner configs; metered costs follow each partner's share of inbound "
+                f"files per transaction set, storage is weighted by payload size, APIM by REST_API partners")
+    apply_style(ws['A2'], NOTE_STYLE)
+    
+    service_labels = dict(SERVICES)
+    headers = (['Partner', 'Status', 'Endpoint', 'Transactions', 'Files / Month']
+               + [service_labels[s] for s in attribution.services] + ['Shared Platform', 'Total', '% of Total'])
+    for col, header in enumerate(headers, start=1):
+        cell = ws.cell(row=4, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    grand_total = float(breakdown.costs[prod, expected].sum())
+    totals = attribution.costs.sum(axis=1) + attribution.shared
+    rows = (
+        [code, index.statuses[i], index.endpoints[i],
+         ', '.join(ts for ts, sent in zip(index.transaction_sets, index.transactions[i]) if sent),
+         round(float(attribution.files[i]), 1),
+         *(round(float(cost), 2) for cost in attribution.costs[i]),
+         round(float(attribution.shared[i]), 2), round(float(totals[i]), 2),
+         float(totals[i] / grand_total) if grand_total else 0.0]
+        for i, code in enumerate(index.codes)
+    )
+    money = [CURRENCY_CENTS_FORMAT] * (len(attribution.services) + 2)
+    formats = [None, None, None, None, COUNT_FORMAT] + money + [PERCENT_FORMAT]
+    row = append_rows(ws, rows, 5, formats)
+    
+    # One unallocated row per reason so the remainder says why no partner carries it
+    for reason, label in UNALLOCATED_REASONS.items():
+        amount = attribution.unallocated_by_reason[reason]
+        ws.cell(row=row, column=1, value="Unallocated")
+        ws.cell(row=row, column=4, value=label)
+        _money(ws, row, len(headers) - 1, amount, CURRENCY_CENTS_FORMAT)
+        share = ws.cell(row=row, column=len(headers), value=amount / grand_total if grand_total else 0.0)
+        share.number_format = PERCENT_FORMAT
+        row += 1
+    
+    ws.cell(row=row, column=1, value="Total (Prod Monthly)")
+    _money(ws, row, len(headers) - 1, grand_total)
+    for col in range(1, len(headers) + 1):
+        apply_style(ws.cell(row=row, column=col), TOTAL_STYLE)
+
+def create_ack_volumes_sheet(wb, acks):
+    """Outbound acknowledgments and responses by partner, and their incremental monthly cost"""
+    from openpyxl.utils import get_column_letter
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, TOTAL_STYLE, append_rows, apply_style
+    from budget_acks import ACK_RULES, message_ratio
+    
+    ws = wb.create_sheet("Ack & Response Volumes")
+    
+    # Set column widths
+    ws.column_dimensions['A'].width = 25
+    for col in range(2, 12):
+        ws.column_dimensions[get_column_letter(col)].width = 16
+    
+    ws['A1'] = "Acknowledgment & Response Volumes (Prod Expected)"
+    apply_style(ws['A1'], TITLE_STYLE)
+    ws['A2'] = (f"{len(acks.partners) - 1:,} partner configs × {len(acks.transaction_sets)} transaction sets × "
+                f"{acks.months} months; TA1/999 per partner acknowledgment settings, "
+                f"{'/'.join(ack for ack, (request, _, _) in ACK_RULES.items() if request)} answer every "
+                f"{'/'.join(request for request, _, _ in ACK_RULES.values() if request)}")
+    apply_style(ws['A2'], NOTE_STYLE)
+    
+    # Month 1 by partner
+    headers = (['Partner', 'Inbound ST / Month'] + [f"{ack} / Month" for ack in acks.ack_types]
+               + ['Ack Messages', 'Ack / Inbound', 'Incremental Cost'])
+    for col, header in enumerate(headers, start=1):
+        cell = ws.cell(row=4, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    ratios = message_ratio(acks)
+    by_type = acks.messages[..., 0].sum(axis=2)
+    inbound = acks.inbound_messages[..., 0].sum(axis=1)
+    rows = (
+        [partner, round(float(inbound[p]), 1), *(round(float(count), 1) for count in by_type[:, p]),
+         round(float(by_type[:, p].sum()), 1), float(ratios[p]), round(float(acks.partner_costs[p, 0]), 2)]
+        for p, partner in enumerate(acks.partners)
+    )
+    counts = [COUNT_FORMAT] * (len(acks.ack_types) + 2)
+    row = append_rows(ws, rows, 5, [None] + counts + [DECIMAL_FORMAT, CURRENCY_CENTS_FORMAT])
+    
+    ws.cell(row=row, column=1, value="Total (Month 1)")
+    ws.cell(row=row, column=2, value=round(float(inbound.sum()), 1)).number_format = COUNT_FORMAT
+    for col, count in enumerate(by_type.sum(axis=1), start=3):
+        ws.cell(row=row, column=col, value=round(float(count), 1)).number_format = COUNT_FORMAT
+    ws.cell(row=row, column=len(headers) - 2, value=round(float(by_type.sum()), 1)).number_format = COUNT_FORMAT
+    _money(ws, row, len(headers), acks.service_costs[0].sum(), CURRENCY_CENTS_FORMAT)
+    for col in range(1, len(headers) + 1):
+        apply_style(ws.cell(row=row, column=col), TOTAL_STYLE)
+    
+    # Incremental platform cost over the growth horizon
+    row += 3
+    ws.cell(row=row, column=1, value="Incremental Platform Cost by Month")
+    apply_style(ws.cell(row=row, column=1), TITLE_STYLE)
+    
+    priced = [s for s, _ in enumerate(SERVICES) if abs(acks.service_costs[:, s]).max() >= 0.005]
+    headers2 = (['Month', 'Ack Files (Invocations)', 'Ack Messages', 'Storage GB', 'Extra EP1']
+                + [SERVICES[s][1] for s in priced] + ['Incremental Cost'])
+    row += 2
+    for col, header in enumerate(headers2, start=1):
+        cell = ws.cell(row=row, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    monthly_messages = acks.messages.sum(axis=(0, 1, 2))
+    rows = (
+        [month + 1, round(float(acks.invocations[month]), 1), round(float(monthly_messages[month]), 1),
+         round(float(acks.gb[month]), 3), float(acks.extra_ep1[month]),
+         *(round(float(acks.service_costs[month, s]), 2) for s in priced),
+         round(float(acks.service_costs[month].sum()), 2)]
+        for month in range(acks.months)
+    )
+    append_rows(ws, rows, row + 1, [None, COUNT_FORMAT, COUNT_FORMAT, '#,##0.000', None]
+                + [CURRENCY_CENTS_FORMAT] * (len(priced) + 1))
+
+def create_routing_simulation_sheet(wb, breakdown, routing):
+    """Subscription deliveries and billable Service Bus operations from the routing-rule replay"""
+    from openpyxl.utils import get_column_letter
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, TOTAL_STYLE, append_rows, apply_style
+    from budget_routing import DELIVERY_OPS, ROUTING_TRIGGER_DELIVERIES, SEND_OPS, fan_out, ops_per_message
+    
+    ws = wb.create_sheet("Routing Simulation")
+    
+    # Set column widths
+    ws.column_dimensions['A'].width = 30
+    ws.column_dimensions['B'].width = 35
+    ws.column_dimensions['C'].width = 25
+    for col in range(4, 8):
+        ws.column_dimensions[get_column_letter(col)].width = 18
+    
+    prod = env_index('Prod')
+    table = routing.table
+    fanout = fan_out(routing)
+    
+    ws['A1'] = "Service Bus Routing Simulation"
+    apply_style(ws['A1'], TITLE_STYLE)
+    ws['A2'] = (f"{routing.messages:,} envelopes replayed; {routing.unrouted:,} matched no rule; "
+                f"{fanout:.3f} deliveries per message; {ops_per_message(routing):.2f} billable ops per message "
+                f"({SEND_OPS} send + {DELIVERY_OPS} per delivery)")
+    apply_style(ws['A2'], NOTE_STYLE)
+    
+    headers = ['Rule', 'Filter', 'Subscription', 'Priority', 'Matched', 'Share']
+    for col, header in enumerate(headers, start=1):
+        cell = ws.cell(row=4, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    rows = (
+        [rule['name'], rule['filter'], rule['subscription'], rule.get('priority'), int(count),
+         count / routing.messages if routing.messages else 0.0]
+        for rule, count in zip(table.rules, routing.rule_counts)
+    )
+    row = append_rows(ws, rows, 5, [None, None, None, None, COUNT_FORMAT, PERCENT_FORMAT])
+    
+    row += 1
+    headers2 = ['Subscription', 'Replayed Deliveries', 'Share of Messages'] + [
+        f'Deliveries / Month ({scenario})' for scenario in SCENARIOS]
+    for col, header in enumerate(headers2, start=1):
+        cell = ws.cell(row=row, column=col)
+        cell.value = header
+        apply_style(cell, HEADER_STYLE)
+    
+    monthly_messages = breakdown.volumes['routing_messages'][prod]
+    share = routing.subscription_counts / routing.messages if routing.messages else routing.subscription_counts * 0.0
+    rows = (
+        [subscription, int(count), float(fraction), *(round(float(m * fraction), 0) for m in monthly_messages)]
+        for subscription, count, fraction in zip(table.subscriptions, routing.subscription_counts, share)
+    )
+    formats = [None, COUNT_FORMAT, PERCENT_FORMAT] + [COUNT_FORMAT] * len(SCENARIOS)
+    row = append_rows(ws, rows, row + 1, formats)
+    
+    ws.cell(row=row, column=1, value="Total deliveries")
+    ws.cell(row=row, column=2, value=int(routing.subscription_counts.sum())).number_format = COUNT_FORMAT
+    for col, messages in enumerate(monthly_messages, start=4):
+        ws.cell(row=row, column=col, value=round(float(messages * fanout), 0)).number_format = COUNT_FORMAT
+    for col in range(1, len(headers2) + 1):
+        apply_style(ws.cell(row=row, column=col), TOTAL_STYLE)
+    
+    row += 1
+    ws.cell(row=row, column=1, value="Billable operations")
+    for col, scenario in enumerate(SCENARIOS, start=4):
+        ops = breakdown.volumes['service_bus_ops'][prod, scenario_index(scenario)]
+        ws.cell(row=row, column=col, value=round(float(ops), 0)).number_format = COUNT_FORMAT
+    
+    row += 1
+    ws.cell(row=row, column=1, value=f"Trigger: > {ROUTING_TRIGGER_DELIVERIES / 1e6:g}M deliveries")
+    for col, messages in enumerate(monthly_messages, start=4):
+        fires = messages * fanout > ROUTING_TRIGGER_DELIVERIES
+        ws.cell(row=row, column=col, value='Evaluate Premium' if fires else 'Standard OK')
+
+def _trigger_month(month, months):
+    if month is None:
+        return f"Beyond month {months}"
+    return month if isinstance(month, str) else f"Month {month}"
+
+def create_cost_optimizer_sheet(wb, optimization):
+    """Lowest-cost configuration per month and the month each scaling trigger fires"""
+    from openpyxl.utils import get_column_letter
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, TOTAL_STYLE, append_rows, apply_style
+    from budget_optimizer import TRIGGERS
+    
+    ws = wb.create_sheet("Cost Optimizer")
+    
+    # Set column widths
+    ws.column_dimensions['A'].width = 32
+    ws.column_dimensions['B'].width = 28
+    ws.column_dimensions['C'].width = 36
+    for col in range(4, 11):
+        ws.column_dimensions[get_column_letter(col)].width = 18
+    
+    ws['A1'] = "Cost Optimizer (Prod)"
+    apply_style(ws['A1'], TITLE_STYLE)
+    ws['A2'] = (f"Cheapest configuration meeting every modeled SLA in each of {optimization.months} months; "
+                f"branch-and-bound priced {optimization.nodes:,} nodes of {optimization.configurations:,} "
+                f"month × configuration combinations; Functions capacity also clears a batch window within "
+                f"the TA1 ack SLA")
+    apply_style(ws['A2'], NOTE_STYLE)
+    
+    headers = ['Trigger Metric', 'Threshold', 'Action', 'Fires']
+    for col, header in enumerate(headers, start=1):
+        apply_style(ws.cell(row=4, column=col, value=header), HEADER_STYLE)
+    rows = (
+        [label, threshold, action, _trigger_month(optimization.triggers[label], optimization.months)]
+        for label, threshold, action in TRIGGERS
+    )
+    row = append_rows(ws, rows, 5)
+    
+    row += 1
+    ws.cell(row=row, column=1, value="Deployed configuration")
+    for col, label in enumerate(optimization.deployed, start=4):
+        ws.cell(row=row, column=col, value=label)
+    
+    row += 2
+    headers2 = ['Month', 'Inbound Files', 'Routing Deliveries'] + [
+        decision.name for decision in optimization.decisions] + ['Optimal Cost', 'Deployed Cost', 'Savings']
+    for col, header in enumerate(headers2, start=1):
+        apply_style(ws.cell(row=row, column=col, value=header), HEADER_STYLE)
+    
+    volumes = optimization.volumes
+    rows = (
+        [month + 1, round(float(volumes['inbound_files'][month]), 0),
+         round(float(volumes['routing_messages'][month] * optimization.fan_out), 0),
+         *(decision.labels[option] for decision, option in zip(optimization.decisions, choice)),
+         float(cost), float(deployed), float(deployed - cost)]
+        for month, (choice, cost, deployed) in enumerate(
+            zip(optimization.choices, optimization.costs, optimization.deployed_costs))
+    )
+    formats = [None, COUNT_FORMAT, COUNT_FORMAT] + [None] * len(optimization.decisions) + [CURRENCY_FORMAT] * 3
+    row = append_rows(ws, rows, row + 1, formats)
+    
+    ws.cell(row=row, column=1, value=f"Total ({optimization.months} months)")
+    totals = [optimization.costs.sum(), optimization.deployed_costs.sum(),
+              (optimization.deployed_costs - optimization.costs).sum()]
+    for col, total in enumerate(totals, start=len(headers2) - 2):
+        _money(ws, row, col, float(total))
+    for col in range(1, len(headers2) + 1):
+        apply_style(ws.cell(row=row, column=col), TOTAL_STYLE)
+
+def _variance(actual, plan):
+    return actual / plan - 1 if actual is not None and plan else None
+
+def create_actual_vs_plan_sheet(wb, breakdown, plan, telemetry=None):
+    """Planned Prod volumes and costs against exported Log Analytics telemetry"""
+    from openpyxl.utils import get_column_letter
+    from budget_workbook import HEADER_STYLE, NOTE_STYLE, TITLE_STYLE, append_rows, apply_style
+    from budget_telemetry import ROLLING_DAYS, period, rolling_daily
+    
+    ws = wb.create_sheet("Actual vs Plan")
+    
+    # Set column widths
+    ws.column_dimensions['A'].width = 38
+    for col in range(2, 8):
+        ws.column_dimensions[get_column_letter(col)].width = 18
+    ws.column_dimensions['G'].width = 40
+    
+    prod, expected = env_index('Prod'), scenario_index('Expected')
+    pd, pv = plan.drivers, plan.volumes
+    cv = breakdown.volumes
+    
+    ws['A1'] = "Actual vs Plan (Prod Expected)"
+    apply_style(ws['A1'], TITLE_STYLE)
+    if telemetry is None:
+        ws['A2'] = "No telemetry exports supplied (--telemetry); Plan column only"
+    else:
+        span = period(telemetry)
+        covered = f"{span[0]:%Y-%m-%d} to {span[1]:%Y-%m-%d}" if span else "no dated rows"
+        ws['A2'] = (f"{telemetry.rows:,} rows from {telemetry.files} exports covering {covered}; "
+                    f"Expected scenario recalibrated from actuals")
+    apply_style(ws['A2'], NOTE_STYLE)
+    
+    headers = ['Metric', 'Plan', 'Actual', 'Variance', 'Calibrated Model', '', 'Source']
+    for col, header in enumerate(headers, start=1):
+        if header:
+            apply_style(ws.cell(row=4, column=col, value=header), HEADER_STYLE)
+    
+    def actual(value):
+        return value if telemetry is not None and value else None
+    
+    gb_per_day = actual(telemetry and telemetry.mean_daily_gb)
+    # Same month lengths as the plan: routed messages follow weekly files, daily meters DAYS_PER_MONTH
+    messages = actual(telemetry and telemetry.messages_per_day * 7 * WEEKS_PER_MONTH)
+    invocations = actual(telemetry and telemetry.invocations_per_day * DAYS_PER_MONTH)
+    plan_invocations = pv['router_invocations'][prod, expected] + pv['orchestrator_invocations'][prod, expected]
+    model_invocations = cv['router_invocations'][prod, expected] + cv['orchestrator_invocations'][prod, expected]
+    log_cost = SERVICE_INDEX['log_analytics']
+    rows = [
+        ['Log ingestion (GB/day)', pd['log_gb_per_day'][prod, expected], gb_per_day,
+         breakdown.drivers['log_gb_per_day'][prod, expected], 'Usage table (or summed _BilledSize)', DECIMAL_FORMAT],
+        ['Log ingestion (GB/month)', pv['log_gb'][prod, expected], gb_per_day and gb_per_day * DAYS_PER_MONTH,
+         cv['log_gb'][prod, expected], 'Usage table (or summed _BilledSize)', DECIMAL_FORMAT],
+        ['Routed messages / month', pv['routing_messages'][prod, expected], messages,
+         cv['routing_messages'][prod, expected], 'RoutingEvent_CL rows', COUNT_FORMAT],
+        ['Function invocations / month', plan_invocations, invocations, model_invocations,
+         'Function request rows (AppRequests)', COUNT_FORMAT],
+        ['Log Analytics cost / month', plan.costs[prod, expected, log_cost], None,
+         breakdown.costs[prod, expected, log_cost], 'Cost model', CURRENCY_FORMAT],
+        ['Total monthly cost', plan.costs[prod, expected].sum(), None,
+         breakdown.costs[prod, expected].sum(), 'Cost model', CURRENCY_FORMAT],
+    ]
+    row = 5
+    for label, planned, observed, calibrated, source, number_format in rows:
+        ws.cell(row=row, column=1, value=label)
+        for col, value in ((2, planned), (3, observed), (5, calibrated)):
+            if value is not None:
+                ws.cell(row=row, column=col, value=round(float(value), 2)).number_format = number_format
+        variance = _variance(observed, planned)
+        if variance is not None:
+            ws.cell(row=row, column=4, value=round(float(variance), 4)).number_format = PERCENT_FORMAT
+        ws.cell(row=row, column=7, value=source)
+        row += 1
+    
+    if telemetry is None:
+        return
+    
+    row += 1
+    apply_style(ws.cell(row=row, column=1, value="Latency Percentiles"), TITLE_STYLE)
+    row += 1
+    headers2 = ['Metric', 'Samples', 'p50', 'p95', 'p99', 'Target', 'Status']
+    for col, header in enumerate(headers2, start=1):
+        apply_style(ws.cell(row=row, column=col, value=header), HEADER_STYLE)
+    latencies = [('Routing latency (ms)', telemetry.routing_latency_ms, None),
+                 ('Outbound assembly latency (ms)', telemetry.outbound_latency_ms, None)]
+    latencies += [(f"{ack_type} ack latency (s)", histogram, ACK_SLA_SECONDS.get(ack_type))
+                  for ack_type, histogram in sorted(telemetry.ack_latency_s.items())]
+    rows = (
+        [label, histogram.count, histogram.percentile(50), histogram.percentile(95), histogram.percentile(99),
+         target, '' if target is None else ('Within SLA' if histogram.percentile(95) <= target else 'BREACH')]
+        for label, histogram, target in latencies if histogram.count
+    )
+    row = append_rows(ws, rows, row + 1, [None, COUNT_FORMAT, DECIMAL_FORMAT, DECIMAL_FORMAT, DECIMAL_FORMAT,
+                                          COUNT_FORMAT])
+    
+    if telemetry.dead_letters:
+        row += 1
+        for col, header in enumerate(['Dead-letter Reason', 'Messages'], start=1):
+            apply_style(ws.cell(row=row, column=col, value=header), HEADER_STYLE)
+        rows = ([reason, count] for reason, count in telemetry.dead_letters.most_common())
+        row = append_rows(ws, rows, row + 1, [None, COUNT_FORMAT])
+    
+    row += 1
+    headers3 = ['Day', 'GB Ingested', f'{ROLLING_DAYS}-day Avg GB', 'Routed Messages', 'Function Invocations']
+    for col, header in enumerate(headers3, start=1):
+        apply_style(ws.cell(row=row, column=col, value=header), HEADER_STYLE)
+    ingestion = {day: (gb, rolling) for day, gb, rolling in rolling_daily(telemetry.daily_gb)}
+    days = sorted(set(ingestion) | set(telemetry.messages) | set(telemetry.invocations))
+    rows = (
+        [day, *ingestion.get(day, (None, None)), telemetry.messages.get(day, 0), telemetry.invocations.get(day, 0)]
+        for day in days
+    )
+    append_rows(ws, rows, row + 1, [DATE_FORMAT, DECIMAL_FORMAT, DECIMAL_FORMAT, COUNT_FORMAT, COUNT_FORMAT])
+
+# Stage builder, input names, and every budget_* module it imports directly or through them;
+# budget_workbook and budget_cost_model are hashed for every stage
+SHEET_STAGES = (
+    (create_summary_sheet, ('breakdown', 'prepared', 'region', 'infra', 'formulas'), ('budget_formulas',)),
+    (create_unit_pricing_sheet, ('pricing', 'price_source', 'formulas'), ()),
+    (create_monthly_costs_sheet, ('breakdown', 'formulas'), ('budget_formulas', 'budget_infra')),
+    (create_transaction_volumes_sheet, ('breakdown', 'scan', 'formulas'), ('budget_x12_scan',)),
+    (create_meter_quantities_sheet, ('breakdown', 'formulas'), ('budget_formulas',)),
+    (create_environment_rollup_sheet, ('breakdown', 'infra', 'formulas'), ('budget_formulas',)),
+    (create_sensitivity_analysis_sheet, ('simulation', 'breakdown', 'routing'), ('budget_routing',)),
+    (create_storage_projection_sheet, ('breakdown',), ('budget_storage_projection',)),
+    (create_partner_attribution_sheet, ('breakdown', 'partners', 'scan'), ('budget_partners',)),
+    (create_ack_volumes_sheet, ('acks',), ('budget_acks', 'budget_optimizer', 'budget_partners')),
+    (create_routing_simulation_sheet, ('breakdown', 'routing'), ('budget_routing',)),
+    (create_cost_optimizer_sheet, ('optimization',), ('budget_optimizer',)),
+    (create_actual_vs_plan_sheet, ('breakdown', 'plan', 'telemetry'), ('budget_telemetry',)),
+)
+
+# Headless subcommands: name -> module whose main(argv) runs it; none of them builds a workbook
+SUBCOMMANDS = {
+    'diff': 'budget_diff',
+    'corpus': 'budget_x12_corpus',
+}
+
+def parse_args(argv=None):
+    from budget_export import OUTPUT_FORMATS, check_formats
+    
+    parser = argparse.ArgumentParser(description="Generate the Azure EDI platform budget workbook",
+                                     epilog="Subcommands: 'diff' compares monthly cost between two input sets "
+                                            "for CI gates; 'corpus' writes a synthetic X12 load-test corpus sized "
+                                            "from the same drivers. Run '<subcommand> --help' for their options.")
+    parser.add_argument('--simulate', type=int, default=0, metavar='DRAWS',
+                        help="run a Monte Carlo simulation with DRAWS samples (e.g. 1000000)")
+    parser.add_argument('--levers', metavar='PATH',
+                        help="JSON file overriding the simulation lever distributions")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="worker processes for the simulation (default: CPU count)")
+    parser.add_argument('--seed', type=int, default=None, help="random seed for reproducible draws")
+    parser.add_argument('--streaming', action='store_true',
+                        help="write through write-only worksheets (flat memory for large grids)")
+    parser.add_argument('--partners', metavar='DIR',
+                        help="partner config directory for cost attribution (default: config/partners/samples)")
+    parser.add_argument('--scan-x12', metavar='DIR',
+                        help="derive ST-per-file and file-size drivers from raw X12 files under DIR")
+    parser.add_argument('--scan-period-days', type=float, default=None, metavar='DAYS',
+                        help="days of traffic the scanned files cover (also derives files/week)")
+    parser.add_argument('--routing-rules', metavar='PATH',
+                        help="Service Bus routing rules to replay (default: config/routing/routing-rules.json)")
+    parser.add_argument('--replay-messages', type=int, default=None, metavar='N',
+                        help="synthetic envelopes to replay through the routing rules (default: 1000000)")
+    parser.add_argument('--cache-dir', metavar='DIR',
+                        help="reuse content-hashed stage results from DIR; only changed stages recompute")
+    parser.add_argument('--cache-max-mb', type=float, default=None, metavar='MB',
+                        help="evict least recently used cache entries beyond MB (default: 256)")
+    parser.add_argument('--infra-dir', metavar='DIR',
+                        help="Bicep parameter files main.<env>.parameters.json (default: infra/bicep)")
+    parser.add_argument('--env-dir', metavar='DIR',
+                        help="environment overlay files <env>.parameters.json (default: env)")
+    parser.add_argument('--no-infra', action='store_true',
+                        help="price the assumed environment footprint instead of the parameter files")
+    parser.add_argument('--optimize-months', type=int, default=None, metavar='MONTHS',
+                        help="growth horizon searched by the cost optimizer (default: 36)")
+    parser.add_argument('--optimize-scenario', choices=SCENARIOS, default='Expected',
+                        help="Prod scenario whose volumes the cost optimizer grows (default: Expected)")
+    parser.add_argument('--telemetry', nargs='+', metavar='PATH',
+                        help="exported Log Analytics query results (CSV/JSON files or directories) to calibrate against")
+    parser.add_argument('--formats', nargs='+', default=['xlsx'], choices=OUTPUT_FORMATS, metavar='FORMAT',
+                        help=f"outputs to write: {', '.join(OUTPUT_FORMATS)} (default: xlsx)")
+    parser.add_argument('--output-dir', metavar='DIR',
+                        help="directory for table outputs (default: Azure_EDI_Budget_Plan_YYYYMMDD)")
+    parser.add_argument('--price-catalog', metavar='PATH',
+                        help="offline Azure Retail Prices export (JSON/CSV) to price meters from; indexed on first use")
+    parser.add_argument('--region', default=None, metavar='REGION',
+                        help="armRegionName priced from the catalog (default: eastus)")
+    parser.add_argument('--catalog-index-dir', metavar='DIR',
+                        help="where the persisted catalog index is kept (default: next to the export)")
+    parser.add_argument('--formulas', action='store_true',
+                        help="write cost cells as live Excel formulas over Unit Pricing and Transaction Volumes, "
+                             "checked against the cost model by the built-in evaluator")
+    parser.add_argument('--profile', nargs='?', const='', default=None, metavar='PATH',
+                        help="print a cProfile/tracemalloc report; with PATH also dump raw cProfile stats")
+    args = parser.parse_args(argv)
+    if args.region and not args.price_catalog:
+        parser.error("--region selects prices from a catalog; pass --price-catalog as well")
+    # Missing pyarrow and unknown catalog regions are usage errors, reported before any stage runs
+    try:
+        check_formats(args.formats)
+    except (ImportError, ValueError) as error:
+        parser.error(str(error))
+    if args.price_catalog:
+        from budget_price_catalog import DEFAULT_REGION, check_region, load_index
+        try:
+            check_region(load_index(args.price_catalog, args.catalog_index_dir), args.region or DEFAULT_REGION)
+        except (OSError, ValueError) as error:
+            parser.error(str(error))
+    return args
 
 if __name__ == "__main__":
-    create_budget_spreadsheet()
+    if sys.argv[1:2] and sys.argv[1] in SUBCOMMANDS:
+        sys.exit(importlib.import_module(SUBCOMMANDS[sys.argv[1]]).main(sys.argv[2:]))
+    args = parse_args()
+    options = dict(simulate_draws=args.simulate, levers_path=args.levers,
+                   workers=args.workers, seed=args.seed,
+                   scan_dir=args.scan_x12, scan_period_days=args.scan_period_days,
+                   streaming=args.streaming, partners_dir=args.partners,
+                   routing_rules=args.routing_rules, replay_messages=args.replay_messages,
+                   cache_dir=args.cache_dir, cache_max_mb=args.cache_max_mb,
+                   infra_dir=args.infra_dir, env_dir=args.env_dir, use_infra=not args.no_infra,
+                   optimize_months=args.optimize_months, optimize_scenario=args.optimize_scenario,
+                   telemetry_paths=args.telemetry, formats=args.formats, output_dir=args.output_dir,
+                   price_catalog=args.price_catalog, region=args.region, catalog_index_dir=args.catalog_index_dir,
+                   formulas=args.formulas)
+    if args.profile is not None:
+        from budget_benchmark import profile_call
+        profile_call(create_budget_spreadsheet, output=args.profile or None, **options)
+    else:
+        create_budget_spreadsheet(**options)
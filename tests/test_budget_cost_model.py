@@ -0,0 +1,58 @@
+import numpy as np
+
+from budget_cost_model import (
+    ENVIRONMENTS, METER_INDEX, PROD_DRIVERS, SCENARIOS, SERVICE_MATRIX, build_drivers, compute_costs,
+    compute_quantities, compute_volumes, env_index, evaluate, override_drivers, scenario_index,
+)
+from budget_monte_carlo import base_drivers
+
+
+def standard_ops(**overrides):
+    drivers = dict(base_drivers(), **overrides)
+    drivers['files_per_week'] = drivers['files_per_week'] * 100
+    return compute_quantities(drivers, compute_volumes(drivers))[METER_INDEX['sb_standard_ops']]
+
+
+def test_premium_scheduler_does_not_waive_standard_routing_ops():
+    assert standard_ops(sb_units=1, sb_premium_units=1, routing_sb_premium_units=0) > 0
+
+
+def test_premium_routing_namespace_includes_its_operations():
+    assert standard_ops(sb_units=0, sb_premium_units=1, routing_sb_premium_units=1) == 0
+
+
+def test_assumed_footprint_totals():
+    totals = evaluate().costs.sum(axis=-1)
+    # (environment, scenario) monthly USD for the stock drivers and listed prices
+    expected = [[213.98, 406.31, 596.58], [299.46, 579.99, 846.15], [469.54, 1416.52, 2022.29]]
+    assert np.round(totals, 2).tolist() == expected
+
+
+def test_costs_are_priced_quantities_rolled_up_by_service():
+    breakdown = evaluate()
+    by_meter = breakdown.quantities * breakdown.prices
+    assert np.allclose(breakdown.costs.sum(axis=-1), by_meter.sum(axis=-1))
+    assert np.allclose(breakdown.costs, by_meter @ SERVICE_MATRIX)
+
+
+def test_scenarios_are_ordered_in_every_environment():
+    totals = evaluate().costs.sum(axis=-1)
+    low, expected, high = (totals[:, scenario_index(name)] for name in SCENARIOS)
+    assert np.all(low <= expected) and np.all(expected <= high)
+
+
+def test_batched_drivers_match_per_cell_evaluation():
+    drivers = build_drivers()
+    batched = compute_costs(drivers)
+    for env in ENVIRONMENTS:
+        i = env_index(env)
+        for scenario in SCENARIOS:
+            j = scenario_index(scenario)
+            cell = compute_costs({name: values[i, j] for name, values in drivers.items()})
+            assert np.allclose(cell, batched[i, j])
+
+
+def test_override_drivers_replaces_one_scenario():
+    updated = override_drivers({'files_per_week': 10_000}, scenario='High')
+    assert updated['files_per_week'][scenario_index('High')] == 10_000
+    assert updated['files_per_week'][:2] == PROD_DRIVERS['files_per_week'][:2]
@@ -0,0 +1,71 @@
+import pytest
+
+from budget_cost_model import METER_INDEX, env_index, scenario_index
+from budget_formulas import FormulaEvaluator, cell_ref, load_cells, number, parse, range_ref
+
+
+def evaluate(cells):
+    evaluator = FormulaEvaluator(cells)
+    evaluator.calculate()
+    return evaluator
+
+
+@pytest.mark.parametrize('value', [0.1, 1 / 3, 158.0, 2.5e-7, 123456789.123456789])
+def test_number_literal_round_trips(value):
+    assert evaluate({('S', 1, 1): '=' + number(value)}).values[('S', 1, 1)] == value
+
+
+@pytest.mark.parametrize('sheet', ['Plain', 'Unit Pricing', "O'Brien's"])
+def test_references_round_trip_through_the_parser(sheet):
+    assert parse('=' + cell_ref(sheet, 12, 28, absolute=True)) == ('ref', (sheet, 12, 28))
+    node = parse('=' + range_ref(sheet, 2, 1, 3, 2))
+    assert node == ('range', ((sheet, 2, 1), (sheet, 2, 2), (sheet, 3, 1), (sheet, 3, 2)))
+
+
+def test_precedence_and_functions():
+    cells = {
+        ('S', 1, 1): 2, ('S', 2, 1): 3, ('S', 3, 1): 'text',
+        ('S', 1, 2): '=-A1^2+A2*2-6/3',
+        ('S', 2, 2): '=SUM(A1:A3)+MAX(A1,A2)',
+        ('S', 3, 2): '=SUMPRODUCT(A1:A2,A1:A2)',
+        ('S', 4, 2): '=ROUND(2.5,0)+ROUND(-2.5,0)+ABS(-1)',
+    }
+    values = evaluate(cells).values
+    assert values[('S', 1, 2)] == pytest.approx(8.0)
+    assert values[('S', 2, 2)] == 8
+    assert values[('S', 3, 2)] == 13
+    assert values[('S', 4, 2)] == 1
+
+
+def test_recalculation_only_touches_dependents():
+    cells = {('S', 1, 1): 1, ('S', 1, 2): 10, ('S', 2, 1): '=A1*2', ('S', 2, 2): '=B1*2', ('S', 3, 1): '=A2+1'}
+    evaluator = evaluate(cells)
+    assert evaluator.calculate({('S', 1, 1): 5}) == 2
+    assert evaluator.values[('S', 3, 1)] == 11
+    with pytest.raises(ValueError):
+        evaluator.calculate({('S', 2, 1): 0})
+
+
+def test_circular_references_raise():
+    with pytest.raises(ValueError, match='Circular'):
+        FormulaEvaluator({('S', 1, 1): '=A2', ('S', 2, 1): '=A1'})
+
+
+def test_formula_workbook_round_trips_through_xlsx(tmp_path, monkeypatch):
+    from generate_budget_spreadsheet import (
+        PRICING_ROW, PRICING_SHEET, QUANTITIES_SHEET, QUANTITY_ROW, ROLLUP_ROW, ROLLUP_SHEET, _quantity_column,
+        create_budget_spreadsheet,
+    )
+
+    monkeypatch.chdir(tmp_path)
+    path, = create_budget_spreadsheet(formulas=True)
+    evaluator = evaluate(load_cells(path))
+    total = (ROLLUP_SHEET, ROLLUP_ROW + env_index('Prod'), 2 + scenario_index('Expected'))
+    before = evaluator.values[total]
+    assert before == pytest.approx(evaluator.values[('Executive Summary', 13, 4)])
+
+    # Doubling a unit price moves the total by exactly that meter's priced quantity
+    price = (PRICING_SHEET, PRICING_ROW + METER_INDEX['func_ep1'], 2)
+    quantity = (QUANTITIES_SHEET, QUANTITY_ROW + METER_INDEX['func_ep1'], _quantity_column('Prod', 'Expected'))
+    evaluator.calculate({price: evaluator.values[price] * 2})
+    assert evaluator.values[total] - before == pytest.approx(evaluator.values[price] / 2 * evaluator.values[quantity])
@@ -0,0 +1,25 @@
+import pytest
+
+from budget_infra import footprint_drivers, load_footprints
+
+
+def test_prod_parameters_map_to_drivers():
+    prod = load_footprints()['Prod']
+    assert prod.drivers['functions_sku_factor'] == (4, 4, 4)
+    assert prod.drivers['functions_instances'] == (3, 3, 6)
+    assert prod.drivers['routing_sb_premium_units'] == (1, 1, 1)
+    assert prod.drivers['sb_premium_units'] == (2, 2, 2)
+
+
+def test_standard_routing_beside_premium_scheduler():
+    drivers, _ = footprint_drivers({'serviceBusSku': 'Standard', 'schedulerEnabled': True, 'schedulerSku': 'Premium'})
+    assert drivers['sb_units'] == (1, 1, 1)
+    assert drivers['sb_premium_units'] == (1, 1, 1)
+    assert drivers['routing_sb_premium_units'] == (0, 0, 0)
+
+
+@pytest.mark.parametrize('params', [{'functionAppSku': 'Y1'}, {'storageAccountSku': 'Premium_LRS'},
+                                    {'elasticPoolSku': 'HS_Gen5'}, {'controlNumberSku': 'GP_Gen5_2'}])
+def test_unsupported_skus_raise(params):
+    with pytest.raises(ValueError):
+        footprint_drivers(params)
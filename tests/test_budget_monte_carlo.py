@@ -0,0 +1,30 @@
+import numpy as np
+import pytest
+
+from budget_cost_model import compute_costs, price_vector
+from budget_infra import infra_profiles, load_footprints
+from budget_monte_carlo import LEVERS, base_drivers, run_simulation, tornado
+
+
+def deterministic_total(base):
+    return float(compute_costs({name: np.asarray(value) for name, value in base.items()}, price_vector()).sum())
+
+
+@pytest.mark.parametrize('profiles', [None, 'infra'], ids=['assumed', 'infra'])
+def test_p50_brackets_the_deterministic_cell(profiles):
+    base = base_drivers(profiles=infra_profiles(load_footprints()) if profiles else None)
+    result = run_simulation(50_000, workers=1, seed=0, base=base)
+    assert result.percentiles[50] == pytest.approx(deterministic_total(base), rel=0.05)
+
+
+def test_levers_sample_around_overridden_base():
+    base = base_drivers()
+    base.update(functions_instances=3.0, private_endpoints=6.0, log_gb_per_day=10.0)
+    result = run_simulation(20_000, workers=1, seed=0, base=base)
+    # Deployed minimums are floors, and relative levers scale the calibrated log volume
+    assert result.percentiles[50] >= deterministic_total(base) * 0.97
+    swings = {name: (low, high) for name, low, high in tornado(base, LEVERS, seed=0)}
+    low, high = swings['Functions Premium instance count']
+    assert low == high == pytest.approx(deterministic_total(base))
+    low, high = swings['Log verbosity (% increase)']
+    assert low < deterministic_total(base) < high
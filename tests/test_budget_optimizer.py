@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+
+from budget_cost_model import compute_volumes
+from budget_infra import infra_profiles, load_footprints
+from budget_monte_carlo import base_drivers
+from budget_optimizer import build_decisions, brute_force, monthly_drivers, optimize
+
+
+@pytest.fixture(scope='module')
+def prod():
+    footprints = load_footprints()
+    return base_drivers(profiles=infra_profiles(footprints)), footprints['Prod']
+
+
+@pytest.mark.parametrize('fan_out', [1.0, 2.5])
+def test_branch_and_bound_matches_brute_force(prod, fan_out):
+    base, footprint = prod
+    result = optimize(base, footprint, fan_out, months=12)
+    _, costs = brute_force(base, footprint, fan_out, months=12)
+    assert np.allclose(result.costs, costs)
+    assert result.nodes < result.configurations
+
+
+def test_branch_and_bound_matches_brute_force_at_high_volume():
+    base = dict(base_drivers(), files_per_week=400_000.0)
+    result = optimize(base, months=6)
+    _, costs = brute_force(base, months=6)
+    assert np.allclose(result.costs, costs)
+
+
+def test_functions_capacity_clears_a_batch_window_within_the_ack_sla():
+    base = dict(base_drivers(), files_per_week=400_000.0)
+    functions = build_decisions(base, compute_volumes(monthly_drivers(base, 1)))[0]
+    feasible = dict(zip(functions.labels, functions.feasible[0]))
+    assert not feasible['EP1 × 1']
+    assert feasible['EP3 × 10']
@@ -0,0 +1,78 @@
+import pytest
+
+from budget_routing import (
+    DEFAULT_RULES_PATH, budget_routing, compile_dispatch_table, compile_filter, fan_out, load_routing_rules,
+)
+
+
+@pytest.mark.parametrize('expression, props, expected', [
+    ("transactionSet = '270'", {'transactionSet': '270'}, True),
+    ("transactionSet = '270'", {'transactionSet': '271'}, False),
+    ("transactionSet <> '270'", {'transactionSet': '271'}, True),
+    ("transactionSet LIKE '837%'", {'transactionSet': '837I'}, True),
+    ("transactionSet LIKE '83_'", {'transactionSet': '8377'}, False),
+    ("transactionSet NOT LIKE '837%'", {'transactionSet': '835'}, True),
+    ("code LIKE '50!%%' ESCAPE '!'", {'code': '50% off'}, True),
+    ("code LIKE '50!%%' ESCAPE '!'", {'code': '500'}, False),
+    ("transactionSet IN ('834', '835')", {'transactionSet': '835'}, True),
+    ("transactionSet NOT IN ('834', '835')", {'transactionSet': '835'}, False),
+    ("partner = 'O''Brien'", {'partner': "O'Brien"}, True),
+    ("user.priority >= 5", {'priority': 7}, True),
+    ("priority > 5 AND priority < 10", {'priority': 10}, False),
+    ("a = 1 OR b = 1 AND c = 1", {'a': 1, 'b': 0, 'c': 0}, True),
+    ("(a = 1 OR b = 1) AND c = 1", {'a': 1, 'b': 0, 'c': 0}, False),
+    ("NOT (transactionSet = '270')", {'transactionSet': '271'}, True),
+    ("missing IS NULL", {}, True),
+    ("missing IS NOT NULL", {}, False),
+    ("flag = TRUE", {'flag': True}, True),
+])
+def test_filter_matches(expression, props, expected):
+    assert compile_filter(expression)(props) is expected
+
+
+@pytest.mark.parametrize('expression', [
+    # SQL unknown never matches, negated or not
+    "missing = '270'",
+    "NOT (missing = '270')",
+    "missing NOT IN ('270')",
+    "transactionSet = 270",
+])
+def test_unknown_is_not_a_match(expression):
+    assert compile_filter(expression)({'transactionSet': '270'}) is False
+
+
+@pytest.mark.parametrize('expression', [
+    "transactionSet = ",
+    "transactionSet == '270'",
+    "transactionSet NOT = '270'",
+    "(transactionSet = '270'",
+    "transactionSet = '270' extra",
+    "transactionSet ~ '270'",
+])
+def test_invalid_filters_raise(expression):
+    with pytest.raises(ValueError):
+        compile_filter(expression)
+
+
+def test_subscription_receives_one_copy_when_several_rules_match():
+    rules = [
+        {'name': 'a', 'filter': "transactionSet LIKE '837%'", 'subscription': 'claims'},
+        {'name': 'b', 'filter': "transactionSet = '837P'", 'subscription': 'claims'},
+        {'name': 'c', 'filter': "transactionSet = '837P'", 'subscription': 'audit'},
+    ]
+    table = compile_dispatch_table(rules, ['837P', '270'])
+    assert table.rule_matches.tolist() == [[True, True, True], [False, False, False]]
+    assert table.deliveries.tolist() == [[True, True], [False, False]]
+
+
+def test_scanned_counts_route_exactly():
+    routing = budget_routing(DEFAULT_RULES_PATH, {'270': 10, '837': 30, '999': 5})
+    assert routing.messages == 45
+    assert routing.unrouted == 5
+    assert fan_out(routing) == pytest.approx(40 / 45)
+
+
+def test_seeded_replay_is_reproducible():
+    first, second = (budget_routing(DEFAULT_RULES_PATH, messages=20_000, seed=3) for _ in range(2))
+    assert first.subscription_counts.tolist() == second.subscription_counts.tolist()
+    assert len(load_routing_rules()) == len(first.table.rules)
@@ -0,0 +1,55 @@
+import os
+
+import pytest
+
+from budget_x12_corpus import generate_corpus, main
+
+
+def envelopes(path):
+    with open(path, encoding='ascii') as handle:
+        text = handle.read()
+    element, terminator = text[3], text[105]
+    return [segment.strip().split(element) for segment in text.split(terminator) if segment.strip()]
+
+
+@pytest.fixture(scope='module')
+def corpus(tmp_path_factory):
+    directory = tmp_path_factory.mktemp('corpus')
+    return generate_corpus(str(directory), files=8, workers=1, seed=1, first_control=41, peak_share=0)
+
+
+def test_verify_rescans_matching_envelope_counts(tmp_path):
+    assert main([str(tmp_path), '--files', '6', '--seed', '2', '--workers', '1', '--peak-share', '0',
+                 '--verify']) == 0
+
+
+def test_control_numbers_are_sequential(corpus):
+    assert (corpus.first_control, corpus.last_control) == (41, 48)
+    controls = []
+    for name in os.listdir(corpus.directory):
+        with open(os.path.join(corpus.directory, name), encoding='ascii') as handle:
+            isa = handle.read(106)
+        controls.append(int(isa[:-1].split(isa[3])[13]))
+    assert sorted(controls) == list(range(41, 49))
+
+
+def test_envelopes_are_balanced(corpus):
+    transactions = 0
+    for name in os.listdir(corpus.directory):
+        segments = envelopes(os.path.join(corpus.directory, name))
+        isa, gs, ge, iea = segments[0], segments[1], segments[-2], segments[-1]
+        assert (isa[0], gs[0], ge[0], iea[0]) == ('ISA', 'GS', 'GE', 'IEA')
+        assert iea[1:] == ['1', isa[13]]
+        assert ge[2] == gs[6]
+        sets, start = 0, None
+        for index, segment in enumerate(segments):
+            if segment[0] == 'ST':
+                start = index
+            elif segment[0] == 'SE':
+                # SE01 counts ST through SE; SE02 echoes ST02
+                assert int(segment[1]) == index - start + 1
+                assert segment[2] == segments[start][2]
+                sets += 1
+        assert int(ge[1]) == sets
+        transactions += sets
+    assert transactions == sum(corpus.transactions.values())